@@ -30,10 +30,18 @@ for _ in range(30):
 else:
     raise RuntimeError("Redis not available after 30 seconds for Celery.")
 
+# Saga progress lives in one summary hash per saga (see mission_start_celery.status),
+# so the result backend only keeps the records the canvas itself reads: plain
+# (non-extended) JSON results without STARTED states, expiring after a short TTL.
+result_expires = int(os.environ.get("CELERY_RESULT_EXPIRES_SECONDS", 600))
+
 celery_app = Celery("saga_app", broker=broker_url, backend=backend_url)
 celery_app.conf.update(
-    task_track_started=True,
-    result_extended=True,
+    task_track_started=False,
+    result_extended=False,
+    result_expires=result_expires,
+    result_serializer="json",
+    result_accept_content=["json"],
 )
 logger.info("Celery app configured with broker and backend")
 celery_app.autodiscover_tasks(["app.flows.mission_start_celery.tasks"])
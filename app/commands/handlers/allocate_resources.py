@@ -1,21 +1,35 @@
-import asyncio
 import logging
 
+from app.fleet.registry import allocate_robots, seed_fleet_on_startup
+from app.redis_utils.blobs import load_payload
 from app.redis_utils.decorators import multi_stage_reply
 
 
 STREAM_NAME = "resources:commands"
 GROUP_NAME = "resources_allocator_group"
 EVENT_TYPE = "resources:allocate"
+CONCURRENCY = 8
+# Registers the FLEET_ROBOTS robots when the listener starts.
+BACKGROUND = seed_fleet_on_startup
 
 logger = logging.getLogger(__name__)
 
 
 @multi_stage_reply
-async def handle(fields: dict, progress) -> None:
+async def handle(fields: dict, progress) -> dict:
     """
     Handle allocate_resources command.
+
+    Reserves payload["robots_allocated"] robots for the saga in one atomic script call;
+    optional payload["min_battery"] and payload["capabilities"] narrow the selection.
     """
     logger.info("Handling allocate_resources command")
+    payload = await load_payload(fields)
     await progress(0.5, {"stage": "allocating"})
-    await asyncio.sleep(1)
+    robots = await allocate_robots(
+        fields.get("saga_id"),
+        int(payload.get("robots_allocated", 0)),
+        min_battery=payload.get("min_battery", 0),
+        capabilities=payload.get("capabilities", ()),
+    )
+    return {"robots": robots}
@@ -1,19 +1,52 @@
-import asyncio
 import logging
 
+import numpy as np
+
+from app.redis_utils.blobs import load_array, load_payload, store_array
 from app.redis_utils.decorators import multi_stage_reply
+from app.slam.map_fusion import fuse_maps, map_summary
 
 STREAM_NAME = "map:commands"
 GROUP_NAME = "map_handler_group"
 EVENT_TYPE = "map:integrate"
+EXECUTION_MODE = "process"
+# Keep the handler process pool busy.
+CONCURRENCY = 4
 
 logger = logging.getLogger(__name__)
 
 @multi_stage_reply
-async def handle(fields: dict, progress) -> None:
+async def handle(fields: dict, progress) -> dict:
     """
     Handle integrate_maps command.
+
+    payload["maps"]: list of {"grid": 2D log-odds list or store_array descriptor,
+    "pose": [x, y, theta], "resolution": float}; optional payload["resolution"], ["origin"] and ["shape"]
+    define the global grid. Replies with the fused log-odds grid stored as a blob
+    ("final_map": store_array descriptor) and a summary of it.
     """
     logger.info("Handling integrate_maps command")
-    await progress(0.5, {"stage": "integrating"})
-    await asyncio.sleep(1)
+    payload = await load_payload(fields)
+    maps = payload.get("maps")
+    if not maps:
+        await progress(1.0, {"stage": "integrating", "maps": 0})
+        return {"final_map": payload.get("final_map")}
+
+    resolution = float(payload.get("resolution", maps[0].get("resolution", 1.0)))
+    grids = [
+        await load_array(m["grid"]) if isinstance(m["grid"], dict) else np.asarray(m["grid"])
+        for m in maps
+    ]
+    poses = [m.get("pose", (0.0, 0.0, 0.0)) for m in maps]
+    resolutions = [float(m.get("resolution", resolution)) for m in maps]
+    await progress(0.1, {"stage": "integrating", "maps": len(maps)})
+    fused = fuse_maps(
+        grids,
+        poses,
+        resolution,
+        resolutions=resolutions,
+        out_shape=payload.get("shape"),
+        out_origin=tuple(payload.get("origin", (0.0, 0.0))),
+    )
+    await progress(0.9, {"stage": "storing"})
+    return {"final_map": await store_array(fused), **map_summary(fused)}
@@ -1,18 +1,77 @@
-import asyncio
 import logging
+from collections import OrderedDict
+
+import numpy as np
+
+from app.redis_utils.blobs import load_array, load_payload
 from app.redis_utils.decorators import multi_stage_reply
+from app.slam.frontiers import FrontierMap
 
 STREAM_NAME = "exploration:commands"
 GROUP_NAME = "exploration_handler_group"
 EVENT_TYPE = "exploration:perform"
+EXECUTION_MODE = "process"
+# Keep the handler process pool busy.
+CONCURRENCY = 4
+
+# Frontier maps kept per base map blob in each handler process, so repeated commands
+# on the same base only apply their new update patches (FrontierMap.update).
+FRONTIER_CACHE_SIZE = 8
 
 logger = logging.getLogger(__name__)
 
+# base map blob ref -> (FrontierMap, number of payload updates applied)
+_frontier_maps = OrderedDict()
+
+
+async def _grid(value):
+    return await load_array(value) if isinstance(value, dict) else np.asarray(value)
+
+
+async def frontier_map(base, updates):
+    """
+    FrontierMap of base (a 2D list or store_array descriptor) with updates applied.
+
+    updates: every patch since base, in order, as {"row", "col", "patch"}. For a blob
+    base, the map is cached by its blob ref and later commands apply only the updates
+    it has not seen yet, which costs O(patch) instead of a full frontier recompute.
+    """
+    key = base.get("ref") if isinstance(base, dict) else None
+    cached = _frontier_maps.pop(key, None) if key else None
+    if cached is None or cached[1] > len(updates):
+        cached = (FrontierMap(await _grid(base)), 0)
+    frontiers, applied = cached
+    patches = [(u["row"], u["col"], await _grid(u["patch"])) for u in updates[applied:]]
+    for row, col, patch in patches:
+        frontiers.update(row, col, patch)
+    if key:
+        _frontier_maps[key] = (frontiers, len(updates))
+        while len(_frontier_maps) > FRONTIER_CACHE_SIZE:
+            _frontier_maps.popitem(last=False)
+    return frontiers
+
+
 @multi_stage_reply
-async def handle(fields: dict, progress) -> None:
+async def handle(fields: dict, progress) -> dict:
     """
     Handle perform_exploration command.
+
+    payload["map"]: log-odds grid as a 2D list or store_array descriptor;
+    optional "updates": patches written since that map (see frontier_map),
+    "min_frontier_size" and "max_frontiers".
+    Replies with the largest frontier clusters as exploration targets.
     """
     logger.info("Handling perform_exploration command")
+    payload = await load_payload(fields)
+    grid = payload.get("map")
+    if grid is None:
+        await progress(1.0, {"stage": "exploring", "frontiers": 0})
+        return {"exploration_result": payload.get("exploration_result")}
+
     await progress(0.5, {"stage": "exploring"})
-    await asyncio.sleep(1)
+    frontiers = await frontier_map(grid, payload.get("updates") or [])
+    clusters = frontiers.clusters(min_size=int(payload.get("min_frontier_size", 1)))
+    return {
+        "exploration_result": payload.get("exploration_result"),
+        "frontiers": clusters[: int(payload.get("max_frontiers", 10))],
+    }
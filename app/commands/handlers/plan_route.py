@@ -1,19 +1,46 @@
-import asyncio
 import logging
 
+import numpy as np
+
+from app.redis_utils.blobs import load_array, load_payload
 from app.redis_utils.decorators import multi_stage_reply
+from app.slam.planning import cost_map, plan_routes
 
 STREAM_NAME = "routing:commands"
 GROUP_NAME = "routing_handler_group"
 EVENT_TYPE = "routing:plan"
+EXECUTION_MODE = "process"
+# Keep the handler process pool busy.
+CONCURRENCY = 4
 
 logger = logging.getLogger(__name__)
 
 @multi_stage_reply
-async def handle(fields: dict, progress) -> None:
+async def handle(fields: dict, progress) -> dict:
     """
     Handle plan_route command.
+
+    payload["map"]: log-odds grid as a 2D list or store_array descriptor;
+    payload["start"]: [row, col] shared by all robots; payload["goals"]: one [row, col]
+    per robot; optional "robot_radius" and "safety_radius" in cells.
+    Replies with one path (list of [row, col]) per goal, null when unreachable.
     """
     logger.info("Handling plan_route command")
-    await progress(0.5, {"stage": "planning"})
-    await asyncio.sleep(1)
+    payload = await load_payload(fields)
+    grid = payload.get("map")
+    if grid is None:
+        await progress(1.0, {"stage": "planning", "goals": 0})
+        return {"route": payload.get("route")}
+
+    grid = await load_array(grid) if isinstance(grid, dict) else np.asarray(grid)
+    robot_radius = float(payload.get("robot_radius", 1.0))
+    costs = cost_map(
+        grid, robot_radius, float(payload.get("safety_radius", robot_radius * 3))
+    )
+    goals = [tuple(goal) for goal in payload["goals"]]
+    await progress(0.5, {"stage": "planning", "goals": len(goals)})
+    paths = plan_routes(costs, tuple(payload["start"]), goals)
+    return {
+        "route": payload.get("route"),
+        "paths": [None if path is None else [list(cell) for cell in path] for path in paths],
+    }
@@ -1,21 +1,27 @@
-import asyncio
 import logging
 
-from app.redis_utils.decorators import multi_stage_reply
+from app.fleet.registry import release_robots_batch
+from app.redis_utils.decorators import batch_reply
 
 
 STREAM_NAME = "resources:commands"
 GROUP_NAME = "resources_release_group"
 EVENT_TYPE = "resources:release"
+# Releases of a whole read batch share one pipelined round trip.
+BATCH = True
+BATCH_SIZE = 50
+# Freeing robots unblocks waiting allocations.
+PRIORITY = 10
 
 logger = logging.getLogger(__name__)
 
 
-@multi_stage_reply
-async def handle(fields: dict, progress) -> None:
+@batch_reply
+async def handle(batch: list) -> list:
     """
-    Handle release_resources command.
+    Handle a batch of release_resources commands.
+    Idempotent per saga_id: a repeated release returns no robots.
     """
-    logger.info(f"Handling release_resources command {fields}")
-    await progress(0.5, {"stage": "releasing"})
-    await asyncio.sleep(1)
+    logger.info(f"Handling {len(batch)} release_resources commands")
+    released = await release_robots_batch([fields.get("saga_id") for fields in batch])
+    return [{"released": robots} for robots in released]
@@ -0,0 +1,27 @@
+import logging
+
+from app.flows.mission_start_events.engine import REPLY_STREAM, on_replies, run_timeout_sweeper
+
+
+STREAM_NAME = REPLY_STREAM
+GROUP_NAME = "saga_engine_group"
+# Replies of every step type advance sagas.
+EVENT_TYPE = None
+# A read batch of replies is applied with two pipelined round trips.
+BATCH = True
+BATCH_SIZE = 200
+# Advancing sagas hands work to every other handler.
+PRIORITY = 5
+BACKGROUND = run_timeout_sweeper
+# 'cancelled' and 'expired' replies of cancelled sagas end them; never skip them.
+SKIP_STALE = False
+
+logger = logging.getLogger(__name__)
+
+
+async def handle(batch: list) -> None:
+    """
+    Advance the event-driven sagas a batch of step replies belongs to.
+    """
+    applied = await on_replies(batch)
+    logger.debug(f"Applied {applied} saga transitions from {len(batch)} replies")
@@ -1,12 +1,15 @@
 import logging
 import os
 
+from app.redis_utils.deadlines import remaining_time
 from app.redis_utils.decorators import multi_stage_reply
 
 
 STREAM_NAME = os.environ.get("REDIS_STREAM", "mission:commands")
 GROUP_NAME = "mission_orchestrator_group"
 EVENT_TYPE = "mission:start"
+# Each run awaits a whole saga, mostly idle on replies.
+CONCURRENCY = 32
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +17,10 @@ logger = logging.getLogger(__name__)
 @multi_stage_reply
 async def handle(fields):
     """
-    Trigger the full saga flow in response to a mission:start event.
+    Trigger the full saga flow in response to a mission:start event and reply once
+    it has finished, whatever the backend: 'completed' when the saga completed,
+    'failed' when it failed, so reply latencies measure whole sagas. The wait is
+    bounded by the command deadline, if any.
     """
 
     logger.info(f"Handling orchestrator trigger command {fields}")
@@ -29,14 +35,23 @@ async def handle(fields):
 
     backend = fields.get("backend", "celery")
     if backend == "celery":
+        from app.flows.mission_start_celery.async_results import await_result
         from app.flows.mission_start_celery.orchestrator import run_saga as celery_run_saga
 
         result = await celery_run_saga(robot_count, area, correlation_id=correlation_id)
+        await await_result(result, timeout=remaining_time(fields))
         return result.id
     elif backend == "async":
         from app.flows.mission_start_async.orchestrator import run_saga as async_run_saga
 
         await async_run_saga(robot_count, area, correlation_id=correlation_id)
         return "async"
+    elif backend == "events":
+        from app.flows.mission_start_events.engine import start_saga, wait_saga
+
+        # The saga_engine handler drives the saga; this only watches its status.
+        saga_id = await start_saga(robot_count, area, correlation_id=correlation_id)
+        await wait_saga(saga_id, timeout=remaining_time(fields))
+        return saga_id
     else:
         raise ValueError(f"Unknown backend for mission:start: {backend}")
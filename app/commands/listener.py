@@ -1,11 +1,29 @@
 import importlib
 import pkgutil
 import asyncio
+import heapq
+import inspect
+import itertools
 import logging
+import os
 import signal
 
+from app.commands.process_pool import run_in_process, shutdown_process_pool
 from app.logging_config import setup_logging
+from app.redis_utils.cancellation import (
+    CANCELLED_STATUS,
+    CommandCancelled,
+    cancelled_sagas,
+    is_cancelled,
+    watch_cancellations,
+)
 from app.redis_utils.client import get_redis_client
+from app.redis_utils.commands import emit_event, emit_events
+from app.redis_utils.dead_letters import REDELIVERY_BACKOFF, handle_failure, reclaim_failed
+from app.redis_utils.deadlines import EXPIRED_STATUS, DeadlineExceeded, is_expired
+from app.redis_utils.envelope import Envelope, reply_event
+from app.redis_utils.transport import InMemoryTransport
+from app.redis_utils.trimming import STREAM_TRIM_INTERVAL, run_trimmer
 
 setup_logging()
 
@@ -13,16 +31,87 @@ logger = logging.getLogger(__name__)
 
 shutdown_event = asyncio.Event()
 
+# Runtime options a handler module may declare as upper-case module constants
+# (e.g. CONCURRENCY = 8); undeclared ones take these defaults.
+HANDLER_DEFAULTS = {
+    # EXECUTION_MODE: "async" (event loop), "thread" or "process" (handler process pool);
+    # always "async" on the in-process transport, which workers and other threads'
+    # event loops cannot share
+    "execution_mode": "async",
+    # CONCURRENCY: messages of this handler processed at the same time
+    "concurrency": 1,
+    # BATCH_SIZE / BLOCK_MS: XREADGROUP count and block time of the consumer loop
+    "batch_size": 10,
+    "block_ms": 1000,
+    # MAX_RUNTIME: seconds after which a handler run is abandoned (None: unbounded)
+    "max_runtime": None,
+    # PRIORITY: higher priorities get in-flight slots first when the listener is saturated
+    "priority": 0,
+    # BATCH: handle receives the list of fields of each read batch (see batch_reply);
+    # batches of one handler run one at a time
+    "batch": False,
+    # SKIP_STALE: ack commands whose deadline passed or whose saga was cancelled with
+    # an 'expired'/'cancelled' reply instead of handling them; False for handlers
+    # consuming replies (e.g. the saga engine), which must see those replies
+    "skip_stale": True,
+    # BACKGROUND: async callable (redis_client, shutdown_event) run next to the
+    # consumer loop for the listener's lifetime (e.g. a timeout sweeper)
+    "background": None,
+}
+EXECUTION_MODES = ("async", "thread", "process")
+# Consumer name of every listener process; failed messages are reclaimed to it.
+CONSUMER_NAME = "listener"
+# Handler runs in flight at once across all consumer loops of this listener process.
+LISTENER_MAX_INFLIGHT = int(os.environ.get("LISTENER_MAX_INFLIGHT", 64))
+
+# (handlers package, discovered handlers); reused while the package is the same module.
+_registry = None
+
+
+class HandlerTimeout(Exception):
+    """
+    Raised when a handler run exceeds its MAX_RUNTIME.
+    """
+
+
+def handler_spec(name, module):
+    """
+    Build the handler dict of a handler module from its module-level declarations.
+    """
+    spec = {
+        "name": name,
+        "stream": getattr(module, "STREAM_NAME", None),
+        "group": getattr(module, "GROUP_NAME", None),
+        "event_type": getattr(module, "EVENT_TYPE", None),
+        "handle": getattr(module, "handle", None),
+    }
+    for key, default in HANDLER_DEFAULTS.items():
+        spec[key] = getattr(module, key.upper(), default)
+    if spec["execution_mode"] not in EXECUTION_MODES:
+        raise ValueError(
+            f"Handler {name} declares unknown EXECUTION_MODE {spec['execution_mode']!r}; "
+            f"expected one of {EXECUTION_MODES}"
+        )
+    if int(spec["concurrency"]) < 1:
+        raise ValueError(f"Handler {name} declares CONCURRENCY {spec['concurrency']}; must be >= 1")
+    return spec
+
 
 def discovery_handler_modules():
     """
     Discover handler modules under app.commands.handlers.
 
+    The registry is built once per process and reused on later calls.
+
     Returns:
-        List of dicts with keys: name, stream, group, event_type, handle
+        List of dicts with keys: name, stream, group, event_type, handle and the
+        runtime options of HANDLER_DEFAULTS
     """
-    handlers = []
+    global _registry
     package = importlib.import_module("app.commands.handlers")
+    if _registry is not None and _registry[0] is package:
+        return [dict(handler) for handler in _registry[1]]
+    handlers = []
     logger.info(f"Discovering command handler modules in {package.__name__}")
     for module_info in list(pkgutil.iter_modules(package.__path__)):
         name = module_info.name
@@ -35,23 +124,80 @@ def discovery_handler_modules():
             logger.warning(f"Handler module {name} not found, skipping")
             continue
         logger.debug(f"Discovered handler module: {name}")
-        handlers.append(
-            {
-                "name": name,
-                "stream": getattr(module, "STREAM_NAME", None),
-                "group": getattr(module, "GROUP_NAME", None),
-                "event_type": getattr(module, "EVENT_TYPE", None),
-                "handle": getattr(module, "handle", None),
-            }
-        )
+        handlers.append(handler_spec(name, module))
     logger.debug(f"Discovered {len(handlers)} handler modules")
-    return handlers
+    _registry = (package, handlers)
+    return [dict(handler) for handler in handlers]
+
+
+class PriorityLimiter:
+    """
+    Caps the handler runs in flight across all consumer loops. While saturated,
+    each freed slot goes to the highest-priority waiter (FIFO within a priority).
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._active = 0
+        self._waiters = []
+        self._order = itertools.count()
+
+    async def acquire(self, priority=0):
+        if self._active < self.limit and not self._waiters:
+            self._active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._order), future))
+        try:
+            # release() hands its slot over without decrementing _active.
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+
+async def reply_skipped(fields, status, payload):
+    """
+    Answer a command that will not run (expired or cancelled) with a cheap reply.
+    """
+    reply_stream = fields.get("reply_stream")
+    if not reply_stream:
+        return
+    await emit_event(
+        reply_stream,
+        fields.get("correlation_id"),
+        fields.get("event_type"),
+        status,
+        payload,
+        saga_id=fields.get("saga_id"),
+    )
 
 
 async def run_command_listeners(redis_client=None, shutdown_event=shutdown_event):
     """
     Asynchronously listen to each handler's stream and process messages.
     Assumes aioredis backend and async handler functions.
+    Each handler's consumer loop follows its declared runtime options (see
+    HANDLER_DEFAULTS): EXECUTION_MODE "thread" runs the handler on its own event
+    loop in a worker thread, "process" in the handler process pool.
+    Handler command streams are trimmed in the background behind their consumer
+    groups (see app.redis_utils.trimming).
+    A message whose handler fails stays pending and is redelivered with backoff;
+    after HANDLER_MAX_DELIVERIES it moves to its stream's dead-letter stream
+    (see app.redis_utils.dead_letters).
+    BATCH handlers get every read batch in one call and their successful
+    messages are acked with one multi-ID XACK; batch runs span several sagas
+    and are not cancelled with any one of them.
+    A handler's BACKGROUND task runs until shutdown.
     Accepts optional redis_client for testing.
     """
     logger.info("Starting command listeners")
@@ -59,6 +205,44 @@ async def run_command_listeners(redis_client=None, shutdown_event=shutdown_event
         redis_client = get_redis_client()
     handlers = discovery_handler_modules()
     logger.info("Starting command listeners with %d handlers", len(handlers))
+    inflight = {}
+    limiter = PriorityLimiter(LISTENER_MAX_INFLIGHT)
+
+    def cancel_inflight(saga_id, reason):
+        tasks = inflight.get(saga_id, ())
+        if tasks:
+            logger.info(f"Cancelling {len(tasks)} in-flight handlers for saga {saga_id}: {reason}")
+        for task in tasks:
+            task.cancel()
+
+    async def call_handler(handle_fn, execution_mode, fields):
+        if execution_mode == "process":
+            return await run_in_process(handle_fn, fields)
+        if execution_mode == "thread":
+            if inspect.iscoroutinefunction(handle_fn):
+                return await asyncio.to_thread(asyncio.run, handle_fn(fields))
+            return await asyncio.to_thread(handle_fn, fields)
+        return await handle_fn(fields)
+
+    async def run_handler(handle_fn, execution_mode, max_runtime, fields):
+        if not max_runtime:
+            return await call_handler(handle_fn, execution_mode, fields)
+        call = asyncio.ensure_future(call_handler(handle_fn, execution_mode, fields))
+        try:
+            done, _ = await asyncio.wait({call}, timeout=max_runtime)
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        if call in done:
+            return call.result()
+        call.cancel()
+        try:
+            await call
+        except BaseException:
+            pass
+        # Async and process runs are cancelled (and reply 'cancelled' through
+        # multi_stage_reply); thread runs cannot be interrupted and never reply.
+        raise HandlerTimeout(f"Handler exceeded its max runtime of {max_runtime}s")
 
     async def listen_handler(handler):
         name = handler["name"]
@@ -66,6 +250,15 @@ async def run_command_listeners(redis_client=None, shutdown_event=shutdown_event
         group = handler["group"]
         event_type = handler["event_type"]
         handle_fn = handler["handle"]
+        options = {**HANDLER_DEFAULTS, **handler}
+        execution_mode = options["execution_mode"]
+        if execution_mode != "async" and isinstance(redis_client, InMemoryTransport):
+            logger.warning(f"Handler {name} runs in async mode on the in-process transport (not {execution_mode})")
+            execution_mode = "async"
+        concurrency = int(options["concurrency"])
+        max_runtime = options["max_runtime"]
+        priority = options["priority"]
+        skip_stale = options["skip_stale"]
         if not (stream and group and handle_fn):
             logger.warning("Skipping handler %s due to incomplete metadata", name)
             return
@@ -84,43 +277,225 @@ async def run_command_listeners(redis_client=None, shutdown_event=shutdown_event
                 )
                 raise
 
-        logger.info(f"Handler {name} listening on stream '{stream}', group '{group}'")
-        while not shutdown_event.is_set():
+        async def failed(msg_id, fields, error):
+            # Left pending for a redelivery with backoff, or dead-lettered after too many.
+            try:
+                await handle_failure(redis_client, stream, group, msg_id, fields, error)
+            except Exception as e:
+                logger.error(f"Failed to track failure of message {msg_id}", exc_info=e)
+
+        async def process_message(msg_id, fields):
+            if skip_stale and is_expired(fields):
+                logger.warning(
+                    f"Skipping expired message {msg_id} on stream {stream} (deadline {fields.get('deadline')})"
+                )
+                try:
+                    await reply_skipped(
+                        fields, EXPIRED_STATUS, {"deadline": fields.get("deadline")}
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to reply expired for message {msg_id}", exc_info=e)
+                await redis_client.xack(stream, group, msg_id)
+                return
+            saga_id = fields.get("saga_id")
+            if skip_stale and await is_cancelled(saga_id, redis_client=redis_client):
+                logger.warning(
+                    f"Skipping message {msg_id} on stream {stream}: saga {saga_id} cancelled"
+                )
+                try:
+                    await reply_skipped(fields, CANCELLED_STATUS, {})
+                except Exception as e:
+                    logger.error(f"Failed to reply cancelled for message {msg_id}", exc_info=e)
+                await redis_client.xack(stream, group, msg_id)
+                return
+            await limiter.acquire(priority)
+            logger.info(f"Invoking handler {name} for message {msg_id}")
+            task = asyncio.create_task(run_handler(handle_fn, execution_mode, max_runtime, fields))
+            inflight.setdefault(saga_id, set()).add(task)
             try:
-                logger.debug(f"xreadgroup: group={group}, consumer=listener, stream={stream}")
-                entries = await redis_client.xreadgroup(
-                    groupname=group,
-                    consumername="listener",
-                    block=1000,
-                    count=10,
-                    streams={stream: ">"},
+                logger.debug(
+                    f"Handling message {msg_id} on stream {stream} and event_type {event_type} with fields: {fields}"
                 )
-                for stream_name, msgs in entries:
-                    for msg_id, fields in msgs:
-                        msg_event = fields.get("event_type")
-                        if event_type and msg_event != event_type:
-                            logger.debug(
-                                f"Skipping message {msg_id} on stream {stream}: event_type '{msg_event}' != '{event_type}'"
-                            )
-                            continue
-                        logger.info(f"Invoking handler {name} for message {msg_id}")
+                await task
+                await redis_client.xack(stream, group, msg_id)
+                logger.info(
+                    f"Acked message {msg_id} on stream {stream} and event_type {event_type}"
+                )
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    task.cancel()
+                    raise
+                logger.warning(f"Handler {name} cancelled for message {msg_id}")
+                await redis_client.xack(stream, group, msg_id)
+            except (DeadlineExceeded, CommandCancelled) as e:
+                # Nobody waits for the result anymore; drop the command.
+                logger.warning(f"Handler {name} stopped early for message {msg_id}: {e}")
+                await redis_client.xack(stream, group, msg_id)
+            except HandlerTimeout as e:
+                logger.error(f"Handler {name} abandoned message {msg_id}: {e}")
+                if execution_mode == "thread":
+                    try:
+                        await reply_skipped(fields, "failed", {"error": str(e)})
+                    except Exception as reply_err:
+                        logger.error(f"Failed to reply failed for message {msg_id}", exc_info=reply_err)
+                await redis_client.xack(stream, group, msg_id)
+            except Exception as e:
+                logger.error(f"Handler {name} failed for message {msg_id}", exc_info=e)
+                await failed(msg_id, fields, e)
+            finally:
+                limiter.release()
+                tasks = inflight.get(saga_id)
+                if tasks is not None:
+                    tasks.discard(task)
+                    if not tasks:
+                        del inflight[saga_id]
+
+        async def process_batch(msgs, foreign):
+            ack_ids, skipped, batch_ids, batch = list(foreign), [], [], []
+            cancelled = set()
+            if skip_stale:
+                cancelled = await cancelled_sagas(
+                    [fields.get("saga_id") for _, fields in msgs], redis_client=redis_client
+                )
+            for msg_id, fields in msgs:
+                if skip_stale and is_expired(fields):
+                    status, payload = EXPIRED_STATUS, {"deadline": fields.get("deadline")}
+                elif fields.get("saga_id") in cancelled:
+                    status, payload = CANCELLED_STATUS, {}
+                else:
+                    batch_ids.append(msg_id)
+                    batch.append(fields)
+                    continue
+                ack_ids.append(msg_id)
+                if fields.get("reply_stream"):
+                    skipped.append(reply_event(fields, status, payload))
+            if skipped:
+                logger.warning(f"Skipping {len(skipped)} expired or cancelled messages on stream {stream}")
+                try:
+                    await emit_events(skipped)
+                except Exception as e:
+                    logger.error(f"Failed to reply to {len(skipped)} skipped messages", exc_info=e)
+            if batch:
+                await limiter.acquire(priority)
+                try:
+                    logger.info(f"Invoking batch handler {name} for {len(batch)} messages")
+                    outcomes = await run_handler(handle_fn, execution_mode, max_runtime, batch)
+                    if outcomes is None:
+                        outcomes = [None] * len(batch)
+                    for msg_id, fields, outcome in zip(batch_ids, batch, outcomes):
+                        if isinstance(outcome, BaseException):
+                            logger.error(f"Handler {name} failed for message {msg_id}", exc_info=outcome)
+                            await failed(msg_id, fields, outcome)
+                        else:
+                            ack_ids.append(msg_id)
+                except HandlerTimeout as e:
+                    logger.error(f"Handler {name} abandoned {len(batch)} messages: {e}")
+                    if execution_mode == "thread":
                         try:
-                            logger.debug(
-                                f"Handling message {msg_id} on stream {stream} and event_type {event_type} with fields: {fields}"
+                            await emit_events(
+                                [reply_event(f, "failed", {"error": str(e)}) for f in batch if f.get("reply_stream")]
                             )
-                            await handle_fn(fields)
-                            await redis_client.xack(stream, group, msg_id)
-                            logger.info(
-                                f"Acked message {msg_id} on stream {stream} and event_type {event_type}"
-                            )
-                        except Exception as e:
-                            logger.error(f"Handler {name} failed for message {msg_id}", exc_info=e)
-            except Exception as e:
-                logger.error(f"Listener error in handler {name} for stream {stream}", exc_info=e)
-            await asyncio.sleep(0.1)
+                        except Exception as reply_err:
+                            logger.error("Failed to reply failed for abandoned batch", exc_info=reply_err)
+                    ack_ids.extend(batch_ids)
+                except Exception as e:
+                    logger.error(f"Batch handler {name} failed for {len(batch)} messages", exc_info=e)
+                    for msg_id, fields in zip(batch_ids, batch):
+                        await failed(msg_id, fields, e)
+                finally:
+                    limiter.release()
+            if ack_ids:
+                await redis_client.xack(stream, group, *ack_ids)
+                logger.info(f"Acked {len(ack_ids)} messages on stream {stream} in one XACK")
+
+        slots = asyncio.Semaphore(concurrency)
+        running = set()
+
+        def finished(task):
+            running.discard(task)
+            slots.release()
+            if not task.cancelled() and task.exception() is not None:
+                logger.error(f"Handler {name} message task failed", exc_info=task.exception())
+
+        logger.info(
+            f"Handler {name} listening on stream '{stream}', group '{group}' "
+            f"(mode={execution_mode}, concurrency={concurrency}, priority={priority})"
+        )
+        async def handle_entries(msgs):
+            # Parsed once here; handlers get the Envelope (a mapping of the raw fields).
+            # Reclaimed messages arrive as Envelopes already carrying their delivery.
+            msgs = [(msg_id, Envelope.from_entry(msg_id, fields, delivery=1)) for msg_id, fields in msgs]
+            # Other event types sharing the stream are never this group's work: acked
+            # right away (with the batch's own acks in batch mode) so they do not
+            # linger in the group's pending entries.
+            foreign = [msg_id for msg_id, fields in msgs if event_type and fields.event_type != event_type]
+            if foreign:
+                logger.debug(f"Skipping {len(foreign)} messages on stream {stream}: event_type != '{event_type}'")
+                msgs = [(msg_id, fields) for msg_id, fields in msgs if fields.event_type == event_type]
+            if options["batch"]:
+                await process_batch(msgs, foreign)
+                return
+            if foreign:
+                await redis_client.xack(stream, group, *foreign)
+            for msg_id, fields in msgs:
+                if concurrency == 1:
+                    await process_message(msg_id, fields)
+                    continue
+                await slots.acquire()
+                task = asyncio.create_task(process_message(msg_id, fields))
+                running.add(task)
+                task.add_done_callback(finished)
+
+        last_reclaim = asyncio.get_running_loop().time()
+        try:
+            while not shutdown_event.is_set():
+                if asyncio.get_running_loop().time() - last_reclaim >= REDELIVERY_BACKOFF:
+                    last_reclaim = asyncio.get_running_loop().time()
+                    try:
+                        retry = await reclaim_failed(redis_client, stream, group, CONSUMER_NAME)
+                        if retry:
+                            await handle_entries(retry)
+                    except Exception as e:
+                        logger.error(f"Failed to reclaim failed messages of stream {stream}", exc_info=e)
+                try:
+                    logger.debug(f"xreadgroup: group={group}, consumer={CONSUMER_NAME}, stream={stream}")
+                    entries = await redis_client.xreadgroup(
+                        groupname=group,
+                        consumername=CONSUMER_NAME,
+                        block=int(options["block_ms"]),
+                        count=int(options["batch_size"]),
+                        streams={stream: ">"},
+                    )
+                    for stream_name, msgs in entries:
+                        await handle_entries(msgs)
+                except Exception as e:
+                    logger.error(f"Listener error in handler {name} for stream {stream}", exc_info=e)
+                await asyncio.sleep(0.1)
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        finally:
+            for task in running:
+                task.cancel()
         logger.info(f"Handler {name} shutting down gracefully.")
 
-    await asyncio.gather(*(listen_handler(h) for h in handlers))
+    watcher = asyncio.create_task(
+        watch_cancellations(redis_client, cancel_inflight, shutdown_event)
+    )
+    background = [watcher]
+    streams = [h["stream"] for h in handlers if h.get("stream")]
+    if STREAM_TRIM_INTERVAL > 0 and streams:
+        background.append(asyncio.create_task(run_trimmer(redis_client, streams, shutdown_event)))
+    for handler in handlers:
+        if handler.get("background"):
+            background.append(asyncio.create_task(handler["background"](redis_client, shutdown_event)))
+    try:
+        await asyncio.gather(
+            *(listen_handler(h) for h in sorted(handlers, key=lambda h: -h.get("priority", 0)))
+        )
+    finally:
+        for task in background:
+            task.cancel()
+        shutdown_process_pool(wait=False)
     await redis_client.close()
     logger.info("All command listeners shut down gracefully.")
 
@@ -0,0 +1,270 @@
+import asyncio
+import concurrent.futures
+import importlib
+import inspect
+import logging
+import multiprocessing
+import os
+import queue
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PROCESS_POOL_WORKERS = int(os.environ.get("HANDLER_PROCESS_WORKERS", os.cpu_count() or 1))
+PROGRESS_POLL_INTERVAL = 0.05
+CANCEL_POLL_INTERVAL = 0.05
+
+_pool = None
+_manager = None
+
+
+class SharedArray:
+    """
+    Picklable reference to a NumPy array living in a shared memory segment.
+    Only the segment name, shape and dtype cross the process boundary.
+    """
+
+    __slots__ = ("name", "shape", "dtype")
+
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype).str
+
+    def __getstate__(self):
+        return (self.name, self.shape, self.dtype)
+
+    def __setstate__(self, state):
+        self.name, self.shape, self.dtype = state
+
+    def __repr__(self):
+        return f"SharedArray(name={self.name!r}, shape={self.shape}, dtype={self.dtype!r})"
+
+
+def share_array(array):
+    """
+    Copy an array into a new shared memory segment.
+    Returns (SharedMemory, SharedArray); the caller owns the segment and must unlink it.
+    """
+    array = np.asarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    view[...] = array
+    del view
+    return shm, SharedArray(shm.name, array.shape, array.dtype)
+
+
+def attach_array(ref):
+    """
+    Attach to a shared memory segment without copying.
+    Returns (SharedMemory, ndarray view); close the segment once the view is released.
+    """
+    shm = shared_memory.SharedMemory(name=ref.name)
+    return shm, np.ndarray(ref.shape, dtype=np.dtype(ref.dtype), buffer=shm.buf)
+
+
+def release_array(shm, unlink=False):
+    try:
+        shm.close()
+    except BufferError:
+        logger.warning(f"Shared memory segment {shm.name} still has exported views")
+    if unlink:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def get_process_pool():
+    """
+    Return the process pool used for CPU-bound handlers, creating it on first use.
+    """
+    global _pool
+    if _pool is None:
+        # Children must share the parent's resource tracker, otherwise each worker
+        # would unlink shared segments it attached to when it exits.
+        resource_tracker.ensure_running()
+        _pool = concurrent.futures.ProcessPoolExecutor(max_workers=PROCESS_POOL_WORKERS)
+        logger.info(f"Started handler process pool with {PROCESS_POOL_WORKERS} workers")
+    return _pool
+
+
+def _progress_queue():
+    # The manager (an extra server process) is only started once progress is relayed.
+    global _manager
+    if _manager is None:
+        _manager = multiprocessing.Manager()
+    return _manager.Queue()
+
+
+def shutdown_process_pool(wait=True):
+    global _pool, _manager
+    if _pool is not None:
+        _pool.shutdown(wait=wait, cancel_futures=True)
+        _pool = None
+        logger.info("Handler process pool shut down")
+    if _manager is not None:
+        _manager.shutdown()
+        _manager = None
+
+
+def _function_ref(func):
+    # Handlers are usually wrapped by decorators, so pickle by import path and
+    # resolve the module attribute inside the worker instead of pickling the object.
+    return func.__module__, func.__qualname__
+
+
+def _resolve_function(ref):
+    module_name, qualname = ref
+    obj = importlib.import_module(module_name)
+    for part in qualname.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+def _export_result(result):
+    if isinstance(result, np.ndarray):
+        shm, ref = share_array(result)
+        shm.close()
+        return ref
+    if isinstance(result, dict):
+        return {key: _export_result(value) for key, value in result.items()}
+    return result
+
+
+def _import_result(result):
+    if isinstance(result, SharedArray):
+        shm, view = attach_array(result)
+        try:
+            return view.copy()
+        finally:
+            del view
+            release_array(shm, unlink=True)
+    if isinstance(result, dict):
+        return {key: _import_result(value) for key, value in result.items()}
+    return result
+
+
+def _accepts(func, name):
+    # Own parameters only: a decorator wrapper taking **kwargs (such as
+    # multi_stage_reply, which injects its own progress) does not accept name.
+    return name in inspect.signature(func, follow_wrapped=False).parameters
+
+
+async def _run_cancellable(coro, cancel_flag):
+    task = asyncio.ensure_future(coro)
+    while not task.done():
+        await asyncio.wait({task}, timeout=CANCEL_POLL_INTERVAL)
+        if cancel_flag.buf[0] and not task.done():
+            task.cancel()
+    try:
+        return task.result()
+    except asyncio.CancelledError:
+        return None
+
+
+def _worker(func_ref, args, kwargs, array_refs, progress_queue, cancel_name):
+    """
+    Entry point executed inside a pool process.
+    """
+    func = _resolve_function(func_ref)
+    attached = []
+    try:
+        try:
+            cancel_flag = shared_memory.SharedMemory(name=cancel_name)
+        except FileNotFoundError:
+            # The caller gave up (and unlinked the flag) before this run started.
+            return None
+        attached.append(cancel_flag)
+        if cancel_flag.buf[0]:
+            return None
+        if array_refs is not None:
+            arrays = {}
+            for key, ref in array_refs.items():
+                shm, view = attach_array(ref)
+                attached.append(shm)
+                arrays[key] = view
+            kwargs = {**kwargs, "arrays": arrays}
+        if progress_queue is not None:
+            def progress(fraction, payload=None):
+                progress_queue.put((fraction, payload))
+
+            kwargs = {**kwargs, "progress": progress}
+        if inspect.iscoroutinefunction(func):
+            result = asyncio.run(_run_cancellable(func(*args, **kwargs), cancel_flag))
+        else:
+            result = func(*args, **kwargs)
+        return _export_result(result)
+    finally:
+        kwargs = None
+        arrays = None
+        cancel_flag = None
+        for shm in attached:
+            release_array(shm)
+
+
+async def _relay_progress(progress_queue, progress, future):
+    while True:
+        try:
+            fraction, payload = progress_queue.get_nowait()
+        except queue.Empty:
+            if future.done():
+                return
+            await asyncio.sleep(PROGRESS_POLL_INTERVAL)
+            continue
+        await progress(fraction, payload)
+
+
+async def run_in_process(func, *args, arrays=None, progress=None, **kwargs):
+    """
+    Run a CPU-bound function in the handler process pool without blocking the event loop.
+
+    func must be importable by module and qualified name. Sync functions run directly,
+    async ones (such as multi_stage_reply-wrapped handlers) run on a fresh loop in the worker.
+    arrays: optional dict of NumPy arrays passed through shared memory as the 'arrays' kwarg.
+    progress: optional async callback (fraction, payload) for a func declaring a 'progress'
+    parameter; the worker passes it a sync callback whose calls are relayed back here.
+    (multi_stage_reply-wrapped handlers emit their own progress from the worker.)
+    NumPy arrays in the result (top-level or dict values) are returned through shared memory.
+    Cancelling the call cancels an async func in the worker at its next await (it sees
+    asyncio.CancelledError); a sync func runs to completion and its result is dropped.
+    """
+    if progress is not None and not _accepts(func, "progress"):
+        raise TypeError(f"{func.__qualname__} does not take a 'progress' argument")
+    pool = get_process_pool()
+    loop = asyncio.get_running_loop()
+    cancel_flag = shared_memory.SharedMemory(create=True, size=1)
+    cancel_flag.buf[0] = 0
+    owned = [cancel_flag]
+    array_refs = None
+    if arrays is not None:
+        array_refs = {}
+        for key, array in arrays.items():
+            shm, ref = share_array(array)
+            owned.append(shm)
+            array_refs[key] = ref
+    progress_queue = _progress_queue() if progress is not None else None
+    try:
+        future = loop.run_in_executor(
+            pool,
+            _worker,
+            _function_ref(func),
+            args,
+            kwargs,
+            array_refs,
+            progress_queue,
+            cancel_flag.name,
+        )
+        try:
+            if progress_queue is not None:
+                await _relay_progress(progress_queue, progress, future)
+            result = await future
+        except asyncio.CancelledError:
+            cancel_flag.buf[0] = 1
+            raise
+        return _import_result(result)
+    finally:
+        for shm in owned:
+            release_array(shm, unlink=True)
@@ -0,0 +1,384 @@
+import logging
+import os
+
+from app.redis_utils.client import get_redis_client
+from app.redis_utils.transport import Script, memory_script
+
+logger = logging.getLogger(__name__)
+
+# All fleet keys share the {fleet} hash tag, so they map to one slot. The scripts
+# derive robot and capability index keys from ARGV instead of declaring them all in
+# KEYS, so they are meant for a standalone (single-shard) Redis, not Redis Cluster.
+FLEET_PREFIX = "{fleet}"
+ROBOTS_KEY = f"{FLEET_PREFIX}:robots"
+# Robots the command listener registers at startup (see seed_fleet): a count ("50":
+# robot-1..robot-50 at battery 100, no capabilities) or comma-separated
+# id:battery[:cap+cap...] entries, e.g. "r1:90:lidar+camera,r2:75". Empty: none.
+FLEET_ROBOTS = os.environ.get("FLEET_ROBOTS", "")
+AVAILABLE_KEY = f"{FLEET_PREFIX}:available"
+
+
+def robot_key(robot_id):
+    return f"{FLEET_PREFIX}:robot:{robot_id}"
+
+
+def capability_key(capability):
+    return f"{FLEET_PREFIX}:available:cap:{capability}"
+
+
+def allocation_key(saga_id):
+    return f"{FLEET_PREFIX}:allocation:{saga_id}"
+
+
+def candidates_key(saga_id):
+    # Scratch set of an allocation asking for several capabilities; deleted by the script.
+    return f"{FLEET_PREFIX}:candidates:{saga_id}"
+
+
+# Shared Lua helpers: a robot is indexed in the availability set and in one
+# availability set per capability, each scored by battery level.
+_INDEX_LUA = """
+local function index_robot(prefix, robot_id, battery, caps)
+    redis.call('ZADD', prefix .. ':available', battery, robot_id)
+    for cap in string.gmatch(caps or '', '[^,]+') do
+        redis.call('ZADD', prefix .. ':available:cap:' .. cap, battery, robot_id)
+    end
+end
+
+local function unindex_robot(prefix, robot_id, caps)
+    redis.call('ZREM', prefix .. ':available', robot_id)
+    for cap in string.gmatch(caps or '', '[^,]+') do
+        redis.call('ZREM', prefix .. ':available:cap:' .. cap, robot_id)
+    end
+end
+"""
+
+# KEYS: robots, robot hash
+# ARGV: prefix, robot_id, battery, capabilities (comma separated)
+REGISTER_LUA = _INDEX_LUA + """
+local prefix, robot_id, battery, caps = ARGV[1], ARGV[2], tonumber(ARGV[3]), ARGV[4]
+local old_caps = redis.call('HGET', KEYS[2], 'capabilities')
+local status = redis.call('HGET', KEYS[2], 'status')
+if old_caps then
+    unindex_robot(prefix, robot_id, old_caps)
+end
+redis.call('SADD', KEYS[1], robot_id)
+redis.call('HSET', KEYS[2], 'battery', battery, 'capabilities', caps)
+if status ~= 'allocated' then
+    redis.call('HSET', KEYS[2], 'status', 'available')
+    index_robot(prefix, robot_id, battery, caps)
+end
+return 1
+"""
+
+# KEYS: robots, robot hash
+# ARGV: prefix, robot_id
+UNREGISTER_LUA = _INDEX_LUA + """
+local prefix, robot_id = ARGV[1], ARGV[2]
+local caps = redis.call('HGET', KEYS[2], 'capabilities')
+local saga_id = redis.call('HGET', KEYS[2], 'saga_id')
+unindex_robot(prefix, robot_id, caps)
+if saga_id then
+    redis.call('SREM', prefix .. ':allocation:' .. saga_id, robot_id)
+end
+redis.call('SREM', KEYS[1], robot_id)
+return redis.call('DEL', KEYS[2])
+"""
+
+# KEYS: allocation, candidates (scratch), one availability index per requested
+#       capability (or the availability set if none)
+# ARGV: prefix, saga_id, count, min_battery
+# Returns the allocated robot ids, the existing allocation for a repeated saga_id,
+# or false when not enough robots match (including when no robot is registered).
+ALLOCATE_LUA = _INDEX_LUA + """
+local prefix, saga_id = ARGV[1], ARGV[2]
+local count, min_battery = tonumber(ARGV[3]), ARGV[4]
+if count <= 0 then
+    return {}
+end
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('SMEMBERS', KEYS[1])
+end
+local index = KEYS[3]
+if #KEYS > 3 then
+    -- Robots indexed under every requested capability, scored by battery.
+    local inter = {'ZINTERSTORE', KEYS[2], #KEYS - 2}
+    for i = 3, #KEYS do
+        inter[#inter + 1] = KEYS[i]
+    end
+    inter[#inter + 1] = 'AGGREGATE'
+    inter[#inter + 1] = 'MAX'
+    redis.call(unpack(inter))
+    index = KEYS[2]
+end
+local selected = redis.call('ZREVRANGEBYSCORE', index, '+inf', min_battery, 'LIMIT', 0, count)
+if index == KEYS[2] then
+    redis.call('DEL', KEYS[2])
+end
+if #selected < count then
+    return false
+end
+for _, robot_id in ipairs(selected) do
+    local robot = prefix .. ':robot:' .. robot_id
+    unindex_robot(prefix, robot_id, redis.call('HGET', robot, 'capabilities'))
+    redis.call('HSET', robot, 'status', 'allocated', 'saga_id', saga_id)
+end
+redis.call('SADD', KEYS[1], unpack(selected))
+return selected
+"""
+
+# KEYS: allocation
+# ARGV: prefix, saga_id
+# Returns the released robot ids; releasing an unknown saga_id is a no-op.
+RELEASE_LUA = _INDEX_LUA + """
+local prefix, saga_id = ARGV[1], ARGV[2]
+local robots = redis.call('SMEMBERS', KEYS[1])
+for _, robot_id in ipairs(robots) do
+    local robot = prefix .. ':robot:' .. robot_id
+    if redis.call('HGET', robot, 'saga_id') == saga_id then
+        redis.call('HSET', robot, 'status', 'available')
+        redis.call('HDEL', robot, 'saga_id')
+        local fields = redis.call('HMGET', robot, 'battery', 'capabilities')
+        index_robot(prefix, robot_id, tonumber(fields[1]), fields[2])
+    end
+end
+redis.call('DEL', KEYS[1])
+return robots
+"""
+
+
+def _capabilities(caps):
+    return [cap for cap in (caps or "").split(",") if cap]
+
+
+async def _index_in_memory(transport, prefix, robot_id, battery, caps):
+    await transport.zadd(f"{prefix}:available", {robot_id: battery})
+    for cap in _capabilities(caps):
+        await transport.zadd(f"{prefix}:available:cap:{cap}", {robot_id: battery})
+
+
+async def _unindex_in_memory(transport, prefix, robot_id, caps):
+    await transport.zrem(f"{prefix}:available", robot_id)
+    for cap in _capabilities(caps):
+        await transport.zrem(f"{prefix}:available:cap:{cap}", robot_id)
+
+
+@memory_script(REGISTER_LUA)
+async def _register_in_memory(transport, keys, args):
+    robots, robot = keys
+    prefix, robot_id, battery, caps = args
+    current = await transport.hgetall(robot)
+    if "capabilities" in current:
+        await _unindex_in_memory(transport, prefix, robot_id, current["capabilities"])
+    await transport.sadd(robots, robot_id)
+    await transport.hset(robot, mapping={"battery": battery, "capabilities": caps})
+    if current.get("status") != "allocated":
+        await transport.hset(robot, "status", "available")
+        await _index_in_memory(transport, prefix, robot_id, float(battery), caps)
+    return 1
+
+
+@memory_script(UNREGISTER_LUA)
+async def _unregister_in_memory(transport, keys, args):
+    robots, robot = keys
+    prefix, robot_id = args
+    current = await transport.hgetall(robot)
+    await _unindex_in_memory(transport, prefix, robot_id, current.get("capabilities"))
+    if current.get("saga_id"):
+        await transport.srem(f"{prefix}:allocation:{current['saga_id']}", robot_id)
+    await transport.srem(robots, robot_id)
+    return await transport.delete(robot)
+
+
+@memory_script(ALLOCATE_LUA)
+async def _allocate_in_memory(transport, keys, args):
+    allocation, _, *indexes = keys
+    prefix, saga_id, count, min_battery = args
+    count = int(count)
+    if count <= 0:
+        return []
+    if await transport.exists(allocation):
+        return list(await transport.smembers(allocation))
+    candidates = None
+    for index in indexes:
+        scored = dict(await transport.zrangebyscore(index, min_battery, "+inf", withscores=True))
+        candidates = scored if candidates is None else {
+            robot_id: battery for robot_id, battery in candidates.items() if robot_id in scored
+        }
+    selected = sorted(candidates, key=lambda robot_id: (candidates[robot_id], robot_id), reverse=True)[:count]
+    if len(selected) < count:
+        return None
+    for robot_id in selected:
+        robot = f"{prefix}:robot:{robot_id}"
+        await _unindex_in_memory(transport, prefix, robot_id, await transport.hget(robot, "capabilities"))
+        await transport.hset(robot, mapping={"status": "allocated", "saga_id": saga_id})
+    await transport.sadd(allocation, *selected)
+    return selected
+
+
+@memory_script(RELEASE_LUA)
+async def _release_in_memory(transport, keys, args):
+    (allocation,) = keys
+    prefix, saga_id = args
+    robots = list(await transport.smembers(allocation))
+    for robot_id in robots:
+        robot = f"{prefix}:robot:{robot_id}"
+        current = await transport.hgetall(robot)
+        if current.get("saga_id") == saga_id:
+            await transport.hset(robot, "status", "available")
+            await transport.hdel(robot, "saga_id")
+            await _index_in_memory(transport, prefix, robot_id, float(current["battery"]), current.get("capabilities"))
+    await transport.delete(allocation)
+    return robots
+
+
+_register_script = Script(REGISTER_LUA)
+_unregister_script = Script(UNREGISTER_LUA)
+_allocate_script = Script(ALLOCATE_LUA)
+_release_script = Script(RELEASE_LUA)
+
+
+class InsufficientRobotsError(RuntimeError):
+    pass
+
+
+async def register_robot(robot_id, battery, capabilities=(), redis_client=None):
+    """
+    Add or update a robot in the fleet registry. Allocated robots keep their
+    allocation and are re-indexed on release.
+    """
+    r = redis_client or get_redis_client()
+    await _register_script(
+        keys=[ROBOTS_KEY, robot_key(robot_id)],
+        args=[FLEET_PREFIX, robot_id, battery, ",".join(capabilities)],
+        client=r,
+    )
+    logger.info(f"Registered robot {robot_id} battery={battery} capabilities={capabilities}")
+
+
+async def unregister_robot(robot_id, redis_client=None):
+    """
+    Remove a robot from the registry, its indexes and any allocation holding it.
+    """
+    r = redis_client or get_redis_client()
+    await _unregister_script(keys=[ROBOTS_KEY, robot_key(robot_id)], args=[FLEET_PREFIX, robot_id], client=r)
+    logger.info(f"Unregistered robot {robot_id}")
+
+
+async def allocate_robots(saga_id, count, min_battery=0, capabilities=(), redis_client=None):
+    """
+    Atomically select and reserve count available robots for saga_id in one round trip.
+
+    Robots are picked by highest battery among those with battery >= min_battery and
+    every requested capability (the intersection of the capability indexes, so the
+    scan never visits robots lacking one). Repeating the call for the same saga_id
+    returns the existing allocation. Returns a list of robot ids ([] for count <= 0).
+    Raises InsufficientRobotsError if not enough robots match, including when no
+    robot is registered at all.
+    """
+    r = redis_client or get_redis_client()
+    capabilities = list(capabilities)
+    indexes = [capability_key(capability) for capability in capabilities] or [AVAILABLE_KEY]
+    robots = await _allocate_script(
+        keys=[allocation_key(saga_id), candidates_key(saga_id), *indexes],
+        args=[FLEET_PREFIX, saga_id, int(count), min_battery],
+        client=r,
+    )
+    if robots is None:
+        raise InsufficientRobotsError(
+            f"Saga[{saga_id}]: not enough robots for count={count}, "
+            f"min_battery={min_battery}, capabilities={capabilities}"
+        )
+    logger.info(f"Saga[{saga_id}]: allocated robots {robots}")
+    return list(robots)
+
+
+async def release_robots(saga_id, redis_client=None):
+    """
+    Atomically return the robots allocated to saga_id to the available pool.
+    Idempotent: releasing twice (or an unknown saga) releases nothing.
+    """
+    r = redis_client or get_redis_client()
+    robots = await _release_script(keys=[allocation_key(saga_id)], args=[FLEET_PREFIX, saga_id], client=r)
+    logger.info(f"Saga[{saga_id}]: released robots {robots}")
+    return list(robots)
+
+
+async def release_robots_batch(saga_ids, redis_client=None):
+    """
+    release_robots for many sagas in one pipelined round trip (each release stays atomic).
+    Returns the released robot ids per saga, in order.
+    """
+    r = redis_client or get_redis_client()
+    async with r.pipeline(transaction=False) as pipe:
+        for saga_id in saga_ids:
+            await _release_script(keys=[allocation_key(saga_id)], args=[FLEET_PREFIX, saga_id], client=pipe)
+        results = await pipe.execute()
+    logger.info(f"Released robots of {len(results)} sagas")
+    return [list(robots) for robots in results]
+
+
+def parse_fleet(spec):
+    """
+    (robot_id, battery, capabilities) of each robot of a FLEET_ROBOTS spec.
+    """
+    spec = (spec or "").strip()
+    if not spec:
+        return []
+    if spec.isdigit():
+        return [(f"robot-{n}", 100, ()) for n in range(1, int(spec) + 1)]
+    robots = []
+    for entry in spec.split(","):
+        robot_id, _, rest = entry.strip().partition(":")
+        battery, _, caps = rest.partition(":")
+        if not robot_id:
+            raise ValueError(f"Invalid fleet entry {entry!r} in {spec!r}")
+        robots.append((robot_id, float(battery) if battery else 100, tuple(cap for cap in caps.split("+") if cap)))
+    return robots
+
+
+async def seed_fleet(spec, redis_client=None):
+    """
+    Register the robots of a FLEET_ROBOTS spec in one pipelined round trip (each
+    registration stays atomic). Returns the registered robot ids.
+    """
+    robots = parse_fleet(spec)
+    if not robots:
+        return []
+    r = redis_client or get_redis_client()
+    async with r.pipeline(transaction=False) as pipe:
+        for robot_id, battery, capabilities in robots:
+            await _register_script(
+                keys=[ROBOTS_KEY, robot_key(robot_id)],
+                args=[FLEET_PREFIX, robot_id, battery, ",".join(capabilities)],
+                client=pipe,
+            )
+        await pipe.execute()
+    logger.info(f"Seeded fleet with {len(robots)} robots")
+    return [robot_id for robot_id, _, _ in robots]
+
+
+async def seed_fleet_on_startup(redis_client, shutdown_event):
+    """
+    Listener background task (see the allocate_resources handler): register the
+    FLEET_ROBOTS robots once when the listener starts.
+    """
+    if not FLEET_ROBOTS:
+        return
+    try:
+        await seed_fleet(FLEET_ROBOTS, redis_client=redis_client)
+    except Exception as e:
+        logger.error(f"Failed to seed the fleet from FLEET_ROBOTS={FLEET_ROBOTS!r}", exc_info=e)
+
+
+async def list_robots(redis_client=None):
+    """
+    Return {robot_id: robot hash} of every registered robot.
+    """
+    r = redis_client or get_redis_client()
+    robot_ids = sorted(await r.smembers(ROBOTS_KEY))
+    async with r.pipeline(transaction=False) as pipe:
+        for robot_id in robot_ids:
+            pipe.hgetall(robot_key(robot_id))
+        robots = await pipe.execute()
+    return dict(zip(robot_ids, robots))
@@ -1,17 +1,20 @@
 import logging
 import uuid
 
+from app.fleet.registry import release_robots
+from app.redis_utils.cancellation import cancel_saga
 from app.redis_utils.replies import request_and_reply
 
 logger = logging.getLogger(__name__)
 
 
 async def compensate_allocate_resources(saga_id, correlation_id, **ctx):
-    """Async compensation for allocate_resources step."""
+    """Async compensation for allocate_resources step: return the saga's robots."""
     logger.info(
         f"Saga[{saga_id}]: Compensating allocate_resources (correlation_id={correlation_id})"
     )
-    return {"compensated": True, "correlation_id": correlation_id}
+    robots = await release_robots(saga_id)
+    return {"compensated": True, "released": robots, "correlation_id": correlation_id}
 
 
 async def compensate_plan_route(saga_id, correlation_id, **ctx):
@@ -39,18 +42,21 @@ async def compensate_integrate_maps(saga_id, correlation_id, **ctx):
 
 
 async def compensate_release_resources(saga_id, correlation_id, **ctx):
-    """Async compensation for release_resources step."""
+    """Async compensation for release_resources step (release_robots is idempotent)."""
     logger.info(
         f"Saga[{saga_id}]: Releasing allocated robots (correlation_id={correlation_id})"
     )
-    return {"released": True, "correlation_id": correlation_id}
+    robots = await release_robots(saga_id)
+    return {"released": robots, "correlation_id": correlation_id}
 
 
-async def run_saga(robot_count, area, correlation_id, fail_steps=None):
+async def run_saga(robot_count, area, correlation_id, fail_steps=None, deadline=None):
     """
     Run the mission start saga as a pure-async workflow.
     Sequentially awaits request_and_reply for each step.
-    On failure, triggers inline compensation in reverse order.
+    On failure, cancels the saga so handlers still working on it stop early,
+    then triggers inline compensation in reverse order.
+    deadline: optional saga-wide epoch deadline propagated to every step command.
     """
     saga_id = str(uuid.uuid4())[:8]
     completed_steps = []
@@ -66,6 +72,7 @@ async def run_saga(robot_count, area, correlation_id, fail_steps=None):
             event_type="resources:allocate",
             payload={"robots_allocated": robot_count},
             timeout=3,
+            deadline=deadline,
         )
         completed_steps.append("allocate_resources")
 
@@ -79,6 +86,7 @@ async def run_saga(robot_count, area, correlation_id, fail_steps=None):
             saga_id=saga_id,
             event_type="routing:plan",
             payload={"route": f"Route for {area}"},
+            deadline=deadline,
         )
         completed_steps.append("plan_route")
 
@@ -92,6 +100,7 @@ async def run_saga(robot_count, area, correlation_id, fail_steps=None):
             saga_id=saga_id,
             event_type="exploration:perform",
             payload={"exploration_result": "success"},
+            deadline=deadline,
         )
         completed_steps.append("perform_exploration")
 
@@ -105,6 +114,7 @@ async def run_saga(robot_count, area, correlation_id, fail_steps=None):
             saga_id=saga_id,
             event_type="map:integrate",
             payload={"final_map": "integrated_map"},
+            deadline=deadline,
         )
         completed_steps.append("integrate_maps")
 
@@ -112,16 +122,21 @@ async def run_saga(robot_count, area, correlation_id, fail_steps=None):
             f"Saga[{saga_id}]: Releasing allocated robots (correlation_id={correlation_id})"
         )
         await request_and_reply(
-            command_stream="release_resources",
-            response_prefix="release_resources_reply",
+            command_stream="resources:commands",
+            response_prefix="resources:replies",
             correlation_id=correlation_id,
             saga_id=saga_id,
-            event_type="release_resources",
+            event_type="resources:release",
             payload={},
+            deadline=deadline,
         )
         completed_steps.append("release_resources")
 
-    except Exception:
+    except Exception as e:
+        try:
+            await cancel_saga(saga_id, reason=f"{type(e).__name__}: {e}")
+        except Exception as cancel_err:
+            logger.error(f"Saga[{saga_id}]: failed to cancel", exc_info=cancel_err)
         # Inline compensation in reverse order
         for step in reversed(completed_steps):
             if step == "release_resources":
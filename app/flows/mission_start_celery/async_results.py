@@ -0,0 +1,157 @@
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import os
+
+import redis.asyncio as redis
+from celery import states
+
+logger = logging.getLogger(__name__)
+
+# Publishing a canvas is a blocking kombu call; it runs on this small dedicated pool
+# so saga dispatch never competes with asyncio.to_thread users for default-executor threads.
+DISPATCH_WORKERS = int(os.environ.get("CELERY_DISPATCH_WORKERS", 4))
+# How long the pub/sub reader blocks per poll while waiters are registered.
+READ_TIMEOUT = 1.0
+
+_dispatch_executor = None
+_listener = None
+
+
+def _get_dispatch_executor():
+    global _dispatch_executor
+    if _dispatch_executor is None:
+        _dispatch_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=DISPATCH_WORKERS, thread_name_prefix="celery-dispatch"
+        )
+    return _dispatch_executor
+
+
+async def apply_async(signature, **options):
+    """
+    Publish a task signature or canvas without blocking the event loop.
+    Returns the AsyncResult of the canvas (the last task for a chain).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_dispatch_executor(), functools.partial(signature.apply_async, **options)
+    )
+
+
+class ResultListener:
+    """
+    Awaits Celery results through the Redis result backend's pub/sub notifications.
+
+    The Redis backend publishes every stored result on a channel named like its key
+    (celery-task-meta-<task_id>). All waiters share one pub/sub connection and one
+    reader task, so a single event loop can track hundreds of sagas; the reader only
+    runs while somebody is waiting.
+    """
+
+    def __init__(self, backend, redis_client=None):
+        self.backend = backend
+        self.redis = redis_client or redis.Redis.from_url(backend.as_uri(include_password=True))
+        self._pubsub = None
+        self._reader = None
+        self._waiters = {}
+        # PubSub sets up its connection lazily on the first command; serialize
+        # (un)subscribe calls so concurrent waiters share that one connection.
+        self._lock = asyncio.Lock()
+
+    def _resolve(self, channel, raw):
+        meta = self.backend.decode_result(raw)
+        if meta.get("status") not in states.READY_STATES:
+            return
+        for future in self._waiters.get(channel, ()):
+            if not future.done():
+                future.set_result(meta)
+
+    async def _read(self):
+        while self._waiters:
+            try:
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=READ_TIMEOUT
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Result listener read error", exc_info=e)
+                for futures in self._waiters.values():
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(e)
+                return
+            if message and message["type"] == "message":
+                self._resolve(message["channel"], message["data"])
+
+    async def _subscribe(self, channel, future):
+        if self._pubsub is None:
+            self._pubsub = self.redis.pubsub()
+        waiters = self._waiters.setdefault(channel, set())
+        waiters.add(future)
+        if len(waiters) == 1:
+            async with self._lock:
+                await self._pubsub.subscribe(channel)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read())
+
+    async def _unsubscribe(self, channel, future):
+        waiters = self._waiters.get(channel)
+        if waiters is None:
+            return
+        waiters.discard(future)
+        if not waiters:
+            del self._waiters[channel]
+            async with self._lock:
+                await self._pubsub.unsubscribe(channel)
+
+    async def wait(self, task_id, timeout=None):
+        """
+        Wait for the result of task_id and return it.
+        Raises the task's exception if it failed (or was revoked) and
+        asyncio.TimeoutError if no result arrives within timeout.
+        """
+        channel = self.backend.get_key_for_task(task_id)
+        future = asyncio.get_running_loop().create_future()
+        await self._subscribe(channel, future)
+        try:
+            # The result may have been stored before the subscription was active.
+            raw = await self.redis.get(channel)
+            if raw is not None:
+                self._resolve(channel, raw)
+            meta = await asyncio.wait_for(future, timeout)
+        finally:
+            await self._unsubscribe(channel, future)
+        if meta["status"] == states.SUCCESS:
+            return meta["result"]
+        error = meta.get("result")
+        if isinstance(error, BaseException):
+            raise error
+        raise RuntimeError(f"Task {task_id} finished with state {meta['status']}: {error}")
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+        if self._pubsub is not None:
+            await self._pubsub.reset()
+        self._pubsub = None
+        self._reader = None
+
+
+def get_result_listener(backend):
+    """
+    Return the shared ResultListener for backend in the running event loop.
+    """
+    global _listener
+    loop = asyncio.get_running_loop()
+    if _listener is None or _listener[0] is not loop or _listener[1].backend is not backend:
+        _listener = (loop, ResultListener(backend))
+    return _listener[1]
+
+
+async def await_result(result, timeout=None):
+    """
+    Await a Celery AsyncResult (e.g. of a saga chain) without polling or blocking threads.
+    """
+    return await get_result_listener(result.backend).wait(result.id, timeout=timeout)
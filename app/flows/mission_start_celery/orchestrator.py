@@ -1,7 +1,7 @@
-import asyncio
 import uuid
 import logging
 from celery import chain
+from app.flows.mission_start_celery.async_results import apply_async, await_result
 from app.flows.mission_start_celery.tasks import (
     allocate_resources,
     plan_route,
@@ -18,10 +18,12 @@ setup_logging()
 logger = logging.getLogger(__name__)
 
 
-async def run_saga(robot_count, area, correlation_id, fail_steps=None):
+async def run_saga(robot_count, area, correlation_id, fail_steps=None, wait=False, timeout=None):
     """
     fail_steps: optional set/list of step names to force failure for testing, e.g. {"allocate_resources"}
     correlation_id: required, must be passed from orchestrator_listener
+    Returns the AsyncResult of the dispatched chain, or with wait=True awaits the chain
+    result (via result backend notifications) and returns it, raising if a step failed.
     """
     saga_id = str(uuid.uuid4())[:8]
     fail_steps = set(fail_steps or [])
@@ -30,24 +32,29 @@ async def run_saga(robot_count, area, correlation_id, fail_steps=None):
     )
 
     # Build the main saga chain using Celery Canvas with compensation via link_error
-    # All tasks must receive correlation_id and saga_id as first arguments
-    allocate = allocate_resources.s(correlation_id, saga_id, robot_count).set(
-        link_error=release_resources.si(correlation_id, saga_id)
+    # All tasks must receive correlation_id and saga_id as first arguments.
+    # Only the final step stores a result (it completes the chain, and a failure is
+    # propagated to it); every other step and compensation skips the result backend.
+    def step(task, *args):
+        return task.si(correlation_id, saga_id, *args).set(ignore_result=True)
+
+    allocate = step(allocate_resources, robot_count).set(
+        link_error=step(release_resources)
     )
-    plan = plan_route.si(correlation_id, saga_id, area).set(
-        link_error=release_resources.si(correlation_id, saga_id)
+    plan = step(plan_route, area).set(
+        link_error=step(release_resources)
     )
-    explore = perform_exploration.si(correlation_id, saga_id, robot_count).set(
+    explore = step(perform_exploration, robot_count).set(
         link_error=chain(
-            abort_exploration.si(correlation_id, saga_id),
-            release_resources.si(correlation_id, saga_id)
+            step(abort_exploration),
+            step(release_resources)
         )
     )
-    integrate = integrate_maps.si(correlation_id, saga_id).set(
+    integrate = step(integrate_maps).set(
         link_error=chain(
-            rollback_integration.si(correlation_id, saga_id),
-            abort_exploration.si(correlation_id, saga_id),
-            release_resources.si(correlation_id, saga_id)
+            step(rollback_integration),
+            step(abort_exploration),
+            step(release_resources)
         )
     )
     saga_chain = chain(
@@ -59,6 +66,8 @@ async def run_saga(robot_count, area, correlation_id, fail_steps=None):
     )
 
     logger.info(f"Saga[{saga_id}]: Canvas chain dispatched with compensation.")
-    result = await asyncio.to_thread(saga_chain.apply_async, expires=1000)
+    result = await apply_async(saga_chain, expires=1000)
     logger.info(f"Saga[{saga_id}]: Saga dispatched, Celery job is {result}")
+    if wait:
+        return await await_result(result, timeout=timeout)
     return result
@@ -0,0 +1,56 @@
+import logging
+import os
+import time
+
+from app.redis_utils.client import get_sync_redis_client
+
+logger = logging.getLogger(__name__)
+
+SAGA_STATUS_KEY_PREFIX = "saga:status:"
+SAGA_STATUS_TTL = int(os.environ.get("SAGA_STATUS_TTL_SECONDS", 3600))
+
+_client = None
+
+
+def saga_status_key(saga_id):
+    return f"{SAGA_STATUS_KEY_PREFIX}{saga_id}"
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        _client = get_sync_redis_client()
+    return _client
+
+
+def record_saga_step(saga_id, correlation_id, step, state, error=None, redis_client=None):
+    """
+    Record the state of one saga step in the saga summary hash.
+
+    The hash holds one field per step (started/succeeded/failed) plus last_step,
+    updated_at and, after a failure, failed_step and error; it expires SAGA_STATUS_TTL
+    seconds after the last update. Written in one pipelined round trip.
+    """
+    r = redis_client or _get_client()
+    key = saga_status_key(saga_id)
+    mapping = {
+        step: state,
+        "last_step": step,
+        "correlation_id": correlation_id,
+        "updated_at": f"{time.time():.3f}",
+    }
+    if error is not None:
+        mapping["failed_step"] = step
+        mapping["error"] = str(error)[:512]
+    pipe = r.pipeline(transaction=False)
+    pipe.hset(key, mapping=mapping)
+    pipe.expire(key, SAGA_STATUS_TTL)
+    pipe.execute()
+
+
+def get_saga_status(saga_id, redis_client=None):
+    """
+    Return the saga summary hash as a dict ({} if unknown or expired).
+    """
+    r = redis_client or _get_client()
+    return r.hgetall(saga_status_key(saga_id))
@@ -1,7 +1,11 @@
 import asyncio
 import logging
 
+from celery.signals import task_failure, task_prerun, task_success
+
 from app.celery_app import celery_app
+from app.fleet.registry import release_robots
+from app.flows.mission_start_celery.status import record_saga_step
 from app.logging_config import setup_logging
 from app.redis_utils import request_and_reply
 
@@ -10,6 +14,32 @@ setup_logging()
 logger = logging.getLogger(__name__)
 
 
+def _record_step(task, args, state, error=None):
+    # Every saga task takes (correlation_id, saga_id, ...) as its first arguments.
+    if task is None or not task.name.startswith(f"{__name__}.") or len(args or ()) < 2:
+        return
+    correlation_id, saga_id = args[0], args[1]
+    try:
+        record_saga_step(saga_id, correlation_id, task.name.rsplit(".", 1)[-1], state, error=error)
+    except Exception as e:
+        logger.warning(f"Saga[{saga_id}]: failed to record {task.name} {state}: {e}")
+
+
+@task_prerun.connect
+def saga_step_started(task_id=None, task=None, args=None, **kwargs):
+    _record_step(task, args, "started")
+
+
+@task_success.connect
+def saga_step_succeeded(sender=None, **kwargs):
+    _record_step(sender, sender.request.args if sender else None, "succeeded")
+
+
+@task_failure.connect
+def saga_step_failed(sender=None, args=None, exception=None, **kwargs):
+    _record_step(sender, args, "failed", error=exception)
+
+
 @celery_app.task
 def allocate_resources(correlation_id, saga_id, robot_count):
     logger.info(
@@ -91,7 +121,8 @@ def release_resources(correlation_id, saga_id):
     logger.info(
         f"Saga[{saga_id}]: Releasing allocated robots (correlation_id={correlation_id})"
     )
-    return {"released": True, "correlation_id": correlation_id}
+    robots = asyncio.run(release_robots(saga_id))
+    return {"released": robots, "correlation_id": correlation_id}
 
 
 @celery_app.task
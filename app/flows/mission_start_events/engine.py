@@ -0,0 +1,382 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import namedtuple
+
+from app.flows.mission_start_async import orchestrator as async_orchestrator
+from app.redis_utils.blobs import load_payload
+from app.redis_utils.cancellation import CANCELLED_STATUS, cancel_saga
+from app.redis_utils.client import get_redis_client
+from app.redis_utils.commands import command_fields
+from app.redis_utils.deadlines import deadline_after
+from app.redis_utils.replies import TERMINAL_STATUSES
+from app.redis_utils.transport import Script, memory_script
+
+logger = logging.getLogger(__name__)
+
+# Every step command of an event-driven saga names this stream as its reply_stream;
+# the saga_engine handler consumes it and advances the saga the reply belongs to.
+REPLY_STREAM = "saga:replies"
+STATE_KEY_PREFIX = "saga:state:"
+# Sorted set of running steps ("<saga_id>:<step>") scored by their timeout (epoch seconds).
+# Removing a member claims that step's outcome: whoever removes it (the reply or the
+# timeout sweep) advances the saga, anybody else ignores it.
+TIMEOUTS_KEY = "saga:timeouts"
+# Finished sagas keep their state this long for inspection.
+STATE_TTL = int(os.environ.get("SAGA_STATE_TTL_SECONDS", 86400))
+TIMEOUT_SWEEP_INTERVAL = float(os.environ.get("SAGA_TIMEOUT_SWEEP_SECONDS", 1))
+TIMEOUT_SWEEP_BATCH = 1000
+# How often wait_saga reads a saga's status.
+SAGA_WAIT_POLL_INTERVAL = float(os.environ.get("SAGA_WAIT_POLL_SECONDS", 0.05))
+
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+
+class SagaFailedError(RuntimeError):
+    """
+    Raised by wait_saga when the saga failed or was cancelled; the final saga state
+    is available as .state.
+    """
+
+    def __init__(self, message, state):
+        super().__init__(message)
+        self.state = state
+
+
+Step = namedtuple("Step", "name command_stream event_type timeout payload")
+
+STEPS = (
+    Step("allocate_resources", "resources:commands", "resources:allocate", 3,
+         lambda state: {"robots_allocated": int(state["robot_count"])}),
+    Step("plan_route", "routing:commands", "routing:plan", 30,
+         lambda state: {"route": f"Route for {state['area']}"}),
+    Step("perform_exploration", "exploration:commands", "exploration:perform",
+         float(os.environ.get("SAGA_EXPLORATION_TIMEOUT_SECONDS", 4 * 3600)),
+         lambda state: {"exploration_result": "success"}),
+    Step("integrate_maps", "map:commands", "map:integrate", 300,
+         lambda state: {"final_map": "integrated_map"}),
+    Step("release_resources", "resources:commands", "resources:release", 30,
+         lambda state: {}),
+)
+
+COMPENSATIONS = {
+    "allocate_resources": async_orchestrator.compensate_allocate_resources,
+    "plan_route": async_orchestrator.compensate_plan_route,
+    "perform_exploration": async_orchestrator.compensate_perform_exploration,
+    "integrate_maps": async_orchestrator.compensate_integrate_maps,
+    "release_resources": async_orchestrator.compensate_release_resources,
+}
+
+# Claims a step outcome and applies the saga's transition atomically: the state
+# update, the next step's timeout and its command happen only if the claim succeeds.
+# KEYS: state key, timeouts key, next command stream (optional)
+# ARGV: claimed member ('' = none), state ttl ('' = keep), next member, next timeout,
+#       state field count N, N state field/value pairs, command field/value...
+ADVANCE_SAGA_LUA = """
+if ARGV[1] ~= '' and redis.call('ZREM', KEYS[2], ARGV[1]) == 0 then
+    return 0
+end
+local n = tonumber(ARGV[5])
+local hset = {'HSET', KEYS[1]}
+for i = 6, 5 + 2 * n do
+    table.insert(hset, ARGV[i])
+end
+redis.call(unpack(hset))
+if ARGV[2] ~= '' then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+if ARGV[3] ~= '' then
+    redis.call('ZADD', KEYS[2], ARGV[4], ARGV[3])
+end
+if KEYS[3] then
+    local xadd = {'XADD', KEYS[3], '*'}
+    for i = 6 + 2 * n, #ARGV do
+        table.insert(xadd, ARGV[i])
+    end
+    redis.call(unpack(xadd))
+end
+return 1
+"""
+
+
+@memory_script(ADVANCE_SAGA_LUA)
+async def _advance_saga_in_memory(transport, keys, args):
+    claimed, ttl, member, score, count = args[:5]
+    if claimed != "" and not await transport.zrem(keys[1], claimed):
+        return 0
+    count = int(count)
+    state = args[5:5 + 2 * count]
+    await transport.hset(keys[0], mapping=dict(zip(state[::2], state[1::2])))
+    if ttl != "":
+        await transport.expire(keys[0], ttl)
+    if member != "":
+        await transport.zadd(keys[1], {member: score})
+    if len(keys) > 2:
+        command = args[5 + 2 * count:]
+        await transport.xadd(keys[2], dict(zip(command[::2], command[1::2])))
+    return 1
+
+
+_advance_saga_script = Script(ADVANCE_SAGA_LUA)
+
+
+def state_key(saga_id):
+    return f"{STATE_KEY_PREFIX}{saga_id}"
+
+
+def step_member(saga_id, step):
+    return f"{saga_id}:{step}"
+
+
+async def _step_command(state, step):
+    """
+    Command fields of step for the saga described by state.
+    """
+    spec = STEPS[step]
+    saga_deadline = state.get("deadline") or None
+    return await command_fields(
+        state["correlation_id"],
+        state["saga_id"],
+        spec.event_type,
+        spec.payload(state),
+        request_id=str(uuid.uuid4()),
+        reply_stream=REPLY_STREAM,
+        deadline=deadline_after(spec.timeout, saga_deadline),
+    )
+
+
+async def _advance(redis_client, state, updates, claimed="", next_step=None, pipe=None):
+    """
+    Run ADVANCE_SAGA_LUA for one transition: write updates to the saga state and, if
+    next_step is given, register its timeout and emit its command. Returns the
+    script call (queued on pipe if given).
+    """
+    saga_id = state["saga_id"]
+    updates = {**updates, "updated_at": f"{time.time():.6f}"}
+    finished = updates.get("status") in (COMPLETED, FAILED, CANCELLED)
+    keys = [state_key(saga_id), TIMEOUTS_KEY]
+    member = score = ""
+    command = []
+    if next_step is not None:
+        spec = STEPS[next_step]
+        fields = await _step_command({**state, **updates}, next_step)
+        keys.append(spec.command_stream)
+        member = step_member(saga_id, next_step)
+        score = fields["deadline"]
+        for key, value in fields.items():
+            command.extend((key, value))
+    args = [claimed, STATE_TTL if finished else "", member, score, len(updates)]
+    for key, value in updates.items():
+        args.extend((key, value))
+    args.extend(command)
+    return await _advance_saga_script(keys=keys, args=args, client=pipe or redis_client)
+
+
+async def start_saga(robot_count, area, correlation_id, deadline=None, redis_client=None):
+    """
+    Create an event-driven mission start saga and emit its first step command.
+    Nothing stays in this process: the saga advances as the saga_engine handler
+    consumes its replies from REPLY_STREAM. Returns the saga id.
+    """
+    r = redis_client or get_redis_client()
+    saga_id = str(uuid.uuid4())[:8]
+    state = {
+        "saga_id": saga_id,
+        "correlation_id": correlation_id,
+        "robot_count": str(robot_count),
+        "area": area or "",
+        "deadline": "" if deadline is None else f"{float(deadline):.3f}",
+        "status": RUNNING,
+        "step": "0",
+        "started_at": f"{time.time():.6f}",
+    }
+    await _advance(r, state, state, next_step=0)
+    logger.info(f"Saga[{saga_id}]: started event-driven (correlation_id={correlation_id})")
+    return saga_id
+
+
+async def get_saga_state(saga_id, redis_client=None):
+    """
+    Return the saga state record as a dict ({} if unknown or expired).
+    """
+    r = redis_client or get_redis_client()
+    return await r.hgetall(state_key(saga_id))
+
+
+async def wait_saga(saga_id, timeout=None, redis_client=None, interval=SAGA_WAIT_POLL_INTERVAL):
+    """
+    Wait until the saga is no longer running, reading its status every interval
+    seconds, and return its final state. Raises SagaFailedError if it failed or was
+    cancelled and asyncio.TimeoutError if it is still running after timeout seconds.
+    """
+    r = redis_client or get_redis_client()
+
+    async def finished():
+        while await r.hget(state_key(saga_id), "status") == RUNNING:
+            await asyncio.sleep(interval)
+        return await get_saga_state(saga_id, redis_client=r)
+
+    state = await asyncio.wait_for(finished(), timeout)
+    if state.get("status") != COMPLETED:
+        raise SagaFailedError(
+            f"Saga[{saga_id}] {state.get('status') or 'expired'}: {state.get('error')}", state
+        )
+    return state
+
+
+def transition(state, status, error=None):
+    """
+    Next state of a running saga whose current step ended with status.
+    Returns (updates, next step index or None).
+    """
+    step = int(state["step"])
+    if status == "completed":
+        if step + 1 < len(STEPS):
+            return {"step": str(step + 1)}, step + 1
+        return {"status": COMPLETED, "step": str(len(STEPS))}, None
+    if status == CANCELLED_STATUS:
+        return {
+            "status": CANCELLED,
+            "cancelled_step": STEPS[step].name,
+            "error": str(error or status)[:512],
+        }, None
+    return {
+        "status": FAILED,
+        "failed_step": STEPS[step].name,
+        "error": str(error or status)[:512],
+    }, None
+
+
+async def compensate(state):
+    """
+    Cancel a failed saga's outstanding work (a cancelled saga's already is) and
+    compensate its completed steps in reverse order.
+    """
+    saga_id = state["saga_id"]
+    if state["status"] != CANCELLED:
+        try:
+            await cancel_saga(saga_id, reason=state.get("error"))
+        except Exception as e:
+            logger.error(f"Saga[{saga_id}]: failed to cancel", exc_info=e)
+    for spec in reversed(STEPS[: int(state["step"])]):
+        try:
+            await COMPENSATIONS[spec.name](saga_id, state["correlation_id"])
+        except Exception as e:
+            logger.error(f"Saga[{saga_id}]: compensation of {spec.name} failed", exc_info=e)
+
+
+async def _apply(redis_client, claims):
+    """
+    Apply (state, claimed member, status, error) outcomes in one pipelined round trip
+    and compensate the sagas that failed or were cancelled. Returns the number of transitions applied.
+    """
+    if not claims:
+        return 0
+    transitions = []
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for state, claimed, status, error in claims:
+            updates, next_step = transition(state, status, error)
+            await _advance(redis_client, state, updates, claimed=claimed, next_step=next_step, pipe=pipe)
+            transitions.append({**state, **updates})
+        results = await pipe.execute()
+    applied = 0
+    for state, result in zip(transitions, results):
+        if not int(result):
+            continue
+        applied += 1
+        if state["status"] == FAILED:
+            logger.warning(f"Saga[{state['saga_id']}]: {state['failed_step']} failed: {state['error']}")
+            await compensate(state)
+        elif state["status"] == CANCELLED:
+            logger.warning(f"Saga[{state['saga_id']}]: cancelled during {state['cancelled_step']}")
+            await compensate(state)
+        elif state["status"] == COMPLETED:
+            logger.info(f"Saga[{state['saga_id']}]: completed")
+    return applied
+
+
+async def on_replies(replies, redis_client=None):
+    """
+    Advance the sagas of a batch of reply fields from REPLY_STREAM.
+    Only terminal replies to a running saga's current step count; others (start and
+    progress replies, duplicates, replies to steps that already timed out) are ignored.
+    A 'cancelled' reply (the saga was cancelled while the step was queued or
+    running) ends the saga as cancelled and compensates its completed steps.
+    Saga states are read in one pipeline and transitions applied in another.
+    Returns the number of transitions applied.
+    """
+    r = redis_client or get_redis_client()
+    terminal = [
+        fields for fields in replies
+        if fields.get("status") in TERMINAL_STATUSES and fields.get("saga_id")
+    ]
+    if not terminal:
+        return 0
+    saga_ids = list(dict.fromkeys(fields["saga_id"] for fields in terminal))
+    async with r.pipeline(transaction=False) as pipe:
+        for saga_id in saga_ids:
+            pipe.hgetall(state_key(saga_id))
+        states = dict(zip(saga_ids, await pipe.execute()))
+    claims = []
+    for fields in terminal:
+        state = states[fields["saga_id"]]
+        if not state or state.get("status") != RUNNING:
+            continue
+        step = int(state["step"])
+        if STEPS[step].event_type != fields.get("event_type"):
+            continue
+        error = None
+        if fields["status"] != "completed":
+            try:
+                error = (await load_payload(fields)).get("error")
+            except Exception as e:
+                error = f"unreadable reply payload: {e}"
+        claims.append((state, step_member(state["saga_id"], step), fields["status"], error))
+    return await _apply(r, claims)
+
+
+async def sweep_timeouts(redis_client=None, now=None):
+    """
+    Fail the running sagas whose current step timed out. Returns the number failed.
+    """
+    r = redis_client or get_redis_client()
+    now = time.time() if now is None else now
+    members = await r.zrangebyscore(TIMEOUTS_KEY, "-inf", now, start=0, num=TIMEOUT_SWEEP_BATCH)
+    if not members:
+        return 0
+    saga_ids = [member.rpartition(":")[0] for member in members]
+    async with r.pipeline(transaction=False) as pipe:
+        for saga_id in saga_ids:
+            pipe.hgetall(state_key(saga_id))
+        states = await pipe.execute()
+    claims = []
+    for member, state in zip(members, states):
+        if not state:
+            await r.zrem(TIMEOUTS_KEY, member)
+            continue
+        step = STEPS[int(member.rpartition(":")[2])]
+        claims.append((state, member, "timeout", f"{step.name} timed out after {step.timeout}s"))
+    return await _apply(r, claims)
+
+
+async def run_timeout_sweeper(redis_client, shutdown_event, interval=TIMEOUT_SWEEP_INTERVAL):
+    """
+    Sweep step timeouts every interval seconds until shutdown_event is set.
+    """
+    while not shutdown_event.is_set():
+        try:
+            await sweep_timeouts(redis_client)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Failed to sweep saga timeouts", exc_info=e)
+        try:
+            await asyncio.wait_for(shutdown_event.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
@@ -1,17 +1,53 @@
+from .binary import array_fields, field_array
+from .blobs import load_array, load_blob, load_payload, store_array, store_blob
+from .breaker import CircuitOpenError
+from .cancellation import CommandCancelled, cancel_saga, check_cancelled
 from .client import get_redis_client
-from .commands import emit_command, emit_event
-from .decorators import multi_stage_reply
-from .replies import read_replies, request_and_reply
-from .retries import immediate_fail_retry, exponential_retry, linear_retry
+from .commands import emit_command, emit_event, emit_events, emit_request
+from .deadlines import DeadlineExceeded, check_deadline, is_expired, remaining_time
+from .decorators import batch_reply, multi_stage_reply
+from .envelope import Envelope, reply_event
+from .replies import (
+    ReplyFailedError,
+    read_replies,
+    request_and_reply,
+    request_replies,
+    stream_replies,
+)
+from .retries import immediate_fail_retry, exponential_retry, linear_retry, jittered_retry
 
 __all__ = [
     "get_redis_client",
     "emit_command",
     "emit_event",
+    "emit_events",
+    "emit_request",
     "multi_stage_reply",
+    "batch_reply",
+    "Envelope",
+    "reply_event",
+    "DeadlineExceeded",
+    "check_deadline",
+    "is_expired",
+    "remaining_time",
+    "CommandCancelled",
+    "cancel_saga",
+    "check_cancelled",
     "read_replies",
     "request_and_reply",
+    "request_replies",
+    "stream_replies",
+    "ReplyFailedError",
     "immediate_fail_retry",
     "exponential_retry",
     "linear_retry",
+    "jittered_retry",
+    "CircuitOpenError",
+    "store_blob",
+    "load_blob",
+    "store_array",
+    "load_array",
+    "load_payload",
+    "array_fields",
+    "field_array",
 ]
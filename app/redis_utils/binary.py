@@ -0,0 +1,161 @@
+import os
+
+import numpy as np
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+
+# Stream entry fields carried as raw bytes (e.g. "grid,scan"). When set,
+# get_redis_client() returns a BinaryFieldsRedis: replies are decoded like with
+# decode_responses=True except these fields of stream entries, which stay bytes.
+BINARY_FIELDS = frozenset(
+    field.strip() for field in os.environ.get("REDIS_BINARY_FIELDS", "").split(",") if field.strip()
+)
+# Commands whose replies contain stream entries (RESP2 shapes: (id, {field: value})).
+STREAM_READ_COMMANDS = frozenset(("XREAD", "XREADGROUP", "XRANGE", "XREVRANGE", "XCLAIM", "XAUTOCLAIM"))
+BYTES_TYPES = (bytes, bytearray, memoryview)
+# Text fields array_fields writes next to an array's binary field.
+ARRAY_SUFFIXES = ("_dtype", "_shape")
+
+
+def _decode(value):
+    if isinstance(value, bytes):
+        try:
+            return value.decode()
+        except UnicodeDecodeError:
+            return value
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(_decode(item) for item in value)
+    if isinstance(value, dict):
+        return {_decode(key): _decode(item) for key, item in value.items()}
+    return value
+
+
+def decode_entry_fields(fields, binary_fields=BINARY_FIELDS):
+    """
+    Decode the names and values of stream entry fields, except the values of
+    binary_fields, which stay bytes.
+    """
+    decoded = {}
+    for key, value in fields.items():
+        key = _decode(key)
+        decoded[key] = value if key in binary_fields else _decode(value)
+    return decoded
+
+
+def _decode_entries(value, binary_fields):
+    if isinstance(value, dict):
+        return decode_entry_fields(value, binary_fields)
+    if isinstance(value, (list, tuple)):
+        return type(value)(_decode_entries(item, binary_fields) for item in value)
+    return _decode(value)
+
+
+def decode_response(response, command, binary_fields=BINARY_FIELDS):
+    """
+    Decode a decode_responses=False reply to command as decode_responses=True would,
+    keeping binary_fields of stream entries as bytes. Errors are returned unchanged.
+    """
+    if isinstance(response, Exception):
+        return response
+    if str(command).upper() in STREAM_READ_COMMANDS:
+        return _decode_entries(response, binary_fields)
+    return _decode(response)
+
+
+class BinaryFieldsPipeline(Pipeline):
+    binary_fields = BINARY_FIELDS
+
+    async def execute(self, raise_on_error=True):
+        commands = [args[0] for args, _ in self.command_stack]
+        results = await super().execute(raise_on_error)
+        return [
+            decode_response(result, command, self.binary_fields)
+            for result, command in zip(results, commands)
+        ]
+
+
+class BinaryFieldsRedis(Redis):
+    """
+    Redis client for streams carrying raw binary fields: replies are decoded to str
+    like with decode_responses=True, except the binary_fields of stream entries,
+    which are returned as the bytes Redis holds (no UTF-8 decoding, no base64).
+    """
+
+    def __init__(self, *args, binary_fields=BINARY_FIELDS, **kwargs):
+        kwargs["decode_responses"] = False
+        super().__init__(*args, **kwargs)
+        self.binary_fields = frozenset(binary_fields)
+
+    async def execute_command(self, *args, **options):
+        response = await super().execute_command(*args, **options)
+        return decode_response(response, args[0], self.binary_fields)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        pipe = BinaryFieldsPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+        pipe.binary_fields = self.binary_fields
+        return pipe
+
+
+def binary_fields(binary, designated=None):
+    """
+    Stream fields for binary values ({field: bytes-like}, e.g. from array_fields),
+    sent to Redis as raw bytes; str values (such as array_fields' dtype and shape)
+    are passed through as text. Every bytes-like field must be designated in
+    REDIS_BINARY_FIELDS, otherwise readers would try to decode it as UTF-8; raises
+    ValueError for undesignated ones.
+    """
+    if not binary:
+        return {}
+    designated = BINARY_FIELDS if designated is None else designated
+    undesignated = sorted(
+        field for field, value in binary.items() if not isinstance(value, str) and field not in designated
+    )
+    if undesignated:
+        raise ValueError(f"Binary fields {undesignated} are not designated in REDIS_BINARY_FIELDS")
+    return {
+        field: value if isinstance(value, (str, bytes)) else memoryview(value).cast("B")
+        for field, value in binary.items()
+    }
+
+
+def split_binary(payload):
+    """
+    Split a payload dict into its JSON part and its bytes-like values (with the
+    dtype/shape fields of those written with array_fields).
+    """
+    if not isinstance(payload, dict):
+        return payload, {}
+    binary = {key: value for key, value in payload.items() if isinstance(value, BYTES_TYPES)}
+    if not binary:
+        return payload, {}
+    for key in list(binary):
+        for suffix in ARRAY_SUFFIXES:
+            if f"{key}{suffix}" in payload:
+                binary[f"{key}{suffix}"] = payload[f"{key}{suffix}"]
+    return {key: value for key, value in payload.items() if key not in binary}, binary
+
+
+def array_fields(name, array):
+    """
+    Binary field name holding a NumPy array's buffer, plus text fields with its dtype
+    and shape. The buffer is sent without copying into an intermediate encoding.
+    """
+    array = np.ascontiguousarray(array)
+    return {
+        name: memoryview(array).cast("B"),
+        f"{name}{ARRAY_SUFFIXES[0]}": array.dtype.str,
+        f"{name}{ARRAY_SUFFIXES[1]}": ",".join(str(n) for n in array.shape),
+    }
+
+
+def field_array(fields, name):
+    """
+    Read-only NumPy array wrapping the bytes of a field written with array_fields,
+    without copying.
+    """
+    shape = fields[f"{name}{ARRAY_SUFFIXES[1]}"]
+    return np.frombuffer(fields[name], dtype=np.dtype(fields[f"{name}{ARRAY_SUFFIXES[0]}"])).reshape(
+        tuple(int(n) for n in shape.split(",")) if shape else ()
+    )
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import logging
+import os
+import zlib
+
+import numpy as np
+
+from .client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Payloads whose JSON encoding exceeds this many bytes are stored out of the stream.
+BLOB_THRESHOLD = int(os.environ.get("BLOB_THRESHOLD_BYTES", 64 * 1024))
+BLOB_TTL = int(os.environ.get("BLOB_TTL_SECONDS", 3600))
+BLOB_PREFIX = "blob:"
+COMPRESSION_LEVEL = 1
+
+_RAW = b"r"
+_ZLIB = b"z"
+
+
+def blob_key(data):
+    return f"{BLOB_PREFIX}{hashlib.sha256(data).hexdigest()}"
+
+
+def _encode(data):
+    compressed = zlib.compress(data, COMPRESSION_LEVEL)
+    if len(compressed) < len(data):
+        return _ZLIB + compressed
+    return _RAW + data
+
+
+def _decode(stored):
+    body = memoryview(stored)[1:]
+    if stored[:1] == _ZLIB:
+        return memoryview(zlib.decompress(body))
+    return body
+
+
+async def store_blob(data, ttl=BLOB_TTL):
+    """
+    Store binary data once under its content hash and return the reference key.
+    Identical content is deduplicated by SET NX: an existing blob is left as is and
+    only gets its TTL refreshed, in the same round trip.
+    """
+    data = bytes(data)
+    key = blob_key(data)
+    r = get_redis_client(decode_responses=False)
+    async with r.pipeline(transaction=False) as pipe:
+        pipe.set(key, _encode(data), ex=ttl, nx=True)
+        pipe.expire(key, ttl)
+        stored, _ = await pipe.execute()
+    if stored:
+        logger.debug(f"Stored blob {key} ({len(data)} bytes)")
+    else:
+        logger.debug(f"Reused blob {key}")
+    return key
+
+
+async def load_blob(key):
+    """
+    Fetch a blob and return its content as a memoryview.
+    Uncompressed blobs are sliced without copying; compressed ones are inflated once.
+    Raises KeyError if the blob expired or never existed.
+    """
+    r = get_redis_client(decode_responses=False)
+    stored = await r.get(key)
+    if stored is None:
+        raise KeyError(f"Blob {key} not found or expired")
+    return _decode(stored)
+
+
+async def store_array(array, ttl=BLOB_TTL):
+    """
+    Store a NumPy array as a blob and return a JSON-friendly descriptor.
+    """
+    array = np.ascontiguousarray(array)
+    return {
+        "ref": await store_blob(memoryview(array).cast("B"), ttl=ttl),
+        "shape": list(array.shape),
+        "dtype": array.dtype.str,
+    }
+
+
+async def load_array(descriptor):
+    """
+    Resolve an array descriptor produced by store_array.
+    The returned array wraps the blob buffer without an extra copy and is read-only.
+    """
+    buffer = await load_blob(descriptor["ref"])
+    return np.frombuffer(buffer, dtype=np.dtype(descriptor["dtype"])).reshape(
+        descriptor["shape"]
+    )
+
+
+async def payload_fields(payload, threshold=BLOB_THRESHOLD, ttl=BLOB_TTL):
+    """
+    Encode a payload for a stream entry.
+    Small payloads stay inline as {"payload": json}; larger ones are stored as a blob
+    and the entry carries only {"payload_ref": key}.
+    """
+    encoded = json.dumps(payload)
+    if threshold is None or len(encoded) <= threshold:
+        return {"payload": encoded}
+    key = await store_blob(encoded.encode(), ttl=ttl)
+    return {"payload_ref": key}
+
+
+async def load_payload(fields):
+    """
+    Decode the payload of a stream entry, resolving a blob reference if present.
+    Handlers call this only when they need the payload, so routing on metadata
+    never fetches the blob. An Envelope decodes its payload once and caches it.
+    """
+    if hasattr(fields, "load_payload"):
+        return await fields.load_payload()
+    key = fields.get("payload_ref")
+    if key:
+        return json.loads(bytes(await load_blob(key)))
+    return json.loads(fields.get("payload") or "{}")
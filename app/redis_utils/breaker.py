@@ -0,0 +1,144 @@
+import collections
+import contextlib
+import logging
+import os
+import time
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+logger = logging.getLogger(__name__)
+
+# Failures (reply timeouts, lost connections) within the window that open a handler's circuit.
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_WINDOW = float(os.environ.get("BREAKER_WINDOW_SECONDS", 60))
+# How long an open circuit fails requests fast before letting a probe through.
+BREAKER_RESET_TIMEOUT = float(os.environ.get("BREAKER_RESET_SECONDS", 30))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+_breakers = {}
+
+
+class CircuitOpenError(TimeoutError):
+    """
+    Raised instead of sending a command while its handler's circuit is open.
+    A TimeoutError, since callers get the same outcome as a timed-out request, only at once.
+    """
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one command handler (a command stream and event type).
+
+    closed: requests pass; failures are counted over a sliding window and
+    failure_threshold of them open the circuit.
+    open: requests fail fast with CircuitOpenError for reset_timeout seconds.
+    half_open: one probe request passes at a time; its success closes the
+    circuit, its failure opens it again.
+    """
+
+    def __init__(
+        self,
+        name,
+        failure_threshold=BREAKER_FAILURE_THRESHOLD,
+        window=BREAKER_WINDOW,
+        reset_timeout=BREAKER_RESET_TIMEOUT,
+        clock=time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self._failures = collections.deque()
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self):
+        """
+        Return True if a request may be sent now (claiming the probe slot when half-open).
+        """
+        if self.state == OPEN:
+            if self.clock() - self._opened_at < self.reset_timeout:
+                return False
+            self.state = HALF_OPEN
+            logger.info(f"Circuit {self.name} half-open, probing")
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def before_request(self):
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit for {self.name} is open; failing fast")
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info(f"Circuit {self.name} closed")
+        self.state = CLOSED
+        self._failures.clear()
+        self._probing = False
+
+    def record_failure(self):
+        now = self.clock()
+        self._probing = False
+        if self.state == HALF_OPEN:
+            self._open(now)
+            return
+        self._failures.append(now)
+        while self._failures and now - self._failures[0] > self.window:
+            self._failures.popleft()
+        if self.state == CLOSED and len(self._failures) >= self.failure_threshold:
+            self._open(now)
+
+    def release(self):
+        """
+        Release the probe slot of a request that ended without a verdict (e.g. cancelled).
+        """
+        self._probing = False
+
+    def _open(self, now):
+        logger.warning(f"Circuit {self.name} open, failing fast for {self.reset_timeout}s")
+        self.state = OPEN
+        self._opened_at = now
+        self._failures.clear()
+
+    @contextlib.contextmanager
+    def guard(self, failures=(TimeoutError, RedisConnectionError), answered=()):
+        """
+        Wrap one request: fails fast while open, records a failure for the
+        exception types in failures and a success when the block completes or
+        raises one of answered (the handler replied, e.g. 'failed').
+        Anything else (e.g. cancellation) releases the probe slot without a verdict.
+        """
+        self.before_request()
+        try:
+            yield self
+        except answered:
+            self.record_success()
+            raise
+        except failures:
+            self.record_failure()
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.record_success()
+
+
+def get_breaker(stream, event_type=None):
+    """
+    Return the process-wide circuit breaker of a command handler.
+
+    Keyed by (stream, event_type): handlers sharing a stream (allocate and release
+    on resources:commands) fail independently, so one timing out does not fail
+    fast the other's commands.
+    """
+    key = (stream, event_type)
+    breaker = _breakers.get(key)
+    if breaker is None:
+        name = f"{stream}/{event_type}" if event_type else stream
+        breaker = _breakers[key] = CircuitBreaker(name)
+    return breaker
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import os
+
+from .client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Every listener reads this stream (plain XREAD, no group) to cancel in-flight handlers.
+CANCEL_STREAM = "saga:cancellations"
+CANCEL_STREAM_MAXLEN = 10000
+# Marker key checked before a handler starts and on every progress() call.
+CANCEL_KEY_PREFIX = "saga:cancelled:"
+CANCEL_TTL = int(os.environ.get("SAGA_CANCEL_TTL_SECONDS", 3600))
+CANCELLED_STATUS = "cancelled"
+
+
+class CommandCancelled(Exception):
+    """
+    Raised inside a handler when its saga has been cancelled.
+    """
+
+
+def cancel_key(saga_id):
+    return f"{CANCEL_KEY_PREFIX}{saga_id}"
+
+
+async def cancel_saga(saga_id, reason=None, redis_client=None):
+    """
+    Cancel all work for saga_id: mark it cancelled (with TTL) and notify listeners,
+    in one pipelined round trip.
+    """
+    logger.info(f"Saga[{saga_id}]: cancelling ({reason})")
+    r = redis_client or get_redis_client()
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.set(cancel_key(saga_id), reason or "", ex=CANCEL_TTL)
+        pipe.xadd(
+            CANCEL_STREAM,
+            {"saga_id": saga_id, "reason": reason or ""},
+            maxlen=CANCEL_STREAM_MAXLEN,
+            approximate=True,
+        )
+        await pipe.execute()
+
+
+async def is_cancelled(saga_id, redis_client=None):
+    if not saga_id:
+        return False
+    r = redis_client or get_redis_client()
+    return bool(await r.exists(cancel_key(saga_id)))
+
+
+async def cancelled_sagas(saga_ids, redis_client=None):
+    """
+    Return the subset of saga_ids that were cancelled, checked in one pipeline.
+    """
+    saga_ids = [saga_id for saga_id in dict.fromkeys(saga_ids) if saga_id]
+    if not saga_ids:
+        return set()
+    r = redis_client or get_redis_client()
+    async with r.pipeline(transaction=False) as pipe:
+        for saga_id in saga_ids:
+            pipe.exists(cancel_key(saga_id))
+        found = await pipe.execute()
+    return {saga_id for saga_id, exists in zip(saga_ids, found) if exists}
+
+
+async def check_cancelled(fields, redis_client=None):
+    """
+    Raise CommandCancelled if the saga of these command fields was cancelled.
+    """
+    saga_id = fields.get("saga_id")
+    if await is_cancelled(saga_id, redis_client=redis_client):
+        raise CommandCancelled(f"Saga {saga_id} was cancelled")
+
+
+async def watch_cancellations(redis_client, on_cancel, shutdown_event, block=1000):
+    """
+    Follow CANCEL_STREAM from now on and call on_cancel(saga_id, reason) per entry
+    until shutdown_event is set.
+    """
+    last_id = "$"
+    while not shutdown_event.is_set():
+        try:
+            entries = await redis_client.xread({CANCEL_STREAM: last_id}, block=block, count=100)
+            for _, messages in entries or []:
+                for entry_id, fields in messages:
+                    last_id = entry_id
+                    on_cancel(fields.get("saga_id"), fields.get("reason"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Cancellation watcher error", exc_info=e)
+            await asyncio.sleep(1)
@@ -1,8 +1,29 @@
 import os
+import redis as sync_redis
 import redis.asyncio as redis
 
+from .binary import BINARY_FIELDS, BinaryFieldsRedis
+from .transport import MESSAGE_TRANSPORT, get_memory_transport
+
 REDIS_HOST = os.environ.get("REDIS_HOST", "redis")
 REDIS_PORT = int(os.environ.get("REDIS_PORT", 6379))
 
-def get_redis_client():
-    return redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+def get_redis_client(decode_responses=True):
+    """
+    Return the message transport client: a Redis client, or the shared in-process
+    InMemoryTransport when MESSAGE_TRANSPORT=memory.
+    With REDIS_BINARY_FIELDS set, a decoding client is a BinaryFieldsRedis that
+    leaves those stream entry fields as bytes.
+    """
+    if MESSAGE_TRANSPORT == "memory":
+        return get_memory_transport()
+    if decode_responses and BINARY_FIELDS:
+        return BinaryFieldsRedis(host=REDIS_HOST, port=REDIS_PORT, binary_fields=BINARY_FIELDS)
+    return redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=decode_responses)
+
+
+def get_sync_redis_client(decode_responses=True):
+    """
+    Blocking client for code running outside an event loop (e.g. Celery signal handlers).
+    """
+    return sync_redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=decode_responses)
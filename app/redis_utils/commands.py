@@ -1,33 +1,87 @@
-import json
 import logging
-import time
+from .binary import binary_fields
+from .blobs import BLOB_THRESHOLD, payload_fields
 from .client import get_redis_client
+from .timings import timestamp
+from .transport import Script, memory_script
 from opentelemetry import trace
 
 logger = logging.getLogger(__name__)
 
-async def emit_command(
-    stream,
+# Creates the reply stream and its consumer group, then appends the command, so a
+# fast handler can never reply before the requester's group exists.
+# KEYS: command stream, reply stream
+# ARGV: reply group, reply ttl, command maxlen, command ttl ('' = unset), field/value...
+EMIT_REQUEST_LUA = """
+local created = redis.pcall('XGROUP', 'CREATE', KEYS[2], ARGV[1], '0', 'MKSTREAM')
+if type(created) == 'table' and created.err then
+    if not string.find(tostring(created.err), 'BUSYGROUP') then
+        return redis.error_reply(tostring(created.err))
+    end
+end
+if ARGV[2] ~= '' then
+    redis.call('EXPIRE', KEYS[2], ARGV[2])
+end
+local xadd = {'XADD', KEYS[1]}
+if ARGV[3] ~= '' then
+    table.insert(xadd, 'MAXLEN')
+    table.insert(xadd, '~')
+    table.insert(xadd, ARGV[3])
+end
+table.insert(xadd, '*')
+for i = 5, #ARGV do
+    table.insert(xadd, ARGV[i])
+end
+local entry_id = redis.call(unpack(xadd))
+if ARGV[4] ~= '' then
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+end
+return entry_id
+"""
+
+
+@memory_script(EMIT_REQUEST_LUA)
+async def _emit_request_in_memory(transport, keys, args):
+    command_stream, reply_stream = keys
+    reply_group, reply_ttl, maxlen, ttl = args[:4]
+    try:
+        await transport.xgroup_create(reply_stream, reply_group, id="0", mkstream=True)
+    except Exception as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+    if reply_ttl != "":
+        await transport.expire(reply_stream, reply_ttl)
+    fields = dict(zip(args[4::2], args[5::2]))
+    entry_id = await transport.xadd(
+        command_stream, fields, maxlen=None if maxlen == "" else int(maxlen)
+    )
+    if ttl != "":
+        await transport.expire(command_stream, ttl)
+    return entry_id
+
+
+_emit_request_script = Script(EMIT_REQUEST_LUA)
+
+
+async def command_fields(
     correlation_id,
     saga_id,
     event_type,
     payload,
     request_id=None,
     traceparent=None,
-    maxlen=None,
-    ttl=None,
     reply_stream=None,
+    blob_threshold=BLOB_THRESHOLD,
+    deadline=None,
+    binary=None,
 ):
-    logger.info(
-        f"Emitting command: {stream}, correlation_id={correlation_id}, saga_id={saga_id}, event_type={event_type}, request_id={request_id}"
-    )
-    r = get_redis_client()
     fields = {
         "correlation_id": correlation_id,
         "saga_id": saga_id,
         "event_type": event_type,
-        "payload": json.dumps(payload),
-        "timestamp": str(int(time.time())),
+        **await payload_fields(payload, threshold=blob_threshold),
+        **binary_fields(binary),
+        "timestamp": timestamp(),
     }
     if request_id is not None:
         fields["request_id"] = request_id
@@ -35,6 +89,48 @@ async def emit_command(
         fields["traceparent"] = traceparent
     if reply_stream is not None:
         fields["reply_stream"] = reply_stream
+    if deadline is not None:
+        fields["deadline"] = f"{float(deadline):.3f}"
+    return fields
+
+
+async def emit_command(
+    stream,
+    correlation_id,
+    saga_id,
+    event_type,
+    payload,
+    request_id=None,
+    traceparent=None,
+    maxlen=None,
+    ttl=None,
+    reply_stream=None,
+    blob_threshold=BLOB_THRESHOLD,
+    deadline=None,
+    binary=None,
+):
+    """
+    Append a command to a stream.
+    deadline: optional absolute epoch seconds after which handlers skip the command.
+    binary: optional {field: bytes-like} sent as raw bytes next to the JSON payload
+    (fields must be designated in REDIS_BINARY_FIELDS; see app.redis_utils.binary).
+    """
+    logger.info(
+        f"Emitting command: {stream}, correlation_id={correlation_id}, saga_id={saga_id}, event_type={event_type}, request_id={request_id}"
+    )
+    r = get_redis_client()
+    fields = await command_fields(
+        correlation_id,
+        saga_id,
+        event_type,
+        payload,
+        request_id=request_id,
+        traceparent=traceparent,
+        reply_stream=reply_stream,
+        blob_threshold=blob_threshold,
+        deadline=deadline,
+        binary=binary,
+    )
     xadd_kwargs = {}
     if maxlen is not None:
         xadd_kwargs["maxlen"] = maxlen
@@ -56,23 +152,112 @@ async def emit_command(
         span.set_attribute("entry_id", entry_id)
         return entry_id
 
-async def emit_event(
-    stream, correlation_id, event_type, status, payload, saga_id=None,  maxlen=None, ttl=None
+async def emit_request(
+    stream,
+    reply_stream,
+    reply_group,
+    correlation_id,
+    saga_id,
+    event_type,
+    payload,
+    request_id=None,
+    traceparent=None,
+    maxlen=None,
+    ttl=None,
+    reply_ttl=None,
+    blob_threshold=BLOB_THRESHOLD,
+    deadline=None,
+    binary=None,
 ):
-    logger.info(f"Emitting event: {stream}, correlation_id={correlation_id}, saga_id={saga_id}, event_type={event_type}, status={status}")
-    if stream is None:
-        raise ValueError("Stream must be specified for emitting events")
-
+    """
+    Emit a command and prepare its reply stream in a single round trip.
+    Runs EMIT_REQUEST_LUA via EVALSHA (loaded with SCRIPT LOAD only if the server
+    lacks it; the script object and its SHA are shared by every call): the
+    reply stream and reply_group are created (with reply_ttl) before the command is
+    appended, atomically.
+    """
+    logger.info(
+        f"Emitting request: {stream}, reply_stream={reply_stream}, correlation_id={correlation_id}, saga_id={saga_id}, event_type={event_type}, request_id={request_id}"
+    )
     r = get_redis_client()
+    fields = await command_fields(
+        correlation_id,
+        saga_id,
+        event_type,
+        payload,
+        request_id=request_id,
+        traceparent=traceparent,
+        reply_stream=reply_stream,
+        blob_threshold=blob_threshold,
+        deadline=deadline,
+        binary=binary,
+    )
+    args = [
+        reply_group,
+        "" if reply_ttl is None else reply_ttl,
+        "" if maxlen is None else maxlen,
+        "" if ttl is None else ttl,
+    ]
+    for key, value in fields.items():
+        args.extend((key, value))
+
+    tracer = trace.get_tracer(__name__)
+    with tracer.start_as_current_span("emit_request") as span:
+        span.set_attribute("stream", stream)
+        span.set_attribute("reply_stream", reply_stream)
+        span.set_attribute("correlation_id", correlation_id)
+        span.set_attribute("saga_id", saga_id)
+        span.set_attribute("event_type", event_type)
+        if request_id is not None:
+            span.set_attribute("request_id", request_id)
+        if traceparent is not None:
+            span.set_attribute("traceparent", traceparent)
+        entry_id = await _emit_request_script(keys=[stream, reply_stream], args=args, client=r)
+        span.set_attribute("entry_id", entry_id)
+        return entry_id
+
+async def _event_fields(
+    correlation_id, event_type, status, payload, saga_id=None, blob_threshold=BLOB_THRESHOLD, binary=None
+):
     fields = {
         "correlation_id": correlation_id,
         "event_type": event_type,
         "status": status,
-        "payload": json.dumps(payload),
-        "timestamp": str(int(time.time())),
+        **await payload_fields(payload, threshold=blob_threshold),
+        **binary_fields(binary),
+        "timestamp": timestamp(),
     }
     if saga_id is not None:
         fields["saga_id"] = saga_id
+    return fields
+
+
+async def emit_event(
+    stream,
+    correlation_id,
+    event_type,
+    status,
+    payload,
+    saga_id=None,
+    maxlen=None,
+    ttl=None,
+    blob_threshold=BLOB_THRESHOLD,
+    binary=None,
+):
+    logger.info(f"Emitting event: {stream}, correlation_id={correlation_id}, saga_id={saga_id}, event_type={event_type}, status={status}")
+    if stream is None:
+        raise ValueError("Stream must be specified for emitting events")
+
+    r = get_redis_client()
+    fields = await _event_fields(
+        correlation_id,
+        event_type,
+        status,
+        payload,
+        saga_id=saga_id,
+        blob_threshold=blob_threshold,
+        binary=binary,
+    )
     xadd_kwargs = {}
     if maxlen is not None:
         xadd_kwargs["maxlen"] = maxlen
@@ -84,3 +269,32 @@ async def emit_event(
     if ttl is not None:
         await r.expire(stream, ttl)
     return entry_id
+
+
+async def emit_events(events, blob_threshold=BLOB_THRESHOLD):
+    """
+    Emit many events in one pipelined round trip.
+    events: dicts with the emit_event arguments stream, correlation_id, event_type,
+    status, payload and optionally saga_id and binary.
+    Returns the entry ids in order.
+    """
+    if not events:
+        return []
+    r = get_redis_client()
+    async with r.pipeline(transaction=False) as pipe:
+        for event in events:
+            if event.get("stream") is None:
+                raise ValueError("Stream must be specified for emitting events")
+            fields = await _event_fields(
+                event.get("correlation_id"),
+                event.get("event_type"),
+                event["status"],
+                event.get("payload") or {},
+                saga_id=event.get("saga_id"),
+                blob_threshold=blob_threshold,
+                binary=event.get("binary"),
+            )
+            pipe.xadd(event["stream"], fields)
+        entry_ids = await pipe.execute()
+    logger.info(f"Emitted {len(entry_ids)} events in one pipeline")
+    return entry_ids
@@ -0,0 +1,188 @@
+import logging
+import os
+import time
+
+from .client import get_redis_client
+from .deadlines import get_deadline
+from .envelope import Envelope
+
+logger = logging.getLogger(__name__)
+
+# Deliveries after which a failing message is moved to its stream's dead-letter stream.
+MAX_DELIVERIES = int(os.environ.get("HANDLER_MAX_DELIVERIES", 5))
+# A failed message is redelivered once idle for REDELIVERY_BACKOFF * 2^(deliveries - 1)
+# seconds, capped at REDELIVERY_BACKOFF_MAX.
+REDELIVERY_BACKOFF = float(os.environ.get("HANDLER_REDELIVERY_BACKOFF_SECONDS", 5))
+REDELIVERY_BACKOFF_MAX = float(os.environ.get("HANDLER_REDELIVERY_BACKOFF_MAX_SECONDS", 300))
+RECLAIM_BATCH = 100
+DEAD_LETTER_SUFFIX = ":dead"
+DEAD_LETTER_MAXLEN = 10000
+# Non-terminal reply status of a failed command that will be redelivered.
+RETRYING_STATUS = "retrying"
+# Fields added to a dead-lettered message; stripped again when it is requeued.
+DEAD_FIELDS = ("dead_stream", "dead_group", "dead_id", "dead_deliveries", "dead_error", "dead_at")
+
+
+def dead_letter_stream(stream):
+    return f"{stream}{DEAD_LETTER_SUFFIX}"
+
+
+def redelivery_delay(deliveries):
+    """
+    Seconds a message failed deliveries times must stay idle before it is redelivered.
+    """
+    return min(REDELIVERY_BACKOFF * 2 ** max(deliveries - 1, 0), REDELIVERY_BACKOFF_MAX)
+
+
+def will_redeliver(fields, deliveries, max_deliveries=None):
+    """
+    Whether a message whose handler failed its deliveries-th delivery gets another
+    one: it has deliveries left and its deadline (if any) has not passed by the end
+    of the redelivery backoff, when the listener would only skip it as expired.
+    """
+    if deliveries >= (max_deliveries or MAX_DELIVERIES):
+        return False
+    deadline = get_deadline(fields)
+    return deadline is None or time.time() + redelivery_delay(deliveries) < deadline
+
+
+def failure_status(fields):
+    """
+    Reply status of a command whose handler failed: 'retrying' while the listener
+    will redeliver it, 'failed' once it will not (or when handled outside the
+    listener, where fields carry no delivery attempt).
+    """
+    delivery = getattr(fields, "delivery", None)
+    if delivery is None or not will_redeliver(fields, delivery):
+        return "failed"
+    return RETRYING_STATUS
+
+
+async def delivery_count(redis_client, stream, group, msg_id):
+    """
+    Times msg_id was delivered to group according to XPENDING (0 if not pending).
+    """
+    pending = await redis_client.xpending_range(stream, group, min=msg_id, max=msg_id, count=1)
+    return pending[0]["times_delivered"] if pending else 0
+
+
+async def dead_letter(redis_client, stream, group, msg_id, fields, error, deliveries):
+    """
+    Append the message with the error attached to the dead-letter stream and ack it,
+    atomically.
+    """
+    dead_fields = {
+        **{key: value for key, value in fields.items() if key not in DEAD_FIELDS},
+        "dead_stream": stream,
+        "dead_group": group,
+        "dead_id": msg_id,
+        "dead_deliveries": str(deliveries),
+        "dead_error": str(error),
+        "dead_at": f"{time.time():.3f}",
+    }
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.xadd(dead_letter_stream(stream), dead_fields, maxlen=DEAD_LETTER_MAXLEN, approximate=True)
+        pipe.xack(stream, group, msg_id)
+        await pipe.execute()
+    logger.error(
+        f"Dead-lettered message {msg_id} of {stream} (group {group}) after {deliveries} deliveries: {error}"
+    )
+
+
+async def handle_failure(redis_client, stream, group, msg_id, fields, error, max_deliveries=None):
+    """
+    Decide the fate of a message whose handler failed: dead-letter it once it was
+    delivered max_deliveries times or its deadline passes before the redelivery
+    backoff ends, otherwise leave it pending for a later redelivery.
+    Returns True if it was dead-lettered.
+    """
+    max_deliveries = max_deliveries or MAX_DELIVERIES
+    deliveries = await delivery_count(redis_client, stream, group, msg_id)
+    if will_redeliver(fields, deliveries, max_deliveries):
+        logger.warning(
+            f"Message {msg_id} of {stream} failed (delivery {deliveries}/{max_deliveries}); "
+            f"redelivery in {redelivery_delay(deliveries):.0f}s"
+        )
+        return False
+    await dead_letter(redis_client, stream, group, msg_id, fields, error, deliveries)
+    return True
+
+
+async def reclaim_failed(redis_client, stream, group, consumer, max_deliveries=None, count=RECLAIM_BATCH):
+    """
+    XCLAIM the pending messages of group whose redelivery backoff has elapsed.
+    Messages already delivered max_deliveries times (e.g. their handler crashed
+    the listener each time) are dead-lettered instead.
+    Returns the claimed (msg_id, Envelope) to handle again, with the Envelope's
+    delivery set to the attempt the claim started.
+    """
+    max_deliveries = max_deliveries or MAX_DELIVERIES
+    min_idle = int(redelivery_delay(1) * 1000)
+    pending = await redis_client.xpending_range(stream, group, min="-", max="+", count=count, idle=min_idle)
+    due = [
+        entry for entry in pending
+        if entry["time_since_delivered"] >= redelivery_delay(entry["times_delivered"]) * 1000
+    ]
+    if not due:
+        return []
+    claimed = await redis_client.xclaim(
+        stream, group, consumer, min_idle, [entry["message_id"] for entry in due]
+    )
+    deliveries = {entry["message_id"]: entry["times_delivered"] for entry in due}
+    retry = []
+    for msg_id, fields in claimed:
+        if fields is None:
+            continue
+        if deliveries[msg_id] >= max_deliveries:
+            await dead_letter(
+                redis_client,
+                stream,
+                group,
+                msg_id,
+                fields,
+                f"exceeded {max_deliveries} deliveries without being acked",
+                deliveries[msg_id],
+            )
+            continue
+        retry.append((msg_id, Envelope(fields, msg_id, deliveries[msg_id] + 1)))
+    if retry:
+        logger.info(f"Redelivering {len(retry)} failed messages of {stream} (group {group})")
+    return retry
+
+
+async def list_dead_letters(stream, count=100, redis_client=None):
+    """
+    Return up to count (dead-letter id, fields) of stream's dead-letter stream, oldest first.
+    """
+    r = redis_client or get_redis_client()
+    return await r.xrange(dead_letter_stream(stream), count=count)
+
+
+async def requeue_dead_letters(stream, ids=None, count=None, keep_deadline=False, redis_client=None):
+    """
+    Move dead-lettered messages back to stream as new entries with their original
+    fields (all of them, the given dead-letter ids, or the oldest count).
+    Their deadline is dropped unless keep_deadline, since it has usually passed by
+    the time a fix is deployed and the listener would skip them as expired.
+    Returns the new entry ids.
+    """
+    r = redis_client or get_redis_client()
+    dead_stream = dead_letter_stream(stream)
+    if ids:
+        entries = []
+        for dead_id in ids:
+            entries.extend(await r.xrange(dead_stream, min=dead_id, max=dead_id))
+    else:
+        entries = await r.xrange(dead_stream, count=count)
+    requeued = []
+    for dead_id, fields in entries:
+        original = {key: value for key, value in fields.items() if key not in DEAD_FIELDS}
+        if not keep_deadline:
+            original.pop("deadline", None)
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.xadd(stream, original)
+            pipe.xdel(dead_stream, dead_id)
+            entry_id, _ = await pipe.execute()
+        requeued.append(entry_id)
+    logger.info(f"Requeued {len(requeued)} dead-lettered messages to {stream}")
+    return requeued
@@ -0,0 +1,57 @@
+import time
+
+# Reply status sent instead of running a command whose deadline already passed.
+EXPIRED_STATUS = "expired"
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Raised when a command's deadline has passed; nobody is waiting for the result anymore.
+    """
+
+
+def deadline_after(timeout, deadline=None):
+    """
+    Absolute deadline (epoch seconds) timeout seconds from now, capped by an
+    enclosing deadline (e.g. the saga's) when given.
+    """
+    step_deadline = time.time() + timeout
+    if deadline is None:
+        return step_deadline
+    return min(step_deadline, float(deadline))
+
+
+def get_deadline(fields):
+    """
+    Return the deadline carried in command fields as epoch seconds, or None.
+    """
+    deadline = fields.get("deadline")
+    if deadline in (None, ""):
+        return None
+    return float(deadline)
+
+
+def remaining_time(fields):
+    """
+    Seconds left until the command deadline (negative once expired), or None if unbounded.
+    """
+    deadline = get_deadline(fields)
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def is_expired(fields):
+    remaining = remaining_time(fields)
+    return remaining is not None and remaining <= 0
+
+
+def check_deadline(fields):
+    """
+    Raise DeadlineExceeded if the command deadline has passed.
+    Long-running handlers call this between stages to stop early.
+    """
+    if is_expired(fields):
+        raise DeadlineExceeded(
+            f"Deadline {fields.get('deadline')} exceeded for correlation_id={fields.get('correlation_id')}"
+        )
@@ -1,7 +1,13 @@
+import asyncio
 import functools
 import inspect
 import logging
-from .commands import emit_event
+from .binary import split_binary
+from .cancellation import CANCELLED_STATUS, CommandCancelled, check_cancelled
+from .commands import emit_event, emit_events
+from .dead_letters import failure_status
+from .deadlines import EXPIRED_STATUS, DeadlineExceeded, check_deadline, get_deadline
+from .envelope import reply_event
 
 logger = logging.getLogger(__name__)
 
@@ -9,6 +15,13 @@ def multi_stage_reply(func):
     """
     Decorator for command handlers to emit start, progress, completed, and failed events.
     Injects a 'progress' callback if the handler accepts it.
+    Injects the command 'deadline' (epoch seconds or None) if the handler accepts it;
+    progress() raises DeadlineExceeded once it has passed so long handlers stop early,
+    and a DeadlineExceeded from the handler is reported as 'expired' instead of 'failed'.
+    progress() also raises CommandCancelled once the saga is cancelled; a cancelled
+    handler (CommandCancelled or task cancellation) is reported as 'cancelled'.
+    Any other error is reported as 'retrying' while the listener will redeliver the
+    command, and as 'failed' on its last delivery (see failure_status).
     The 'completed' payload will include the handler's return value (if not None).
     Emits to reply_stream if present in fields, otherwise skips event emission.
     """
@@ -34,6 +47,8 @@ def multi_stage_reply(func):
             emit_args["saga_id"] = saga_id
 
         async def progress(fraction: float, payload: dict = None):
+            check_deadline(fields)
+            await check_cancelled(fields)
             await emit_event(
                 **emit_args,
                 status="progress",
@@ -49,6 +64,8 @@ def multi_stage_reply(func):
 
         try:
             sig = inspect.signature(func)
+            if "deadline" in sig.parameters:
+                kwargs["deadline"] = get_deadline(fields)
             if "progress" in sig.parameters:
                 result = await func(fields, progress=progress, *args, **kwargs)
             else:
@@ -60,19 +77,96 @@ def multi_stage_reply(func):
                     completed_payload = result
                 else:
                     completed_payload = {"result": result}
+            completed_payload, binary = split_binary(completed_payload)
             await emit_event(
                 **emit_args,
                 status="completed",
                 payload=completed_payload,
+                binary=binary,
             )
             return result
+        except (CommandCancelled, asyncio.CancelledError) as e:
+            await emit_event(
+                **emit_args,
+                status=CANCELLED_STATUS,
+                payload={"error": str(e) or "cancelled"},
+            )
+            raise
+        except DeadlineExceeded as e:
+            await emit_event(
+                **emit_args,
+                status=EXPIRED_STATUS,
+                payload={"error": str(e)},
+            )
+            raise
         except Exception as e:
-            # Emit failed event
+            # Emit failed (or retrying) event
             await emit_event(
                 **emit_args,
-                status="failed",
+                status=failure_status(fields),
                 payload={"error": str(e)},
             )
             raise
 
     return wrapper
+
+
+def _batch_status(fields, outcome):
+    if isinstance(outcome, CommandCancelled):
+        return CANCELLED_STATUS
+    if isinstance(outcome, DeadlineExceeded):
+        return EXPIRED_STATUS
+    if isinstance(outcome, BaseException):
+        return failure_status(fields)
+    return "completed"
+
+
+def _batch_payload(outcome):
+    if isinstance(outcome, BaseException):
+        return {"error": str(outcome)}
+    if outcome is None:
+        return {}
+    return outcome if isinstance(outcome, dict) else {"result": outcome}
+
+
+def batch_reply(func):
+    """
+    Decorator for batch command handlers: func takes a list of command fields and
+    returns one outcome per command, in order (a result, or an exception instance
+    for a command that failed).
+    Emits 'start' for every command with a reply_stream in one pipeline, then one
+    terminal reply per command ('completed', or 'failed'/'expired'/'cancelled' for
+    exception outcomes; 'retrying' instead of 'failed' while the listener will
+    redeliver the command) in a second pipeline. If func raises, every command fails
+    with that error. Returns the outcome list, so the listener acks only successes.
+    """
+    @functools.wraps(func)
+    async def wrapper(batch, *args, **kwargs):
+        logger.info(f"Executing batch_reply for {func.__name__} with {len(batch)} commands")
+
+        def replies(statuses_payloads):
+            return [
+                reply_event(fields, status, payload)
+                for fields, (status, payload) in zip(batch, statuses_payloads)
+                if fields.get("reply_stream")
+            ]
+
+        await emit_events(replies([("start", {})] * len(batch)))
+        try:
+            outcomes = await func(batch, *args, **kwargs)
+            if outcomes is None:
+                outcomes = [None] * len(batch)
+            outcomes = list(outcomes)
+            if len(outcomes) != len(batch):
+                raise ValueError(
+                    f"{func.__name__} returned {len(outcomes)} outcomes for {len(batch)} commands"
+                )
+        except asyncio.CancelledError as e:
+            await emit_events(replies([(CANCELLED_STATUS, {"error": str(e) or "cancelled"})] * len(batch)))
+            raise
+        except Exception as e:
+            outcomes = [e] * len(batch)
+        await emit_events(replies([(_batch_status(f, o), _batch_payload(o)) for f, o in zip(batch, outcomes)]))
+        return outcomes
+
+    return wrapper
@@ -0,0 +1,144 @@
+import json
+from collections.abc import Mapping
+
+from .binary import split_binary
+from .blobs import load_blob
+from .deadlines import get_deadline
+from .timings import parse_timestamp
+
+_UNSET = object()
+
+
+def reply_event(fields, status, payload=None):
+    """
+    emit_event/emit_events arguments of a reply with status to the command fields
+    (a dict or an Envelope): same reply stream, correlation id, event type and saga.
+    Bytes-like payload values are sent as binary fields instead of JSON.
+    """
+    payload, binary = split_binary({} if payload is None else payload)
+    event = {
+        "stream": fields.get("reply_stream"),
+        "correlation_id": fields.get("correlation_id"),
+        "event_type": fields.get("event_type"),
+        "saga_id": fields.get("saga_id"),
+        "status": status,
+        "payload": payload,
+    }
+    if binary:
+        event["binary"] = binary
+    return event
+
+
+class Envelope(Mapping):
+    """
+    A stream message parsed once from its entry fields.
+
+    Routing metadata (correlation_id, saga_id, event_type, ...) is read into slots up
+    front; the JSON payload is decoded only on first access to .payload (or
+    load_payload() for blob-stored payloads) and cached, so handlers and filters that
+    route on metadata never pay for it. An Envelope is also a read-only mapping of
+    the raw fields, so code written against field dicts (fields.get(...),
+    fields["reply_stream"], dict(fields)) accepts it unchanged.
+    delivery is the listener's delivery attempt of the message (1 for a first
+    delivery, None outside the listener).
+    """
+
+    __slots__ = (
+        "entry_id",
+        "fields",
+        "correlation_id",
+        "saga_id",
+        "event_type",
+        "request_id",
+        "reply_stream",
+        "status",
+        "deadline",
+        "timestamp",
+        "delivery",
+        "_payload",
+    )
+
+    def __init__(self, fields, entry_id=None, delivery=None):
+        self.entry_id = entry_id
+        self.fields = fields
+        self.correlation_id = fields.get("correlation_id")
+        self.saga_id = fields.get("saga_id")
+        self.event_type = fields.get("event_type")
+        self.request_id = fields.get("request_id")
+        self.reply_stream = fields.get("reply_stream")
+        self.status = fields.get("status")
+        self.deadline = get_deadline(fields)
+        self.timestamp = parse_timestamp(fields.get("timestamp"))
+        self.delivery = delivery
+        self._payload = _UNSET
+
+    @classmethod
+    def from_entry(cls, entry_id, fields, delivery=None):
+        """
+        Envelope of a stream entry; an Envelope is returned as is.
+        """
+        if isinstance(fields, cls):
+            return fields
+        return cls(fields, entry_id, delivery)
+
+    def __getitem__(self, key):
+        return self.fields[key]
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __repr__(self):
+        return (
+            f"Envelope(entry_id={self.entry_id!r}, event_type={self.event_type!r}, "
+            f"saga_id={self.saga_id!r}, correlation_id={self.correlation_id!r})"
+        )
+
+    def __getstate__(self):
+        # The unset-payload sentinel does not survive pickling (e.g. to the handler
+        # process pool); an unset payload is simply left out.
+        return {
+            name: getattr(self, name)
+            for name in self.__slots__
+            if not (name == "_payload" and self._payload is _UNSET)
+        }
+
+    def __setstate__(self, state):
+        self._payload = _UNSET
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @property
+    def payload(self):
+        """
+        The decoded inline payload ({} if absent), decoded on first access.
+        Raises LookupError for a blob-stored payload not yet loaded with load_payload().
+        """
+        if self._payload is _UNSET:
+            if self.fields.get("payload_ref"):
+                raise LookupError(
+                    f"payload of {self.entry_id} is stored as blob "
+                    f"{self.fields['payload_ref']}; use await load_payload()"
+                )
+            self._payload = json.loads(self.fields.get("payload") or "{}")
+        return self._payload
+
+    async def load_payload(self):
+        """
+        The decoded payload, fetching it from the blob store if it was stored there.
+        """
+        if self._payload is _UNSET:
+            key = self.fields.get("payload_ref")
+            if key:
+                self._payload = json.loads(bytes(await load_blob(key)))
+            else:
+                return self.payload
+        return self._payload
+
+    def reply_event(self, status, payload=None):
+        """
+        emit_event/emit_events arguments of a reply with status to this command.
+        """
+        return reply_event(self, status, payload)
@@ -1,41 +1,83 @@
 from app.logging_config import setup_logging
 import asyncio
 import logging
+import os
 from opentelemetry import trace
+from redis.exceptions import ConnectionError as RedisConnectionError
 import time
 import uuid
 
+from .breaker import CircuitOpenError, get_breaker
+from .cancellation import CANCELLED_STATUS, CommandCancelled, cancel_saga
 from .client import get_redis_client
-from .commands import emit_command
-from .retries import exponential_retry
+from .commands import emit_request
+from .dead_letters import RETRYING_STATUS
+from .deadlines import EXPIRED_STATUS, DeadlineExceeded, deadline_after
+from .retries import jittered_retry
+from .timings import pickup_key, timestamp
 
 setup_logging()
 
 logger = logging.getLogger(__name__)
 
+# Reply streams are per request; expire them so abandoned ones don't accumulate.
+REPLY_STREAM_TTL = int(os.environ.get("REPLY_STREAM_TTL_SECONDS", 3600))
 
-async def read_replies(
-    stream, correlation_id, request_id, timeout, retry_strategy=None, traceparent=None
+
+def reply_group_name(stream, request_id):
+    return f"{stream}.{request_id}.group"
+
+
+TERMINAL_STATUSES = ("completed", "failed", EXPIRED_STATUS, CANCELLED_STATUS)
+
+
+class ReplyFailedError(RuntimeError):
+    """
+    Raised when a handler answers with a 'failed' reply.
+    The reply fields are available as .fields.
+    """
+
+    def __init__(self, message, fields):
+        super().__init__(message)
+        self.fields = fields
+
+
+# Outcomes that prove the handler is answering, for the handler's circuit breaker.
+ANSWERED_ERRORS = (ReplyFailedError, DeadlineExceeded, CommandCancelled)
+
+
+async def stream_replies(
+    stream,
+    correlation_id,
+    request_id,
+    timeout,
+    retry_strategy=None,
+    traceparent=None,
+    create_group=True,
 ):
     """
-    Blocking read for reply stream using XREADGROUP. 
-    Returns only the 'completed' reply message as a dict.
-    Logs 'start' and 'progress' messages.
-    Raises TimeoutError if no 'completed' reply within timeout.
+    Async iterator over every reply on a reply stream, in arrival order.
+
+        async for fields in stream_replies(...):
+            if fields["status"] == "progress": ...
+
+    Yields the fields of 'start', 'progress', 'retrying' and terminal replies ('completed',
+    'failed', 'expired' or 'cancelled') and stops right after the first terminal one.
+    Raises TimeoutError if no terminal reply arrives within timeout.
     retry_strategy: a callable (attempt, elapsed, last_delay) -> delay (seconds) or None for immediate fail.
-    Supports exponential, linear, or custom retry logic.
+    create_group: set False when the group was already created (e.g. by emit_request).
     """
     tracer = trace.get_tracer(__name__)
-    with tracer.start_as_current_span("read_replies") as span:
-        span.set_attribute("stream", stream)
-        span.set_attribute("correlation_id", correlation_id)
-        span.set_attribute("request_id", request_id)
-        span.set_attribute("timeout", timeout)
-        if traceparent is not None:
-            span.set_attribute("traceparent", traceparent)
-
+    span = tracer.start_span("stream_replies")
+    span.set_attribute("stream", stream)
+    span.set_attribute("correlation_id", correlation_id)
+    span.set_attribute("request_id", request_id)
+    span.set_attribute("timeout", timeout)
+    if traceparent is not None:
+        span.set_attribute("traceparent", traceparent)
+    try:
         r = get_redis_client()
-        group_name = f"{stream}.{request_id}.group"
+        group_name = reply_group_name(stream, request_id)
         consumer_name = f"read_replies-{request_id}"
         attempt = 0
         elapsed = 0
@@ -43,91 +85,248 @@ async def read_replies(
         start_time = time.time()
 
         # Ensure consumer group exists
-        try:
-            await r.xgroup_create(stream, group_name, id="0", mkstream=True)
-        except Exception as e:
-            logger.warning(f"Error creating consumer group: {e}")
-            if "BUSYGROUP" not in str(e):
-                raise
+        if create_group:
+            try:
+                await r.xgroup_create(stream, group_name, id="0", mkstream=True)
+            except Exception as e:
+                logger.warning(f"Error creating consumer group: {e}")
+                if "BUSYGROUP" not in str(e):
+                    raise
 
-        last_id = ">"
         while time.time() - start_time < timeout:
             elapsed = time.time() - start_time
             remaining = timeout - elapsed
-            # logger.debug(
-            #     f"[read_replies] attempt={attempt}, elapsed={elapsed:.3f}, last_delay={last_delay}, last_id={last_id}"
-            # )
             block_ms = int(remaining * 1000)
             resp = await r.xreadgroup(
                 group_name,
                 consumer_name,
-                {stream: last_id},
+                # Always ">": the group cursor tracks progress; an explicit id would
+                # re-read this consumer's (already acked) pending history instead.
+                {stream: ">"},
                 count=1,
                 block=block_ms,
             )
-            # logger.debug(f"[read_replies] xreadgroup resp={resp}")
             if resp:
                 _, entries = resp[0]
-                logger.debug(f"[read_replies] entries={entries}")
+                logger.debug(f"[stream_replies] entries={entries}")
                 for entry in entries:
-                    logger.debug(f"[read_replies] entry={entry}")
                     if isinstance(entry, tuple) and len(entry) == 2:
                         entry_id, fields = entry
                     elif isinstance(entry, dict):
                         entry_id, fields = next(iter(entry.items()))
                     else:
                         logger.warning(
-                            f"[read_replies] unexpected entry format: {entry}"
+                            f"[stream_replies] unexpected entry format: {entry}"
                         )
                         continue
-                    last_id = entry_id
-                    # Acknowledge the message in the consumer group
+                    status = fields.get("status")
+                    # Acknowledge the message in the consumer group; a terminal reply also
+                    # records its pickup time in the same round trip.
                     try:
-                        await r.xack(stream, group_name, entry_id)
-                        logger.debug(f"[read_replies] acknowledged entry_id={entry_id}")
+                        if status in TERMINAL_STATUSES:
+                            pipe = r.pipeline(transaction=False)
+                            pipe.xack(stream, group_name, entry_id)
+                            pipe.set(pickup_key(stream), timestamp(), ex=REPLY_STREAM_TTL)
+                            await pipe.execute()
+                        else:
+                            await r.xack(stream, group_name, entry_id)
+                        logger.debug(f"[stream_replies] acknowledged entry_id={entry_id}")
                     except Exception as ack_err:
-                        logger.warning(f"[read_replies] failed to acknowledge entry_id={entry_id}: {ack_err}")
-                    status = fields.get("status")
+                        logger.warning(f"[stream_replies] failed to acknowledge entry_id={entry_id}: {ack_err}")
                     logger.debug(
-                        f"[read_replies] entry_id={entry_id}, status={status}, fields={fields}"
+                        f"[stream_replies] entry_id={entry_id}, status={status}, fields={fields}"
                     )
-                    if status == "completed":
-                        logger.info(f"[read_replies] completed reply: {fields}")
+                    yield fields
+                    if status in TERMINAL_STATUSES:
                         span.set_attribute("reply_entry_id", entry_id)
                         span.set_attribute("reply_status", status)
-                        return fields
-                    elif status in ("start", "progress"):
-                        logger.info(
-                            f"[read_replies] Reply status: {status}, fields: {fields}"
-                        )
+                        return
             else:
                 attempt += 1
                 elapsed = time.time() - start_time
                 logger.debug(
-                    f"[read_replies] no entries, attempt={attempt}, elapsed={elapsed:.3f}"
+                    f"[stream_replies] no entries, attempt={attempt}, elapsed={elapsed:.3f}"
                 )
                 if retry_strategy:
                     delay = retry_strategy(attempt, elapsed, last_delay)
                     logger.debug(
-                        f"[read_replies] retry_strategy returned delay={delay}"
+                        f"[stream_replies] retry_strategy returned delay={delay}"
                     )
                     if delay is None or elapsed + delay > timeout:
                         logger.warning(
-                            f"[read_replies] breaking retry loop: delay={delay}, elapsed={elapsed}, timeout={timeout}"
+                            f"[stream_replies] breaking retry loop: delay={delay}, elapsed={elapsed}, timeout={timeout}"
                         )
                         break
                     await asyncio.sleep(delay)
                     last_delay = delay
                 else:
-                    logger.warning("[read_replies] no retry_strategy, breaking loop")
+                    logger.warning("[stream_replies] no retry_strategy, breaking loop")
                     break
         logger.error(
-            f"[read_replies] TimeoutError: No 'completed' reply received in {timeout} seconds for correlation_id={correlation_id}, request_id={request_id}"
+            f"[stream_replies] TimeoutError: No 'completed' reply received in {timeout} seconds for correlation_id={correlation_id}, request_id={request_id}"
         )
         span.set_attribute("timeout", True)
         raise TimeoutError(
             f"No 'completed' reply received in {timeout} seconds for correlation_id={correlation_id}, request_id={request_id}"
         )
+    finally:
+        span.end()
+
+
+async def read_replies(
+    stream,
+    correlation_id,
+    request_id,
+    timeout,
+    retry_strategy=None,
+    traceparent=None,
+    create_group=True,
+):
+    """
+    Blocking read for reply stream using XREADGROUP. 
+    Returns only the 'completed' reply message as a dict.
+    Logs 'start' and 'progress' messages.
+    Raises ReplyFailedError as soon as a 'failed' reply arrives, or on timeout after
+    a 'retrying' reply (the handler failed and its redelivery did not answer),
+    DeadlineExceeded when the handler skipped the command as 'expired' and
+    CommandCancelled when the saga was cancelled.
+    Raises TimeoutError if no 'completed' reply within timeout.
+    retry_strategy: a callable (attempt, elapsed, last_delay) -> delay (seconds) or None for immediate fail.
+    Supports exponential, linear, or custom retry logic.
+    create_group: set False when the group was already created (e.g. by emit_request).
+    """
+    tracer = trace.get_tracer(__name__)
+    with tracer.start_as_current_span("read_replies") as span:
+        span.set_attribute("stream", stream)
+        span.set_attribute("correlation_id", correlation_id)
+        span.set_attribute("request_id", request_id)
+        span.set_attribute("timeout", timeout)
+        if traceparent is not None:
+            span.set_attribute("traceparent", traceparent)
+
+        retrying = None
+        try:
+            async for fields in stream_replies(
+                stream,
+                correlation_id,
+                request_id,
+                timeout,
+                retry_strategy=retry_strategy,
+                traceparent=traceparent,
+                create_group=create_group,
+            ):
+                status = fields.get("status")
+                if status == "completed":
+                    logger.info(f"[read_replies] completed reply: {fields}")
+                    span.set_attribute("reply_status", status)
+                    return fields
+                elif status == "failed":
+                    logger.error(f"[read_replies] failed reply: {fields}")
+                    span.set_attribute("reply_status", status)
+                    raise ReplyFailedError(
+                        f"Handler failed for correlation_id={correlation_id}, request_id={request_id}",
+                        fields,
+                    )
+                elif status == EXPIRED_STATUS:
+                    logger.warning(f"[read_replies] expired reply: {fields}")
+                    span.set_attribute("reply_status", status)
+                    raise DeadlineExceeded(
+                        f"Command expired before handling for correlation_id={correlation_id}, request_id={request_id}"
+                    )
+                elif status == CANCELLED_STATUS:
+                    logger.warning(f"[read_replies] cancelled reply: {fields}")
+                    span.set_attribute("reply_status", status)
+                    raise CommandCancelled(
+                        f"Command cancelled for correlation_id={correlation_id}, request_id={request_id}"
+                    )
+                elif status == RETRYING_STATUS:
+                    logger.warning(f"[read_replies] retrying reply: {fields}")
+                    retrying = fields
+                elif status in ("start", "progress"):
+                    logger.info(
+                        f"[read_replies] Reply status: {status}, fields: {fields}"
+                    )
+        except TimeoutError as e:
+            if retrying is None or isinstance(e, DeadlineExceeded):
+                raise
+            # The handler failed and its redelivery did not answer in time.
+            span.set_attribute("reply_status", RETRYING_STATUS)
+            raise ReplyFailedError(
+                f"Handler failed and was not retried within {timeout}s for "
+                f"correlation_id={correlation_id}, request_id={request_id}",
+                retrying,
+            ) from e
+
+
+async def request_replies(
+    command_stream,
+    response_prefix,
+    correlation_id,
+    saga_id,
+    event_type,
+    payload,
+    timeout=30,
+    retry_strategy=None,
+    deadline=None,
+):
+    """
+    Emit a command and iterate over all of its replies as they arrive,
+    so callers can act on 'start'/'progress' events before completion.
+
+        async for fields in request_replies(...):
+            ...
+
+    Ends after the terminal reply; raises TimeoutError otherwise.
+    The command carries a deadline of now + timeout, capped by deadline if given.
+    Raises CircuitOpenError without sending while the circuit of command_stream's
+    event_type handler is open.
+    The circuit breaker gets its verdict while the replies are consumed: success at
+    the terminal reply, failure when the reply stream times out or the connection drops.
+    """
+    breaker = get_breaker(command_stream, event_type)
+    breaker.before_request()
+    verdict = False
+    try:
+        request_id = uuid.uuid4().hex
+        traceparent = request_id
+        reply_stream = f"{response_prefix}:{request_id}"
+        await emit_request(
+            command_stream,
+            reply_stream,
+            reply_group_name(reply_stream, request_id),
+            correlation_id,
+            saga_id,
+            event_type,
+            payload,
+            request_id=request_id,
+            traceparent=traceparent,
+            reply_ttl=REPLY_STREAM_TTL,
+            deadline=deadline_after(timeout, deadline),
+        )
+        async for fields in stream_replies(
+            reply_stream,
+            correlation_id,
+            request_id,
+            timeout,
+            retry_strategy=retry_strategy or jittered_retry(budget=timeout),
+            traceparent=traceparent,
+            create_group=False,
+        ):
+            if fields.get("status") in TERMINAL_STATUSES and not verdict:
+                # The handler answered. Recorded before yielding, since the caller
+                # may stop iterating at the terminal reply.
+                verdict = True
+                breaker.record_success()
+            yield fields
+    except (TimeoutError, RedisConnectionError):
+        if not verdict:
+            verdict = True
+            breaker.record_failure()
+        raise
+    finally:
+        if not verdict:
+            # Abandoned or cancelled before any verdict: free a half-open probe slot.
+            breaker.release()
 
 
 async def request_and_reply(
@@ -138,40 +337,71 @@ async def request_and_reply(
     event_type,
     payload,
     timeout=30,
+    deadline=None,
 ):
     """
     Internal helper to emit a command and block for the completed reply.
+    The command, reply stream and reply group are set up in one scripted round trip.
+    Returns {} when no reply arrives within timeout; raises ReplyFailedError if the
+    handler replies 'failed'.
+    The command carries a deadline of now + timeout (capped by an enclosing saga
+    deadline), so handlers skip it once nobody is waiting for the reply.
+    Raises DeadlineExceeded when the handler replied 'expired' or the saga deadline
+    passed while waiting; the saga is cancelled first so its in-flight work stops.
+    Raises CircuitOpenError without sending the command while the circuit breaker of
+    command_stream's event_type handler is open (the handler kept timing out).
     """
 
     request_id = uuid.uuid4().hex
     traceparent = request_id
     reply_stream = f"{response_prefix}:{request_id}"
     
-    logger.info(
-        f"Requesting command: {command_stream}, correlation_id={correlation_id}, saga_id={saga_id}, event_type={event_type}, request_id={request_id}"
-    )
-    await emit_command(
-        command_stream,
-        correlation_id,
-        saga_id,
-        event_type,
-        payload,
-        reply_stream=reply_stream,
-        request_id=request_id,
-        traceparent=traceparent,
-    )
-    logger.info(
-        f"Waiting for reply: {reply_stream}, request_id={request_id}, traceparent={traceparent}"
-    )
     try:
-        return await read_replies(
-            reply_stream,
-            correlation_id,
-            request_id,
-            timeout=timeout,
-            traceparent=traceparent,
-            retry_strategy=exponential_retry(),
-        )
+        with get_breaker(command_stream, event_type).guard(answered=ANSWERED_ERRORS):
+            logger.info(
+                f"Requesting command: {command_stream}, correlation_id={correlation_id}, saga_id={saga_id}, event_type={event_type}, request_id={request_id}"
+            )
+            await emit_request(
+                command_stream,
+                reply_stream,
+                reply_group_name(reply_stream, request_id),
+                correlation_id,
+                saga_id,
+                event_type,
+                payload,
+                request_id=request_id,
+                traceparent=traceparent,
+                reply_ttl=REPLY_STREAM_TTL,
+                deadline=deadline_after(timeout, deadline),
+            )
+            logger.info(
+                f"Waiting for reply: {reply_stream}, request_id={request_id}, traceparent={traceparent}"
+            )
+            return await read_replies(
+                reply_stream,
+                correlation_id,
+                request_id,
+                timeout=timeout,
+                traceparent=traceparent,
+                retry_strategy=jittered_retry(budget=timeout),
+                create_group=False,
+            )
+    except CircuitOpenError:
+        raise
     except TimeoutError as e:
-        logger.warning(f"No reply for command {command_stream}, proceeding without response: {e}")
-        return {}
+        expired = isinstance(e, DeadlineExceeded) or (
+            deadline is not None and time.time() >= float(deadline)
+        )
+        if not expired:
+            logger.warning(f"No reply for command {command_stream}, proceeding without response: {e}")
+            return {}
+        logger.warning(f"Saga[{saga_id}]: deadline passed waiting for {command_stream}, cancelling: {e}")
+        try:
+            await cancel_saga(saga_id, reason=f"deadline exceeded waiting for {event_type}")
+        except Exception as cancel_err:
+            logger.error(f"Saga[{saga_id}]: failed to cancel", exc_info=cancel_err)
+        if isinstance(e, DeadlineExceeded):
+            raise
+        raise DeadlineExceeded(
+            f"Saga deadline passed waiting for {event_type} (correlation_id={correlation_id}, request_id={request_id})"
+        ) from e
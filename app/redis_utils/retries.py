@@ -1,3 +1,6 @@
+import random
+
+
 def immediate_fail_retry(attempt, elapsed, last_delay):
     """
     Retry strategy: fail immediately, no retries.
@@ -37,3 +40,23 @@ def linear_retry(step=0.2, max_delay=1.0, max_attempts=10):
         return min(delay, max_delay)
 
     return strategy
+
+def jittered_retry(base=0.05, max_delay=1.0, max_attempts=10, budget=None, rng=None):
+    """
+    Factory for a decorrelated jitter retry strategy: each delay is drawn uniformly
+    from [base, 3 * last_delay] (last_delay starting at base) and capped at max_delay, so callers that failed
+    together spread out instead of retrying in lockstep.
+    budget: overall seconds; gives up (None) once elapsed + delay would exceed it.
+    Returns a function (attempt, elapsed, last_delay) -> delay or None.
+    """
+    rng = rng or random.Random()
+
+    def strategy(attempt, elapsed, last_delay):
+        if attempt > max_attempts:
+            return None
+        delay = min(max_delay, rng.uniform(base, 3 * max(base, last_delay)))
+        if budget is not None and elapsed + delay > budget:
+            return None
+        return delay
+
+    return strategy
@@ -0,0 +1,32 @@
+import time
+
+# Reply streams get a companion key holding when the requester read the terminal reply,
+# so reply pickup delay can be measured after the fact (see app.tools.latency).
+PICKUP_SUFFIX = ":picked_up"
+
+
+def timestamp(at=None):
+    """
+    Message timestamp field value: epoch seconds with microsecond resolution.
+    """
+    return f"{time.time() if at is None else at:.6f}"
+
+
+def parse_timestamp(value):
+    """
+    Epoch seconds of a timestamp field (also accepts the older whole-second form), or None.
+    """
+    if value in (None, ""):
+        return None
+    return float(value)
+
+
+def entry_time(entry_id):
+    """
+    Epoch seconds at which Redis appended a stream entry, from its id.
+    """
+    return int(str(entry_id).partition("-")[0]) / 1000
+
+
+def pickup_key(reply_stream):
+    return f"{reply_stream}{PICKUP_SUFFIX}"
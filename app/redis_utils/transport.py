@@ -0,0 +1,691 @@
+import asyncio
+import bisect
+import builtins
+import fnmatch
+import logging
+import os
+import time
+from typing import Protocol
+
+from redis.commands.core import AsyncScript
+from redis.exceptions import ResponseError
+
+logger = logging.getLogger(__name__)
+
+# "redis" (default): Redis Streams over the network. "memory": an in-process
+# InMemoryTransport shared by everything running in this process.
+MESSAGE_TRANSPORT = os.environ.get("MESSAGE_TRANSPORT", "redis")
+
+# Python equivalents of Lua scripts, keyed by script source (see memory_script).
+_SCRIPTS = {}
+_memory_transport = None
+
+
+class Transport(Protocol):
+    """
+    The stream subset of the redis.asyncio.Redis API the messaging code relies on.
+
+    redis.asyncio.Redis is the Redis Streams implementation; InMemoryTransport
+    implements the same calls, return shapes and errors for co-located components.
+    Both are obtained through get_redis_client().
+    """
+
+    async def xadd(self, name, fields, id="*", maxlen=None, approximate=True): ...
+
+    async def xgroup_create(self, name, groupname, id="$", mkstream=False): ...
+
+    async def xreadgroup(self, groupname, consumername, streams, count=None, block=None, noack=False): ...
+
+    async def xread(self, streams, count=None, block=None): ...
+
+    async def xack(self, name, groupname, *ids): ...
+
+    async def xrange(self, name, min="-", max="+", count=None): ...
+
+    async def xrevrange(self, name, max="+", min="-", count=None): ...
+
+    async def xlen(self, name): ...
+
+    async def xtrim(self, name, maxlen=None, approximate=True, minid=None): ...
+
+    async def xinfo_stream(self, name): ...
+
+    async def xinfo_groups(self, name): ...
+
+    async def xinfo_consumers(self, name, groupname): ...
+
+    async def xpending(self, name, groupname): ...
+
+    async def xpending_range(self, name, groupname, min, max, count, consumername=None, idle=None): ...
+
+    async def xclaim(self, name, groupname, consumername, min_idle_time, message_ids): ...
+
+    async def xdel(self, name, *ids): ...
+
+    async def expire(self, name, time): ...
+
+    async def delete(self, *names): ...
+
+    def scan_iter(self, match=None, count=None, _type=None): ...
+
+    def pipeline(self, transaction=True): ...
+
+    def register_script(self, script): ...
+
+
+def memory_script(source):
+    """
+    Register a Python coroutine (transport, keys, args) that InMemoryTransport runs
+    in place of the Lua script source.
+    """
+
+    def register(func):
+        _SCRIPTS[source] = func
+        return func
+
+    return register
+
+
+def _parse_id(entry_id, default_seq=0):
+    if entry_id in ("-", "0"):
+        return (0, 0)
+    if entry_id == "+":
+        return (float("inf"), float("inf"))
+    ms, _, seq = str(entry_id).partition("-")
+    return (int(ms), int(seq) if seq else default_seq)
+
+
+def _format_id(parsed):
+    return f"{parsed[0]}-{parsed[1]}"
+
+
+class _Group:
+    __slots__ = ("last_id", "pending", "consumers")
+
+    def __init__(self, last_id):
+        self.last_id = last_id
+        # entry id -> [consumer name, last delivery (monotonic), delivery count]
+        self.pending = {}
+        # consumer name -> last read attempt (monotonic)
+        self.consumers = {}
+
+    def deliver(self, entry_id, consumername):
+        previous = self.pending.get(entry_id)
+        count = previous[2] + 1 if previous else 1
+        self.pending[entry_id] = [consumername, time.monotonic(), count]
+
+
+class _Stream:
+    __slots__ = ("ids", "entries", "groups", "last_id", "added")
+
+    def __init__(self):
+        self.ids = []
+        self.entries = []
+        self.groups = {}
+        self.last_id = (0, 0)
+        self.added = 0
+
+    def entry(self, entry_id):
+        index = bisect.bisect_left(self.ids, _parse_id(entry_id))
+        if index < len(self.ids) and _format_id(self.ids[index]) == entry_id:
+            return self.entries[index]
+        return None
+
+    def after(self, parsed, count=None):
+        start = bisect.bisect_right(self.ids, parsed)
+        stop = len(self.ids) if count is None else min(len(self.ids), start + count)
+        return [(_format_id(self.ids[i]), self.entries[i]) for i in range(start, stop)]
+
+
+class _Pipeline:
+    """
+    Queues calls like a redis pipeline and runs them in order on execute().
+    Everything runs on one event loop, so the batch is atomic without locking.
+    """
+
+    def __init__(self, transport):
+        self._transport = transport
+        self._calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self._calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self._transport, name)
+
+        def queue(*args, **kwargs):
+            self._calls.append((method, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self, raise_on_error=True):
+        calls, self._calls = self._calls, []
+        results = []
+        for method, args, kwargs in calls:
+            try:
+                results.append(await method(*args, **kwargs))
+            except ResponseError as e:
+                if raise_on_error:
+                    raise
+                results.append(e)
+        return results
+
+
+class _SortedSet(dict):
+    """
+    Members of an in-memory sorted set mapped to their scores.
+    """
+
+
+class _Script:
+    def __init__(self, transport, source):
+        if source not in _SCRIPTS:
+            raise NotImplementedError("This Lua script has no in-memory implementation; use Redis")
+        self._transport = transport
+        self._func = _SCRIPTS[source]
+
+    async def __call__(self, keys=(), args=(), client=None):
+        if isinstance(client, _Pipeline):
+            # Queued like any other pipelined call; its result comes from execute().
+            client._calls.append((self._func, (self._transport, list(keys), list(args)), {}))
+            return client
+        return await self._func(self._transport, list(keys), list(args))
+
+
+class Script:
+    """
+    A Lua script registered once at module level and run on the client given to each
+    call: EVALSHA with the SHA computed here (SCRIPT LOAD only if the server lacks it)
+    on a Redis client or pipeline, the memory_script equivalent on an
+    InMemoryTransport or its pipeline.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self._redis_script = AsyncScript(None, source.encode())
+
+    async def __call__(self, keys=(), args=(), client=None):
+        if isinstance(client, InMemoryTransport):
+            return await _Script(client, self.source)(keys, args)
+        if isinstance(client, _Pipeline):
+            return await _Script(client._transport, self.source)(keys, args, client=client)
+        return await self._redis_script(keys=list(keys), args=list(args), client=client)
+
+
+class InMemoryTransport:
+    """
+    asyncio in-process implementation of the Transport calls, with Redis Streams
+    semantics: entry ids, consumer groups with per-group delivery cursors and pending
+    entries, XACK, MAXLEN trimming, blocking reads and key expiry. Also keeps plain
+    string keys (SET/GET/EXISTS) used next to streams, e.g. blobs and saga markers,
+    the hashes and sorted sets of the event-driven saga engine and the sets of the
+    fleet registry.
+
+    Fields stay Python dicts (shallow-copied on add and read) and are never serialized.
+    Lua scripts run only if a Python equivalent was registered with memory_script.
+    """
+
+    def __init__(self):
+        self._streams = {}
+        self._values = {}
+        self._expiry = {}
+        self._waiters = set()
+
+    # keys -------------------------------------------------------------------
+
+    def _purge(self, name):
+        expires = self._expiry.get(name)
+        if expires is not None and expires <= time.monotonic():
+            self._expiry.pop(name, None)
+            self._streams.pop(name, None)
+            self._values.pop(name, None)
+
+    def _exists(self, name):
+        self._purge(name)
+        return name in self._streams or name in self._values
+
+    async def exists(self, *names):
+        return sum(1 for name in names if self._exists(name))
+
+    async def delete(self, *names):
+        deleted = 0
+        for name in names:
+            if self._exists(name):
+                deleted += 1
+            self._streams.pop(name, None)
+            self._values.pop(name, None)
+            self._expiry.pop(name, None)
+        return deleted
+
+    async def expire(self, name, time_seconds):
+        if not self._exists(name):
+            return False
+        self._expiry[name] = time.monotonic() + float(time_seconds)
+        return True
+
+    async def ttl(self, name):
+        if not self._exists(name):
+            return -2
+        expires = self._expiry.get(name)
+        return -1 if expires is None else int(expires - time.monotonic())
+
+    async def set(self, name, value, ex=None, nx=False):
+        if nx and self._exists(name):
+            return None
+        self._values[name] = value
+        self._expiry.pop(name, None)
+        if ex is not None:
+            self._expiry[name] = time.monotonic() + float(ex)
+        return True
+
+    async def get(self, name):
+        self._purge(name)
+        return self._values.get(name)
+
+    def _typed(self, name, kind):
+        self._purge(name)
+        value = self._values.get(name)
+        if value is not None and type(value) is not kind:
+            raise ResponseError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    async def hset(self, name, key=None, value=None, mapping=None):
+        fields = dict(mapping or {})
+        if key is not None:
+            fields[key] = value
+        current = self._typed(name, dict)
+        if current is None:
+            current = self._values[name] = {}
+        added = sum(1 for field in fields if field not in current)
+        current.update({field: str(value) for field, value in fields.items()})
+        return added
+
+    async def hget(self, name, key):
+        return (self._typed(name, dict) or {}).get(key)
+
+    async def hgetall(self, name):
+        return dict(self._typed(name, dict) or {})
+
+    async def hdel(self, name, *keys):
+        current = self._typed(name, dict)
+        if current is None:
+            return 0
+        removed = sum(1 for key in keys if current.pop(key, None) is not None)
+        if not current:
+            await self.delete(name)
+        return removed
+
+    async def sadd(self, name, *values):
+        current = self._typed(name, set)
+        if current is None:
+            current = self._values[name] = set()
+        added = sum(1 for value in values if value not in current)
+        current.update(values)
+        return added
+
+    async def srem(self, name, *values):
+        current = self._typed(name, set)
+        if current is None:
+            return 0
+        removed = sum(1 for value in values if value in current)
+        current.difference_update(values)
+        if not current:
+            await self.delete(name)
+        return removed
+
+    async def smembers(self, name):
+        return set(self._typed(name, set) or ())
+
+    async def scard(self, name):
+        return len(self._typed(name, set) or ())
+
+    async def zadd(self, name, mapping):
+        current = self._typed(name, _SortedSet)
+        if current is None:
+            current = self._values[name] = _SortedSet()
+        added = sum(1 for member in mapping if member not in current)
+        current.update({member: float(score) for member, score in mapping.items()})
+        return added
+
+    async def zrem(self, name, *members):
+        current = self._typed(name, _SortedSet)
+        if current is None:
+            return 0
+        removed = sum(1 for member in members if current.pop(member, None) is not None)
+        if not current:
+            await self.delete(name)
+        return removed
+
+    async def zrangebyscore(self, name, min, max, start=None, num=None, withscores=False):
+        low, high = float(min), float(max)
+        members = sorted(
+            ((score, member) for member, score in (self._typed(name, _SortedSet) or {}).items()
+             if low <= score <= high)
+        )
+        if start is not None:
+            members = members[start:start + num]
+        if withscores:
+            return [(member, score) for score, member in members]
+        return [member for _, member in members]
+
+    async def zrevrangebyscore(self, name, max, min, start=None, num=None, withscores=False):
+        members = await self.zrangebyscore(name, min, max, withscores=True)
+        members = sorted(members, key=lambda item: (item[1], item[0]), reverse=True)
+        if start is not None:
+            members = members[start:start + num]
+        if withscores:
+            return members
+        return [member for member, _ in members]
+
+    async def scan_iter(self, match=None, count=None, _type=None):
+        for name in list(self._streams) + list(self._values):
+            if self._exists(name) and (match is None or fnmatch.fnmatchcase(name, match)):
+                yield name
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+    def register_script(self, script):
+        return _Script(self, script)
+
+    async def close(self):
+        pass
+
+    # streams ----------------------------------------------------------------
+
+    def _stream(self, name, create=False):
+        self._purge(name)
+        stream = self._streams.get(name)
+        if stream is None and create:
+            if name in self._values:
+                raise ResponseError("WRONGTYPE Operation against a key holding the wrong kind of value")
+            stream = self._streams[name] = _Stream()
+        return stream
+
+    def _notify(self):
+        waiters, self._waiters = self._waiters, set()
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def _wait(self, deadline):
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.add(waiter)
+        try:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiters.discard(waiter)
+
+    async def xadd(self, name, fields, id="*", maxlen=None, approximate=True):
+        stream = self._stream(name, create=True)
+        if id == "*":
+            now = int(time.time() * 1000)
+            last_ms, last_seq = stream.last_id
+            parsed = (now, 0) if now > last_ms else (last_ms, last_seq + 1)
+        else:
+            parsed = _parse_id(id)
+            if parsed <= stream.last_id:
+                raise ResponseError(
+                    "ERR The ID specified in XADD is equal or smaller than the target stream top item"
+                )
+        stream.ids.append(parsed)
+        stream.entries.append(dict(fields))
+        stream.last_id = parsed
+        stream.added += 1
+        if maxlen is not None and len(stream.ids) > maxlen:
+            drop = len(stream.ids) - maxlen
+            del stream.ids[:drop]
+            del stream.entries[:drop]
+        self._notify()
+        return _format_id(parsed)
+
+    async def xlen(self, name):
+        stream = self._stream(name)
+        return len(stream.ids) if stream else 0
+
+    async def xtrim(self, name, maxlen=None, approximate=True, minid=None):
+        stream = self._stream(name)
+        if stream is None:
+            return 0
+        if minid is not None:
+            drop = bisect.bisect_left(stream.ids, _parse_id(minid))
+        else:
+            drop = max(0, len(stream.ids) - maxlen)
+        del stream.ids[:drop]
+        del stream.entries[:drop]
+        return drop
+
+    async def xrange(self, name, min="-", max="+", count=None):
+        stream = self._stream(name)
+        if stream is None:
+            return []
+        start = bisect.bisect_left(stream.ids, _parse_id(min))
+        stop = bisect.bisect_right(stream.ids, _parse_id(max, default_seq=float("inf")))
+        if count is not None:
+            stop = builtins.min(stop, start + count)
+        return [(_format_id(stream.ids[i]), dict(stream.entries[i])) for i in range(start, stop)]
+
+    async def xrevrange(self, name, max="+", min="-", count=None):
+        entries = await self.xrange(name, min=min, max=max)
+        entries.reverse()
+        return entries if count is None else entries[:count]
+
+    async def xgroup_create(self, name, groupname, id="$", mkstream=False):
+        stream = self._stream(name, create=mkstream)
+        if stream is None:
+            raise ResponseError(
+                "ERR The XGROUP subcommand requires the key to exist. "
+                "Note that for CREATE you may want to use the MKSTREAM option to create an empty stream automatically."
+            )
+        if groupname in stream.groups:
+            raise ResponseError("BUSYGROUP Consumer Group name already exists")
+        stream.groups[groupname] = _Group(stream.last_id if id == "$" else _parse_id(id))
+        return True
+
+    def _read_group(self, groupname, consumername, streams, count, noack):
+        result = []
+        for name, last_id in streams.items():
+            stream = self._stream(name)
+            group = stream.groups.get(groupname) if stream else None
+            if group is None:
+                raise ResponseError(
+                    f"NOGROUP No such key '{name}' or consumer group '{groupname}' in XREADGROUP with GROUP option"
+                )
+            group.consumers[consumername] = time.monotonic()
+            if last_id == ">":
+                entries = stream.after(group.last_id, count)
+                if entries:
+                    group.last_id = _parse_id(entries[-1][0])
+                    if not noack:
+                        for entry_id, _ in entries:
+                            group.deliver(entry_id, consumername)
+            else:
+                # Re-deliver this consumer's pending entries after last_id.
+                after = _parse_id(last_id)
+                entries = []
+                for entry_id, (owner, _, _) in list(group.pending.items()):
+                    if owner != consumername or _parse_id(entry_id) <= after:
+                        continue
+                    fields = stream.entry(entry_id)
+                    if fields is not None:
+                        group.deliver(entry_id, consumername)
+                        entries.append((entry_id, fields))
+                    if count is not None and len(entries) >= count:
+                        break
+            # New-entry reads only report streams with entries; history reads always do.
+            if entries or last_id != ">":
+                result.append([name, [(entry_id, dict(fields)) for entry_id, fields in entries]])
+        return result
+
+    async def xreadgroup(self, groupname, consumername, streams, count=None, block=None, noack=False):
+        deadline = None if not block else time.monotonic() + block / 1000
+        while True:
+            result = self._read_group(groupname, consumername, streams, count, noack)
+            if result or block is None:
+                return result
+            if deadline is not None and time.monotonic() >= deadline:
+                return []
+            await self._wait(deadline)
+
+    async def xread(self, streams, count=None, block=None):
+        positions = {}
+        for name, last_id in streams.items():
+            if last_id == "$":
+                stream = self._stream(name)
+                positions[name] = stream.last_id if stream else (0, 0)
+            else:
+                positions[name] = _parse_id(last_id)
+        deadline = None if not block else time.monotonic() + block / 1000
+        while True:
+            result = []
+            for name, after in positions.items():
+                stream = self._stream(name)
+                entries = stream.after(after, count) if stream else []
+                if entries:
+                    result.append([name, [(entry_id, dict(fields)) for entry_id, fields in entries]])
+            if result or block is None:
+                return result
+            if deadline is not None and time.monotonic() >= deadline:
+                return []
+            await self._wait(deadline)
+
+    async def xinfo_stream(self, name):
+        stream = self._stream(name)
+        if stream is None:
+            raise ResponseError("ERR no such key")
+        return {
+            "length": len(stream.ids),
+            "groups": len(stream.groups),
+            "last-generated-id": _format_id(stream.last_id),
+            "entries-added": stream.added,
+            "first-entry": (_format_id(stream.ids[0]), dict(stream.entries[0])) if stream.ids else None,
+        }
+
+    async def xinfo_groups(self, name):
+        stream = self._stream(name)
+        if stream is None:
+            raise ResponseError("ERR no such key")
+        return [
+            {
+                "name": groupname,
+                "consumers": len(group.consumers),
+                "pending": len(group.pending),
+                "last-delivered-id": _format_id(group.last_id),
+                "lag": len(stream.after(group.last_id)),
+            }
+            for groupname, group in stream.groups.items()
+        ]
+
+    async def xinfo_consumers(self, name, groupname):
+        _, group = self._group(name, groupname)
+        now = time.monotonic()
+        return [
+            {
+                "name": consumer,
+                "pending": sum(1 for owner, _, _ in group.pending.values() if owner == consumer),
+                "idle": int((now - seen) * 1000),
+            }
+            for consumer, seen in group.consumers.items()
+        ]
+
+    async def xpending(self, name, groupname):
+        _, group = self._group(name, groupname)
+        if not group.pending:
+            return {"pending": 0, "min": None, "max": None, "consumers": []}
+        ids = sorted(group.pending, key=_parse_id)
+        counts = {}
+        for owner, _, _ in group.pending.values():
+            counts[owner] = counts.get(owner, 0) + 1
+        return {
+            "pending": len(ids),
+            "min": ids[0],
+            "max": ids[-1],
+            "consumers": [{"name": owner, "pending": n} for owner, n in counts.items()],
+        }
+
+    def _group(self, name, groupname):
+        stream = self._stream(name)
+        group = stream.groups.get(groupname) if stream else None
+        if group is None:
+            raise ResponseError(f"NOGROUP No such key '{name}' or consumer group '{groupname}'")
+        return stream, group
+
+    async def xpending_range(self, name, groupname, min, max, count, consumername=None, idle=None):
+        _, group = self._group(name, groupname)
+        low, high = _parse_id(min), _parse_id(max, default_seq=float("inf"))
+        now = time.monotonic()
+        result = []
+        for parsed, entry_id in sorted((_parse_id(entry_id), entry_id) for entry_id in group.pending):
+            owner, delivered, deliveries = group.pending[entry_id]
+            idle_ms = int((now - delivered) * 1000)
+            if not low <= parsed <= high:
+                continue
+            if (consumername is not None and owner != consumername) or (idle is not None and idle_ms < idle):
+                continue
+            result.append(
+                {
+                    "message_id": entry_id,
+                    "consumer": owner,
+                    "time_since_delivered": idle_ms,
+                    "times_delivered": deliveries,
+                }
+            )
+            if len(result) >= count:
+                break
+        return result
+
+    async def xclaim(self, name, groupname, consumername, min_idle_time, message_ids, **kwargs):
+        stream, group = self._group(name, groupname)
+        now = time.monotonic()
+        group.consumers[consumername] = now
+        claimed = []
+        for entry_id in message_ids:
+            pending = group.pending.get(entry_id)
+            if pending is None or (now - pending[1]) * 1000 < min_idle_time:
+                continue
+            fields = stream.entry(entry_id)
+            if fields is None:
+                # Deleted entries leave the pending list, as in Redis 7.
+                del group.pending[entry_id]
+                continue
+            group.deliver(entry_id, consumername)
+            claimed.append((entry_id, dict(fields)))
+        return claimed
+
+    async def xdel(self, name, *ids):
+        stream = self._stream(name)
+        if stream is None:
+            return 0
+        deleted = 0
+        for entry_id in ids:
+            index = bisect.bisect_left(stream.ids, _parse_id(entry_id))
+            if index < len(stream.ids) and _format_id(stream.ids[index]) == entry_id:
+                del stream.ids[index]
+                del stream.entries[index]
+                deleted += 1
+        return deleted
+
+    async def xack(self, name, groupname, *ids):
+        stream = self._stream(name)
+        group = stream.groups.get(groupname) if stream else None
+        if group is None:
+            return 0
+        return sum(1 for entry_id in ids if group.pending.pop(entry_id, None) is not None)
+
+
+def get_memory_transport():
+    """
+    Return the process-wide InMemoryTransport.
+    """
+    global _memory_transport
+    if _memory_transport is None:
+        _memory_transport = InMemoryTransport()
+        logger.info("Using in-memory message transport")
+    return _memory_transport
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds between trimming passes; 0 disables the trimmer.
+STREAM_TRIM_INTERVAL = float(os.environ.get("STREAM_TRIM_INTERVAL_SECONDS", 60))
+# Entries younger than this are kept even once every group acked them (for debugging).
+STREAM_RETENTION = float(os.environ.get("STREAM_RETENTION_SECONDS", 3600))
+# Entries pending longer than this are abandoned (nothing reclaims them that late, e.g.
+# other groups' event types a listener skipped) and no longer hold trimming back.
+STREAM_PENDING_TIMEOUT = float(os.environ.get("STREAM_PENDING_TIMEOUT_SECONDS", 86400))
+
+
+def _id_before(seconds):
+    return (int((time.time() - seconds) * 1000), 0)
+
+
+def _parse_id(entry_id):
+    ms, _, seq = str(entry_id).partition("-")
+    return int(ms), int(seq or 0)
+
+
+async def trim_horizon(redis_client, stream, abandoned_before):
+    """
+    Oldest entry id (ms, seq) any consumer group of stream may still need, or None
+    if the stream has no groups: a group's oldest pending entry, or the entry after
+    its last delivered one. Pending entries older than abandoned_before are ignored.
+    """
+    groups = await redis_client.xinfo_groups(stream)
+    if not groups:
+        return None
+    horizon = None
+    for group in groups:
+        ms, seq = _parse_id(group["last-delivered-id"])
+        needed = (ms, seq + 1)
+        if group.get("pending"):
+            oldest = await redis_client.xpending_range(
+                stream,
+                group["name"],
+                min=f"{abandoned_before[0]}-{abandoned_before[1]}",
+                max="+",
+                count=1,
+            )
+            if oldest:
+                needed = min(needed, _parse_id(oldest[0]["message_id"]))
+        if horizon is None or needed < horizon:
+            horizon = needed
+    return horizon
+
+
+async def trim_stream(
+    redis_client, stream, retention=STREAM_RETENTION, pending_timeout=STREAM_PENDING_TIMEOUT
+):
+    """
+    XTRIM MINID (approximate) stream behind the entries its consumer groups still
+    need, keeping at least the last retention seconds. Returns the trimmed count.
+    """
+    floor = _id_before(retention)
+    try:
+        horizon = await trim_horizon(redis_client, stream, _id_before(pending_timeout))
+    except Exception as e:
+        if "no such key" in str(e).lower():
+            return 0
+        raise
+    if horizon is None:
+        return 0
+    minid = min(horizon, floor)
+    trimmed = await redis_client.xtrim(stream, minid=f"{minid[0]}-{minid[1]}", approximate=True)
+    if trimmed:
+        logger.info(f"Trimmed {trimmed} entries from {stream} before {minid[0]}-{minid[1]}")
+    return trimmed
+
+
+async def run_trimmer(redis_client, streams, shutdown_event, interval=STREAM_TRIM_INTERVAL, retention=STREAM_RETENTION):
+    """
+    Trim streams every interval seconds until shutdown_event is set.
+    """
+    streams = sorted(set(streams))
+    logger.info(f"Trimming {streams} every {interval}s (retention {retention}s)")
+    while not shutdown_event.is_set():
+        for stream in streams:
+            try:
+                await trim_stream(redis_client, stream, retention=retention)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to trim stream {stream}", exc_info=e)
+        try:
+            await asyncio.wait_for(shutdown_event.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
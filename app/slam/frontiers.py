@@ -0,0 +1,198 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# |log-odds| at or below this band counts as unknown; below -band as free.
+UNKNOWN_BAND = 0.1
+# Half of the 8-neighbourhood; the other half is covered by symmetry.
+_FORWARD = ((0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def frontier_mask(grid, unknown_band=UNKNOWN_BAND, window=None):
+    """
+    Mark free cells with at least one unknown 8-neighbour.
+
+    window: optional (row0, row1, col0, col1) to evaluate only that region (half-open);
+    a one-cell halo around it is read from grid so results match a full evaluation.
+    Cells outside the map are not treated as unknown.
+    Returns a bool mask of the window shape.
+    """
+    height, width = grid.shape
+    row0, row1, col0, col1 = window if window is not None else (0, height, 0, width)
+    top, left = max(row0 - 1, 0), max(col0 - 1, 0)
+    bottom, right = min(row1 + 1, height), min(col1 + 1, width)
+    region = grid[top:bottom, left:right]
+
+    unknown = np.zeros((row1 - row0 + 2, col1 - col0 + 2), dtype=bool)
+    unknown[
+        top - row0 + 1:bottom - row0 + 1,
+        left - col0 + 1:right - col0 + 1,
+    ] = np.abs(region) <= unknown_band
+    near_unknown = np.zeros((row1 - row0, col1 - col0), dtype=bool)
+    rows, cols = near_unknown.shape
+    for dr in (0, 1, 2):
+        for dc in (0, 1, 2):
+            if dr == 1 and dc == 1:
+                continue
+            near_unknown |= unknown[dr:dr + rows, dc:dc + cols]
+    free = grid[row0:row1, col0:col1] < -unknown_band
+    return free & near_unknown
+
+
+def label_cells(cells, width):
+    """
+    8-connected component labeling of a sparse set of cells.
+
+    cells: sorted 1D array of flat indices (row * width + col).
+    Adjacent pairs are found with a binary search per forward offset, then components
+    are merged by min-hooking roots and pointer jumping, all as array operations.
+    Returns component ids in [0, k) aligned with cells.
+    """
+    n = cells.size
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    rows, cols = np.divmod(cells, width)
+    heads, tails = [], []
+    for dr, dc in _FORWARD:
+        target_cols = cols + dc
+        inside = (target_cols >= 0) & (target_cols < width)
+        targets = (rows + dr) * width + target_cols
+        position = np.searchsorted(cells, targets)
+        position[position >= n] = n - 1
+        linked = inside & (cells[position] == targets)
+        heads.append(np.nonzero(linked)[0])
+        tails.append(position[linked])
+    heads = np.concatenate(heads)
+    tails = np.concatenate(tails)
+
+    parent = np.arange(n)
+    while True:
+        root_heads, root_tails = parent[heads], parent[tails]
+        low = np.minimum(root_heads, root_tails)
+        hooked = parent.copy()
+        np.minimum.at(hooked, root_heads, low)
+        np.minimum.at(hooked, root_tails, low)
+        while True:
+            jumped = hooked[hooked]
+            if np.array_equal(jumped, hooked):
+                break
+            hooked = jumped
+        if np.array_equal(hooked, parent):
+            break
+        parent = hooked
+    return np.unique(parent, return_inverse=True)[1]
+
+
+class FrontierMap:
+    """
+    Frontier cells and their clusters for an occupancy grid, maintained incrementally.
+
+    Each frontier cell's cluster label is kept in a grid-shaped array and each
+    cluster's cells in an index, so update() reads the labels around the changed
+    window, re-evaluates the window plus a one-cell halo and relabels only the
+    clusters that touch it: per-cycle cost scales with the size of the update and
+    of the affected frontier clusters rather than with the map or the frontier.
+    """
+
+    def __init__(self, grid, unknown_band=UNKNOWN_BAND):
+        self.grid = np.array(grid, dtype=np.float32)
+        self.unknown_band = unknown_band
+        self.width = self.grid.shape[1]
+        self.label_grid = np.full(self.grid.shape, -1, dtype=np.int64)
+        self._components = {}
+        self._next_label = 0
+        cells = np.flatnonzero(frontier_mask(self.grid, unknown_band))
+        self._add_components(cells, label_cells(cells, self.width))
+
+    def _add_components(self, cells, ids):
+        # cells sorted, ids in [0, k) from label_cells; each component keeps its cells sorted.
+        if cells.size == 0:
+            return
+        labels = ids + self._next_label
+        self.label_grid.flat[cells] = labels
+        order = np.argsort(ids, kind="stable")
+        counts = np.bincount(ids)
+        for label, members in zip(
+            range(self._next_label, self._next_label + counts.size),
+            np.split(cells[order], np.cumsum(counts)[:-1]),
+        ):
+            self._components[label] = members
+        self._next_label += counts.size
+
+    @property
+    def cells(self):
+        """
+        Sorted flat indices of all frontier cells.
+        """
+        return np.flatnonzero(self.label_grid >= 0)
+
+    @property
+    def labels(self):
+        """
+        Cluster labels aligned with cells.
+        """
+        return self.label_grid.ravel()[self.cells]
+
+    def update(self, row, col, patch):
+        """
+        Write patch (2D log-odds) into the grid at (row, col) and refresh frontiers.
+        Returns the number of frontier cells that were relabeled.
+        """
+        patch = np.asarray(patch, dtype=np.float32)
+        height, width = self.grid.shape
+        row1, col1 = row + patch.shape[0], col + patch.shape[1]
+        self.grid[row:row1, col:col1] = patch
+
+        # Frontier status can change one cell around the patch; connectivity of
+        # clusters can change one cell further out.
+        window = (max(row - 1, 0), min(row1 + 1, height), max(col - 1, 0), min(col1 + 1, width))
+        reach = self.label_grid[max(row - 2, 0):min(row1 + 2, height), max(col - 2, 0):min(col1 + 2, width)]
+
+        affected = np.unique(reach[reach >= 0])
+        members = [self._components.pop(int(label)) for label in affected]
+        previous = np.concatenate(members) if members else np.zeros(0, dtype=np.int64)
+        self.label_grid.flat[previous] = -1
+        # Every frontier cell inside the window belongs to an affected cluster and is
+        # re-evaluated below; the other cells of those clusters keep their status.
+        rows, cols = np.divmod(previous, self.width)
+        kept = previous[
+            (rows < window[0]) | (rows >= window[1]) | (cols < window[2]) | (cols >= window[3])
+        ]
+        local = frontier_mask(self.grid, self.unknown_band, window=window)
+        local_rows, local_cols = np.nonzero(local)
+        fresh = (local_rows + window[0]) * self.width + local_cols + window[2]
+
+        relabel = np.concatenate((kept, fresh))
+        relabel.sort()
+        self._add_components(relabel, label_cells(relabel, self.width))
+        logger.debug(
+            f"Frontier update {patch.shape} at ({row}, {col}): relabeled {relabel.size} cells"
+        )
+        return int(relabel.size)
+
+    def clusters(self, min_size=1):
+        """
+        Return frontier clusters as dicts with label, size and centroid [row, col],
+        largest first.
+        """
+        if not self._components:
+            return []
+        ids = np.fromiter(self._components, dtype=np.int64, count=len(self._components))
+        members = list(self._components.values())
+        sizes = np.fromiter((m.size for m in members), dtype=np.int64, count=len(members))
+        rows, cols = np.divmod(np.concatenate(members), self.width)
+        inverse = np.repeat(np.arange(ids.size), sizes)
+        centroid_rows = np.bincount(inverse, weights=rows) / sizes
+        centroid_cols = np.bincount(inverse, weights=cols) / sizes
+        order = np.lexsort((ids, -sizes))
+        return [
+            {
+                "label": int(ids[i]),
+                "size": int(sizes[i]),
+                "centroid": [float(centroid_rows[i]), float(centroid_cols[i])],
+            }
+            for i in order
+            if sizes[i] >= min_size
+        ]
@@ -0,0 +1,174 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LOG_ODDS_MIN = -10.0
+LOG_ODDS_MAX = 10.0
+# Upper bound on robot-cell samples held in memory at once while fusing.
+MAX_BATCH_CELLS = 1 << 22
+
+
+def probability_to_log_odds(probability, eps=1e-6):
+    """
+    Convert occupancy probabilities to log-odds (0.5 -> 0, i.e. unknown).
+    """
+    p = np.clip(np.asarray(probability, dtype=np.float32), eps, 1.0 - eps)
+    return np.log(p / (1.0 - p)).astype(np.float32)
+
+
+def log_odds_to_probability(log_odds):
+    """
+    Convert log-odds back to occupancy probabilities.
+    """
+    return (1.0 / (1.0 + np.exp(-np.asarray(log_odds, dtype=np.float32)))).astype(np.float32)
+
+
+def _inverse_affines(poses, resolutions):
+    """
+    Build per-robot affine maps from global (x, y) to local grid (col, row).
+
+    pose = (x, y, theta) is the global position of the robot grid's (0, 0) corner and
+    its rotation; local = R(-theta) @ (global - t), cell = local / resolution.
+    Returns (N, 2, 3) float64 coefficients.
+    """
+    poses = np.asarray(poses, dtype=np.float64).reshape(-1, 3)
+    res = np.asarray(resolutions, dtype=np.float64).reshape(-1)
+    tx, ty, theta = poses[:, 0], poses[:, 1], poses[:, 2]
+    cos, sin = np.cos(theta), np.sin(theta)
+    affine = np.empty((len(poses), 2, 3), dtype=np.float64)
+    affine[:, 0, 0] = cos / res
+    affine[:, 0, 1] = sin / res
+    affine[:, 0, 2] = -(cos * tx + sin * ty) / res
+    affine[:, 1, 0] = -sin / res
+    affine[:, 1, 1] = cos / res
+    affine[:, 1, 2] = (sin * tx - cos * ty) / res
+    return affine
+
+
+def global_bounds(shapes, poses, resolutions, resolution):
+    """
+    Compute the global grid (origin, shape) covering every robot map.
+
+    shapes: list of (rows, cols); poses: (N, 3); resolutions: per-robot cell size.
+    """
+    corners = []
+    for (rows, cols), pose, res in zip(shapes, np.asarray(poses, dtype=np.float64), resolutions):
+        x, y, theta = pose
+        local = np.array([[0, 0], [cols, 0], [0, rows], [cols, rows]], dtype=np.float64) * res
+        rot = np.array([[np.cos(theta), -np.sin(theta)], [np.sin(theta), np.cos(theta)]])
+        corners.append(local @ rot.T + (x, y))
+    corners = np.concatenate(corners)
+    origin = np.floor(corners.min(axis=0) / resolution) * resolution
+    extent = corners.max(axis=0) - origin
+    cells = np.ceil(extent / resolution - 1e-6).astype(int)
+    shape = (int(cells[1]), int(cells[0]))
+    return (float(origin[0]), float(origin[1])), shape
+
+
+def fuse_maps(
+    grids,
+    poses,
+    resolution,
+    resolutions=None,
+    out_shape=None,
+    out_origin=(0.0, 0.0),
+    out=None,
+    max_batch_cells=MAX_BATCH_CELLS,
+    progress=None,
+):
+    """
+    Fuse N per-robot log-odds occupancy grids into one global grid.
+
+    Every global cell center is mapped into each robot grid with its inverse rigid
+    transform (nearest-neighbour resampling) and the log-odds of all robots are summed,
+    which is the Bayesian update for independent observations. Cells outside a robot map
+    contribute 0 (unknown). All robots are resampled together in one batched gather per
+    band of output rows; the band height is chosen so that at most max_batch_cells robot
+    samples are alive at once, keeping peak memory a small multiple of the output grid.
+
+    grids: (N, rows, cols) array or list of 2D float arrays (log-odds) of any shapes.
+    poses: (N, 3) array of (x, y, theta) of each grid's origin corner in the global frame.
+    resolution: output cell size; resolutions: per-robot cell sizes (default: resolution).
+    out_shape / out_origin: output grid geometry, computed with global_bounds if omitted.
+    out: optional preallocated float32 output array.
+    progress: optional sync callback (fraction, payload).
+    Returns the fused float32 log-odds grid clamped to [LOG_ODDS_MIN, LOG_ODDS_MAX].
+    """
+    n = len(grids)
+    if n == 0:
+        raise ValueError("At least one robot map is required for fusion")
+    if resolutions is None:
+        resolutions = [resolution] * n
+    poses = np.asarray(poses, dtype=np.float64).reshape(n, 3)
+
+    # One flat buffer for all robot grids so a single gather serves the whole batch.
+    # A stacked (N, rows, cols) float32 array is used in place; lists are concatenated.
+    if isinstance(grids, np.ndarray) and grids.ndim == 3:
+        source = np.ascontiguousarray(grids, dtype=np.float32).reshape(-1)
+        shapes = [grids.shape[1:]] * n
+    else:
+        shapes = [np.shape(g) for g in grids]
+        source = np.concatenate([np.asarray(g, dtype=np.float32).ravel() for g in grids])
+    sizes = np.array([rows * cols for rows, cols in shapes], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    if out_shape is None:
+        out_origin, out_shape = global_bounds(shapes, poses, resolutions, resolution)
+    height, width = out_shape
+    index_dtype = np.int32 if source.size < np.iinfo(np.int32).max else np.int64
+
+    affine = _inverse_affines(poses, resolutions).astype(np.float32)
+    rows_n = np.array([s[0] for s in shapes], dtype=index_dtype)[:, None, None]
+    cols_n = np.array([s[1] for s in shapes], dtype=index_dtype)[:, None, None]
+    offsets = offsets.astype(index_dtype)[:, None, None]
+    a = affine[:, :, :, None, None]
+
+    if out is None:
+        out = np.empty((height, width), dtype=np.float32)
+    xs = (out_origin[0] + (np.arange(width, dtype=np.float64) + 0.5) * resolution).astype(
+        np.float32
+    )
+    band = max(1, min(height, max_batch_cells // max(1, n * width)))
+    for start in range(0, height, band):
+        stop = min(height, start + band)
+        ys = (
+            out_origin[1] + (np.arange(start, stop, dtype=np.float64) + 0.5) * resolution
+        ).astype(np.float32)
+        gx = xs[None, None, :]
+        gy = ys[None, :, None]
+        col = np.floor(a[:, 0, 0] * gx + a[:, 0, 1] * gy + a[:, 0, 2]).astype(index_dtype)
+        row = np.floor(a[:, 1, 0] * gx + a[:, 1, 1] * gy + a[:, 1, 2]).astype(index_dtype)
+        valid = (col >= 0) & (col < cols_n) & (row >= 0) & (row < rows_n)
+        # Turn (row, col) into flat indices in place; out-of-map samples read index 0
+        # and are zeroed by the mask afterwards.
+        index = row
+        index *= cols_n
+        index += col
+        index += offsets
+        del col, row
+        np.multiply(index, valid, out=index)
+        samples = np.take(source, index)
+        del index
+        samples *= valid
+        del valid
+        np.sum(samples, axis=0, out=out[start:stop])
+        del samples
+        if progress is not None:
+            progress(stop / height, {"stage": "fusing", "rows": stop})
+    np.clip(out, LOG_ODDS_MIN, LOG_ODDS_MAX, out=out)
+    logger.debug(f"Fused {n} robot maps into {height}x{width} grid")
+    return out
+
+
+def map_summary(log_odds, occupied_threshold=0.0):
+    """
+    Small JSON-friendly summary of a fused grid.
+    """
+    known = log_odds != 0
+    return {
+        "height": int(log_odds.shape[0]),
+        "width": int(log_odds.shape[1]),
+        "known_cells": int(np.count_nonzero(known)),
+        "occupied_cells": int(np.count_nonzero(log_odds > occupied_threshold)),
+    }
@@ -0,0 +1,235 @@
+import logging
+import math
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SQRT2 = math.sqrt(2.0)
+# 8-connected moves as (d_row, d_col, step length).
+MOVES = (
+    (-1, 0, 1.0),
+    (1, 0, 1.0),
+    (0, -1, 1.0),
+    (0, 1, 1.0),
+    (-1, -1, SQRT2),
+    (-1, 1, SQRT2),
+    (1, -1, SQRT2),
+    (1, 1, SQRT2),
+)
+
+
+def distance_transform(obstacles, max_distance):
+    """
+    Euclidean distance (in cells) from every cell to the nearest obstacle cell,
+    exact up to max_distance and clamped to max_distance beyond it.
+
+    The column pass is a pair of cumulative max/min scans over obstacle row indices;
+    the row pass takes the minimum of g(col + dx)^2 + dx^2 over |dx| <= max_distance,
+    so the cost is O(max_distance * cells) with every step vectorized.
+    """
+    obstacles = np.asarray(obstacles, dtype=bool)
+    height, width = obstacles.shape
+    radius = int(math.ceil(max_distance))
+    big = height + radius + 1
+    rows = np.arange(height, dtype=np.int32)[:, None]
+
+    above = np.where(obstacles, rows, -big)
+    np.maximum.accumulate(above, axis=0, out=above)
+    below = np.where(obstacles, rows, 2 * big)
+    below = np.minimum.accumulate(below[::-1], axis=0)[::-1]
+    vertical = np.minimum(rows - above, below - rows)
+    del above, below
+    np.minimum(vertical, radius + 1, out=vertical)
+    vertical = vertical.astype(np.float32)
+    vertical *= vertical
+
+    best = vertical.copy()
+    for dx in range(1, radius + 1):
+        shift = np.float32(dx * dx)
+        np.minimum(best[:, dx:], vertical[:, :-dx] + shift, out=best[:, dx:])
+        np.minimum(best[:, :-dx], vertical[:, dx:] + shift, out=best[:, :-dx])
+    np.sqrt(best, out=best)
+    np.minimum(best, np.float32(max_distance), out=best)
+    return best
+
+
+def cost_map(
+    log_odds,
+    robot_radius,
+    safety_radius,
+    occupied_threshold=0.0,
+    safety_weight=10.0,
+    unknown_cost=None,
+):
+    """
+    Build a traversal cost map from a log-odds occupancy grid.
+
+    Cells within robot_radius (cells) of an obstacle are blocked (inf). Between
+    robot_radius and safety_radius the cost rises linearly up to 1 + safety_weight,
+    free space far from obstacles costs 1. Unknown cells (log-odds 0) cost
+    unknown_cost when given (inf blocks them), otherwise they are treated as free.
+    """
+    log_odds = np.asarray(log_odds, dtype=np.float32)
+    if safety_radius < robot_radius:
+        raise ValueError("safety_radius must be >= robot_radius")
+    distance = distance_transform(log_odds > occupied_threshold, max_distance=safety_radius)
+    span = max(safety_radius - robot_radius, 1e-6)
+    cost = np.clip((safety_radius - distance) / span, 0.0, 1.0)
+    cost *= safety_weight
+    cost += 1.0
+    cost[distance <= robot_radius] = np.inf
+    if unknown_cost is not None:
+        unknown = log_odds == 0
+        cost[unknown] = np.maximum(cost[unknown], unknown_cost)
+    return cost.astype(np.float32, copy=False)
+
+
+class SearchTree:
+    """
+    Result of a grid search: per-cell cost-to-come and parent pointers over the
+    padded grid, shared by every path extracted from it.
+    """
+
+    __slots__ = ("shape", "distance", "parent", "_width")
+
+    def __init__(self, shape, distance, parent):
+        self.shape = shape
+        self.distance = distance
+        self.parent = parent
+        self._width = shape[1] + 2
+
+    def _index(self, cell):
+        return (cell[0] + 1) * self._width + cell[1] + 1
+
+    def cost_to(self, cell):
+        return float(self.distance[self._index(cell)])
+
+    def path_to(self, cell):
+        """
+        Return the list of (row, col) cells from the search start to cell,
+        or None if cell was not reached.
+        """
+        index = self._index(cell)
+        if not np.isfinite(self.distance[index]):
+            return None
+        path = []
+        while index >= 0:
+            row, col = divmod(int(index), self._width)
+            path.append((row - 1, col - 1))
+            index = self.parent[index]
+        path.reverse()
+        return path
+
+
+def _search(cost, start, goals, heuristic):
+    """
+    Vectorized label-correcting grid search (bucketed Dijkstra / A*).
+
+    Open cells whose key (cost-to-come, plus the octile heuristic for A*) lies
+    within one bucket of the minimum are expanded together; all 8 moves of the whole
+    bucket are relaxed with array operations. The bucket width equals the cheapest
+    move, so for Dijkstra a cell is never improved after expansion; with a heuristic,
+    improved cells are simply reopened, which keeps the result exact. The search stops
+    once no open key can beat the cost of the worst requested goal.
+    """
+    cost = np.asarray(cost, dtype=np.float32)
+    height, width = cost.shape
+    padded_width = width + 2
+    padded = np.full((height + 2, padded_width), np.inf, dtype=np.float32)
+    padded[1:-1, 1:-1] = cost
+    padded = padded.ravel()
+
+    def index(cell):
+        return (cell[0] + 1) * padded_width + cell[1] + 1
+
+    start_index = index(start)
+    if not np.isfinite(padded[start_index]):
+        raise ValueError(f"Start cell {tuple(start)} is not traversable")
+    goal_indices = np.array([index(g) for g in goals], dtype=np.int64)
+    min_cost = float(cost[np.isfinite(cost)].min())
+    bucket = min_cost
+
+    distance = np.full(padded.size, np.inf, dtype=np.float64)
+    parent = np.full(padded.size, -1, dtype=np.int64)
+    is_open = np.zeros(padded.size, dtype=bool)
+    distance[start_index] = 0.0
+    is_open[start_index] = True
+    open_cells = np.array([start_index], dtype=np.int64)
+    offsets = np.array([dr * padded_width + dc for dr, dc, _ in MOVES], dtype=np.int64)
+    lengths = np.array([length for _, _, length in MOVES], dtype=np.float64)
+
+    if heuristic:
+        goal_rows, goal_cols = np.divmod(goal_indices, padded_width)
+
+        def keys(cells):
+            rows, cols = np.divmod(cells, padded_width)
+            dr = np.abs(rows - goal_rows[0])
+            dc = np.abs(cols - goal_cols[0])
+            octile = np.maximum(dr, dc) + (SQRT2 - 1.0) * np.minimum(dr, dc)
+            return distance[cells] + min_cost * octile
+    else:
+        def keys(cells):
+            return distance[cells]
+
+    expanded = 0
+    while open_cells.size:
+        open_keys = keys(open_cells)
+        lowest = open_keys.min()
+        if goal_indices.size and lowest >= distance[goal_indices].max():
+            break
+        selected = open_keys < lowest + bucket
+        frontier = open_cells[selected]
+        open_cells = open_cells[~selected]
+        is_open[frontier] = False
+        expanded += frontier.size
+
+        neighbours = (frontier[None, :] + offsets[:, None]).ravel()
+        step = (padded[frontier][None, :] + padded[neighbours].reshape(offsets.size, -1)) * (
+            0.5 * lengths[:, None]
+        )
+        candidate = (distance[frontier][None, :] + step).ravel()
+        sources = np.broadcast_to(frontier, (offsets.size, frontier.size)).ravel()
+        better = candidate < distance[neighbours]
+        if not better.any():
+            continue
+        neighbours, candidate, sources = neighbours[better], candidate[better], sources[better]
+        # Keep only the cheapest candidate per neighbour.
+        order = np.lexsort((candidate, neighbours))
+        neighbours, candidate, sources = neighbours[order], candidate[order], sources[order]
+        first = np.ones(neighbours.size, dtype=bool)
+        first[1:] = neighbours[1:] != neighbours[:-1]
+        neighbours, candidate, sources = neighbours[first], candidate[first], sources[first]
+        distance[neighbours] = candidate
+        parent[neighbours] = sources
+        reopened = neighbours[~is_open[neighbours]]
+        is_open[reopened] = True
+        open_cells = np.concatenate((open_cells, reopened))
+
+    logger.debug(f"Grid search expanded {expanded} cells")
+    return SearchTree((height, width), distance, parent)
+
+
+def dijkstra(cost, start, goals=()):
+    """
+    Dijkstra search from start; stops as soon as every goal is settled
+    (or explores the whole reachable grid when goals is empty).
+    """
+    return _search(cost, start, goals, heuristic=False)
+
+
+def astar(cost, start, goal):
+    """
+    A* search for a single goal with an admissible octile-distance heuristic.
+    Returns the path as a list of (row, col) cells or None if unreachable.
+    """
+    return _search(cost, start, [goal], heuristic=True).path_to(goal)
+
+
+def plan_routes(cost, start, goals):
+    """
+    Plan paths from a shared start to several goals with one search tree.
+    Returns a list of paths (None for unreachable goals), in goal order.
+    """
+    tree = dijkstra(cost, start, goals)
+    return [tree.path_to(goal) for goal in goals]
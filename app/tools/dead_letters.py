@@ -0,0 +1,60 @@
+"""
+Inspect and requeue dead-lettered command messages.
+
+Messages whose handler kept failing are moved from <stream> to <stream>:dead with
+the error, delivery count and original entry id attached. Once the handler is
+fixed, requeue moves them back to <stream> as new entries.
+
+Usage:
+    python -m app.tools.dead_letters list resources:commands
+    python -m app.tools.dead_letters requeue resources:commands
+    python -m app.tools.dead_letters requeue resources:commands --ids 1718000000000-0
+"""
+
+import argparse
+import asyncio
+
+from app.redis_utils.dead_letters import list_dead_letters, requeue_dead_letters
+
+
+def format_dead_letter(dead_id, fields):
+    return (
+        f"{dead_id}  {fields.get('dead_id')}  group={fields.get('dead_group')}  "
+        f"deliveries={fields.get('dead_deliveries')}  event_type={fields.get('event_type')}  "
+        f"saga_id={fields.get('saga_id')}\n    error: {fields.get('dead_error')}"
+    )
+
+
+async def run(args):
+    if args.command == "list":
+        entries = await list_dead_letters(args.stream, count=args.count)
+        for dead_id, fields in entries:
+            print(format_dead_letter(dead_id, fields))
+        print(f"{len(entries)} dead-lettered messages shown for {args.stream}")
+        return
+    requeued = await requeue_dead_letters(
+        args.stream, ids=args.ids, count=args.count, keep_deadline=args.keep_deadline
+    )
+    print(f"requeued {len(requeued)} messages to {args.stream}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_parser = commands.add_parser("list", help="show dead-lettered messages")
+    list_parser.add_argument("stream")
+    list_parser.add_argument("--count", type=int, default=100)
+    requeue_parser = commands.add_parser("requeue", help="move dead-lettered messages back")
+    requeue_parser.add_argument("stream")
+    requeue_parser.add_argument("--ids", nargs="+", help="dead-letter entry ids (default: all)")
+    requeue_parser.add_argument("--count", type=int, help="requeue only the oldest count")
+    requeue_parser.add_argument(
+        "--keep-deadline", action="store_true", help="keep the original command deadline"
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Register, remove and inspect the robots of the fleet registry.
+
+Allocations fail while no robot is registered. The command listener registers the
+robots of FLEET_ROBOTS at startup; this tool manages the fleet by hand.
+
+Usage:
+    python -m app.tools.fleet list
+    python -m app.tools.fleet seed 50
+    python -m app.tools.fleet seed "r1:90:lidar+camera,r2:75"
+    python -m app.tools.fleet register r3 --battery 80 --capabilities lidar camera
+    python -m app.tools.fleet unregister r3
+"""
+
+import argparse
+import asyncio
+
+from app.fleet.registry import list_robots, register_robot, seed_fleet, unregister_robot
+
+
+def format_robot(robot_id, fields):
+    return (
+        f"{robot_id}  status={fields.get('status')}  battery={fields.get('battery')}  "
+        f"capabilities={fields.get('capabilities') or '-'}  saga_id={fields.get('saga_id') or '-'}"
+    )
+
+
+async def run(args):
+    if args.command == "list":
+        robots = await list_robots()
+        for robot_id, fields in robots.items():
+            print(format_robot(robot_id, fields))
+        print(f"{len(robots)} robots registered")
+    elif args.command == "seed":
+        robots = await seed_fleet(args.spec)
+        print(f"registered {len(robots)} robots")
+    elif args.command == "register":
+        await register_robot(args.robot_id, args.battery, args.capabilities)
+        print(f"registered {args.robot_id}")
+    else:
+        await unregister_robot(args.robot_id)
+        print(f"unregistered {args.robot_id}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="show registered robots")
+    seed_parser = commands.add_parser("seed", help="register the robots of a FLEET_ROBOTS spec")
+    seed_parser.add_argument("spec", help='robot count or "id:battery[:cap+cap],..."')
+    register_parser = commands.add_parser("register", help="add or update one robot")
+    register_parser.add_argument("robot_id")
+    register_parser.add_argument("--battery", type=float, default=100.0)
+    register_parser.add_argument("--capabilities", nargs="*", default=())
+    unregister_parser = commands.add_parser("unregister", help="remove one robot")
+    unregister_parser.add_argument("robot_id")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
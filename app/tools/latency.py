@@ -0,0 +1,246 @@
+"""
+Per-step latency breakdown and critical path of sagas.
+
+Every saga step is split into:
+    queue wait    command emitted -> handler 'start' reply
+    execution     'start' reply -> terminal reply ('completed', 'failed', ...)
+    pickup delay  terminal reply -> requester read it
+from the command and reply timestamps and the pickup time recorded by stream_replies.
+The critical path walks back from the step that finished last through, each time, the
+step that finished last before it was emitted; the gaps between them are time spent
+in the orchestrator.
+
+Usage:
+    python -m app.tools.latency --saga 1a2b3c4d
+    python -m app.tools.latency --since 300
+    python -m app.tools.latency --since 3600 --until 1800 --streams resources:commands
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.redis_utils.client import get_redis_client
+from app.redis_utils.replies import TERMINAL_STATUSES
+from app.redis_utils.timings import entry_time, parse_timestamp, pickup_key
+from app.tools.top import COMMAND_STREAMS
+
+PHASES = ("queue_wait", "execution", "pickup_delay")
+# Entries scanned per command stream; streams are trimmed, so this bounds old history.
+SCAN_LIMIT = 100000
+
+
+def _span(start, end):
+    return None if start is None or end is None else end - start
+
+
+async def fetch_steps(redis_client, streams=COMMAND_STREAMS, saga_id=None, since=None, until=None):
+    """
+    Steps (one dict per command) of saga_id, or of all sagas, emitted between the
+    epoch seconds since and until. Command streams are scanned in one pipelined
+    round trip and the reply streams with their pickup keys in another.
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    for stream in streams:
+        pipe.xrange(
+            stream,
+            min="-" if since is None else str(int(since * 1000)),
+            max="+" if until is None else str(int(until * 1000)),
+            count=SCAN_LIMIT,
+        )
+    results = await pipe.execute(raise_on_error=False)
+
+    commands = []
+    for stream, entries in zip(streams, results):
+        if isinstance(entries, Exception):
+            continue
+        for entry_id, fields in entries:
+            if saga_id is not None and fields.get("saga_id") != saga_id:
+                continue
+            commands.append((stream, entry_id, fields))
+
+    with_replies = [command for command in commands if command[2].get("reply_stream")]
+    pipe = redis_client.pipeline(transaction=False)
+    for _, _, fields in with_replies:
+        pipe.xrange(fields["reply_stream"])
+        pipe.get(pickup_key(fields["reply_stream"]))
+    results = await pipe.execute(raise_on_error=False) if with_replies else []
+    replies = {}
+    for n, (stream, entry_id, _) in enumerate(with_replies):
+        entries, picked_up = results[2 * n], results[2 * n + 1]
+        replies[stream, entry_id] = (
+            [] if isinstance(entries, Exception) else [fields for _, fields in entries],
+            None if isinstance(picked_up, Exception) else parse_timestamp(picked_up),
+        )
+
+    steps = []
+    for stream, entry_id, fields in commands:
+        reply_fields, picked_up = replies.get((stream, entry_id), ([], None))
+        steps.append(build_step(stream, entry_id, fields, reply_fields, picked_up))
+    return steps
+
+
+def build_step(stream, entry_id, fields, reply_fields, picked_up=None):
+    """
+    Step timings from a command, its replies (in stream order) and its pickup time.
+    """
+    emitted = parse_timestamp(fields.get("timestamp"))
+    if emitted is None:
+        emitted = entry_time(entry_id)
+    started = finished = None
+    status = None
+    for reply in reply_fields:
+        at = parse_timestamp(reply.get("timestamp"))
+        if reply.get("status") == "start" and started is None:
+            started = at
+        elif reply.get("status") in TERMINAL_STATUSES:
+            finished, status = at, reply["status"]
+            break
+    return {
+        "saga_id": fields.get("saga_id"),
+        "stream": stream,
+        "event_type": fields.get("event_type"),
+        "request_id": fields.get("request_id"),
+        "status": status,
+        "emitted": emitted,
+        "started": started,
+        "finished": finished,
+        "picked_up": picked_up,
+        "queue_wait": _span(emitted, started),
+        "execution": _span(started, finished),
+        "pickup_delay": _span(finished, picked_up),
+    }
+
+
+def step_end(step):
+    return step["picked_up"] or step["finished"]
+
+
+def critical_path(steps):
+    """
+    Chain of steps that bounded the saga duration, in execution order, each with the
+    orchestrator gap before it (None for the first).
+    """
+    done = sorted((step for step in steps if step_end(step) is not None), key=step_end)
+    if not done:
+        return []
+    path = [(done[-1], None)]
+    while True:
+        step = path[-1][0]
+        before = [other for other in done if other is not step and step_end(other) <= step["emitted"]]
+        if not before:
+            break
+        previous = before[-1]
+        path[-1] = (step, step["emitted"] - step_end(previous))
+        path.append((previous, None))
+    path.reverse()
+    return path
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def phase_summary(steps):
+    """
+    {event_type: {"count", phase: {"mean", "p50", "p95", "max"}}} over steps.
+    """
+    summary = {}
+    for step in steps:
+        summary.setdefault(step["event_type"], []).append(step)
+    result = {}
+    for event_type, group in summary.items():
+        result[event_type] = {"count": len(group)}
+        for phase in PHASES:
+            values = [step[phase] for step in group if step[phase] is not None]
+            result[event_type][phase] = {
+                "mean": sum(values) / len(values) if values else None,
+                "p50": percentile(values, 0.5),
+                "p95": percentile(values, 0.95),
+                "max": max(values) if values else None,
+            }
+    return result
+
+
+def _ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.1f}"
+
+
+def format_saga(saga_id, steps):
+    steps = sorted(steps, key=lambda step: step["emitted"])
+    lines = [f"saga {saga_id}: {len(steps)} steps"]
+    lines.append(f"  {'EVENT TYPE':<26}{'STATUS':<11}{'QUEUE ms':>10}{'EXEC ms':>10}{'PICKUP ms':>11}")
+    for step in steps:
+        lines.append(
+            f"  {step['event_type'] or '-':<26}{step['status'] or '-':<11}{_ms(step['queue_wait']):>10}"
+            f"{_ms(step['execution']):>10}{_ms(step['pickup_delay']):>11}"
+        )
+    path = critical_path(steps)
+    if path:
+        total = step_end(path[-1][0]) - path[0][0]["emitted"]
+        gaps = sum(gap for _, gap in path if gap is not None)
+        lines.append(f"  critical path ({total * 1000:.1f} ms, orchestrator gaps {gaps * 1000:.1f} ms):")
+        for step, gap in path:
+            gap_note = "" if gap is None else f" after {gap * 1000:.1f} ms"
+            lines.append(f"    {step['event_type']}{gap_note}")
+    return "\n".join(lines)
+
+
+def format_summary(summary):
+    lines = [f"{'EVENT TYPE':<26}{'N':>6}  {'PHASE':<14}{'MEAN ms':>10}{'P50 ms':>10}{'P95 ms':>10}{'MAX ms':>10}"]
+    for event_type, stats in sorted(summary.items(), key=lambda item: str(item[0])):
+        for n, phase in enumerate(PHASES):
+            head = f"{event_type or '-':<26}{stats['count']:>6}  " if n == 0 else " " * 34
+            values = stats[phase]
+            lines.append(
+                f"{head}{phase:<14}{_ms(values['mean']):>10}{_ms(values['p50']):>10}"
+                f"{_ms(values['p95']):>10}{_ms(values['max']):>10}"
+            )
+    return "\n".join(lines)
+
+
+async def run(args):
+    r = get_redis_client()
+    now = time.time()
+    since = None if args.since is None else now - args.since
+    until = None if args.until is None else now - args.until
+    steps = await fetch_steps(r, args.streams, saga_id=args.saga, since=since, until=until)
+    if not steps:
+        print("no matching commands")
+        return
+    if args.saga:
+        print(format_saga(args.saga, steps))
+        return
+    print(format_summary(phase_summary(steps)))
+    sagas = {}
+    for step in steps:
+        if step["saga_id"]:
+            sagas.setdefault(step["saga_id"], []).append(step)
+    slowest = sorted(
+        sagas.items(),
+        key=lambda item: max(step_end(step) or step["emitted"] for step in item[1])
+        - min(step["emitted"] for step in item[1]),
+        reverse=True,
+    )
+    for saga_id, saga_steps in slowest[: args.slowest]:
+        print()
+        print(format_saga(saga_id, saga_steps))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--saga", help="report a single saga")
+    parser.add_argument("--since", type=float, help="only commands emitted in the last N seconds")
+    parser.add_argument("--until", type=float, help="only commands emitted more than N seconds ago")
+    parser.add_argument("--streams", nargs="+", default=list(COMMAND_STREAMS))
+    parser.add_argument("--slowest", type=int, default=3, help="sagas to break down in window mode")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
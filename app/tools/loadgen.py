@@ -0,0 +1,306 @@
+"""
+Open-loop load generator for mission:start commands.
+
+Commands are sent on a precomputed schedule (constant, ramp or burst) regardless of
+how fast replies come back, and latency is measured from the scheduled send time, so
+a slow system shows up as latency instead of silently lowering the offered load.
+Every correlation_id is tracked on its reply stream until a terminal reply arrives.
+mission:start replies once the saga has finished on every backend (async, celery and
+events), so latencies measure whole sagas, comparable across backends.
+
+Usage:
+    python -m app.tools.loadgen --profile constant --rate 20 --duration 60 --backend async
+    python -m app.tools.loadgen --profile ramp --rate 5 --end-rate 50 --duration 120
+    python -m app.tools.loadgen --profile burst --rate 5 --burst-size 50 --burst-every 10
+    python -m app.tools.loadgen --profile constant --rate 50 --duration 60 --backend events
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+import numpy as np
+
+from app.redis_utils.client import get_redis_client
+from app.redis_utils.timings import timestamp
+
+logger = logging.getLogger(__name__)
+
+MISSION_STREAM = "mission:commands"
+MISSION_EVENT_TYPE = "mission:start"
+REPLY_STREAM_PREFIX = "mission:replies:"
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+# All pending reply streams are polled together in one XREAD per round; the block
+# time bounds how late a reply can be noticed, i.e. the latency resolution.
+TRACK_BLOCK_MS = 10
+
+
+def constant_schedule(rate, duration):
+    """
+    Send offsets (seconds from start) for a constant rate.
+    """
+    return np.arange(int(rate * duration)) / rate
+
+
+def ramp_schedule(start_rate, end_rate, duration):
+    """
+    Send offsets for a rate changing linearly from start_rate to end_rate.
+
+    The n-th send happens when the cumulative count
+    start_rate * t + (end_rate - start_rate) * t^2 / (2 * duration) reaches n.
+    """
+    slope = (end_rate - start_rate) / duration
+    total = int(start_rate * duration + slope * duration * duration / 2)
+    n = np.arange(total, dtype=np.float64)
+    if abs(slope) < 1e-12:
+        return n / start_rate
+    return (-start_rate + np.sqrt(start_rate * start_rate + 2 * slope * n)) / slope
+
+
+def burst_schedule(rate, duration, burst_size, burst_every):
+    """
+    Send offsets for a constant base rate plus burst_size simultaneous sends
+    every burst_every seconds.
+    """
+    bursts = np.repeat(np.arange(0, duration, burst_every), burst_size)
+    return np.sort(np.concatenate((constant_schedule(rate, duration), bursts)), kind="stable")
+
+
+def summarize(latencies, statuses, elapsed, sent):
+    """
+    Summarize a run: counts per outcome, achieved throughput and latency percentiles (s)
+    of completed requests. statuses: final status per request ('timeout' if no terminal
+    reply arrived in time, 'sent' for commands without a reply stream).
+    """
+    latencies = np.asarray(latencies, dtype=np.float64)
+    counts = {}
+    for status in statuses:
+        counts[status] = counts.get(status, 0) + 1
+    report = {
+        "sent": sent,
+        "completed": counts.get("completed", 0),
+        "errors": sum(n for s, n in counts.items() if s not in ("completed", "timeout", "sent")),
+        "timeouts": counts.get("timeout", 0),
+        "statuses": counts,
+        "elapsed": elapsed,
+        "throughput": counts.get("completed", 0) / elapsed if elapsed > 0 else 0.0,
+    }
+    if latencies.size:
+        p50, p90, p99 = np.percentile(latencies, (50, 90, 99))
+        report["latency"] = {
+            "mean": float(latencies.mean()),
+            "p50": float(p50),
+            "p90": float(p90),
+            "p99": float(p99),
+            "max": float(latencies.max()),
+        }
+    return report
+
+
+def format_report(report):
+    lines = [
+        f"sent: {report['sent']}, completed: {report['completed']}, "
+        f"errors: {report['errors']}, timeouts: {report['timeouts']}",
+        f"elapsed: {report['elapsed']:.2f}s, throughput: {report['throughput']:.2f} completed/s",
+    ]
+    if "latency" in report:
+        latency = report["latency"]
+        lines.append(
+            "latency: "
+            + ", ".join(f"{name} {latency[name] * 1000:.1f}ms" for name in ("mean", "p50", "p90", "p99", "max"))
+        )
+    return "\n".join(lines)
+
+
+class ReplyTracker:
+    """
+    Follows many reply streams with one XREAD per round and resolves a future per
+    stream on its first terminal reply; reply streams are deleted once resolved.
+    """
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+        self._pending = {}
+        self._abandoned = []
+        self._wakeup = asyncio.Event()
+
+    def track(self, reply_stream):
+        future = asyncio.get_running_loop().create_future()
+        self._pending[reply_stream] = ["0", future]
+        self._wakeup.set()
+        return future
+
+    def forget(self, reply_stream):
+        if self._pending.pop(reply_stream, None) is not None:
+            self._abandoned.append(reply_stream)
+
+    async def run(self, stop_event):
+        while not stop_event.is_set() or self._pending:
+            if not self._pending:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), TRACK_BLOCK_MS / 1000)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            streams = {stream: state[0] for stream, state in self._pending.items()}
+            entries = await self.redis.xread(streams, block=TRACK_BLOCK_MS)
+            done = []
+            for stream, messages in entries or []:
+                state = self._pending.get(stream)
+                if state is None:
+                    continue
+                for entry_id, fields in messages:
+                    state[0] = entry_id
+                    if fields.get("status") in TERMINAL_STATUSES:
+                        if not state[1].done():
+                            state[1].set_result((time.monotonic(), fields))
+                        done.append(stream)
+                        break
+            for stream in done:
+                self._pending.pop(stream, None)
+            done.extend(self._abandoned)
+            self._abandoned.clear()
+            if done:
+                await self.redis.delete(*done)
+
+
+async def send_and_wait(redis_client, tracker, stream, fields, timeout, planned):
+    """
+    Append one command and, if it names a reply_stream, wait for its terminal reply.
+    Returns (latency from the planned send time or None, final status).
+    """
+    reply_stream = fields.get("reply_stream")
+    future = tracker.track(reply_stream) if reply_stream else None
+    await redis_client.xadd(stream, fields)
+    if future is None:
+        return None, "sent"
+    try:
+        finished, reply = await asyncio.wait_for(future, planned + timeout - time.monotonic())
+    except asyncio.TimeoutError:
+        tracker.forget(reply_stream)
+        return None, "timeout"
+    status = reply.get("status")
+    return (finished - planned if status == "completed" else None), status
+
+
+async def run_schedule(offsets, make_command, timeout=60.0, redis_client=None):
+    """
+    Open-loop driver: at each offset (seconds from start) send make_command(index) ->
+    (stream, fields) without waiting for earlier commands, then collect the run report.
+    """
+    r = redis_client or get_redis_client()
+    tracker = ReplyTracker(r)
+    stop_event = asyncio.Event()
+    tracking = asyncio.create_task(tracker.run(stop_event))
+    start = time.monotonic()
+    requests = []
+    max_lag = 0.0
+    for index, offset in enumerate(offsets):
+        planned = start + float(offset)
+        delay = planned - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            max_lag = max(max_lag, -delay)
+        stream, fields = make_command(index)
+        requests.append(
+            asyncio.create_task(send_and_wait(r, tracker, stream, fields, timeout, planned))
+        )
+    outcomes = await asyncio.gather(*requests, return_exceptions=True)
+    elapsed = time.monotonic() - start
+    stop_event.set()
+    await tracking
+
+    latencies, statuses = [], []
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            logger.error("Load request failed", exc_info=outcome)
+            statuses.append("send_error")
+            continue
+        latency, status = outcome
+        statuses.append(status)
+        if latency is not None:
+            latencies.append(latency)
+    report = summarize(latencies, statuses, elapsed, len(offsets))
+    report["max_send_lag"] = max_lag
+    return report
+
+
+def mission_command(backend, robot_count, area):
+    correlation_id = str(uuid.uuid4())
+    return MISSION_STREAM, {
+        "correlation_id": correlation_id,
+        "event_type": MISSION_EVENT_TYPE,
+        "reply_stream": f"{REPLY_STREAM_PREFIX}{correlation_id}",
+        "robot_count": robot_count,
+        "area": area,
+        "backend": backend,
+        "timestamp": timestamp(),
+    }
+
+
+async def run_load(
+    offsets,
+    backend="async",
+    robot_count=2,
+    area="ZoneA",
+    timeout=60.0,
+    redis_client=None,
+):
+    """
+    Send one mission per schedule offset (open loop) and collect the run report.
+    """
+    return await run_schedule(
+        offsets,
+        lambda index: mission_command(backend, robot_count, area),
+        timeout=timeout,
+        redis_client=redis_client,
+    )
+
+
+def build_schedule(args):
+    if args.profile == "constant":
+        return constant_schedule(args.rate, args.duration)
+    if args.profile == "ramp":
+        return ramp_schedule(args.rate, args.end_rate, args.duration)
+    return burst_schedule(args.rate, args.duration, args.burst_size, args.burst_every)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--profile", choices=("constant", "ramp", "burst"), default="constant")
+    parser.add_argument("--rate", type=float, default=10.0, help="missions/s (start rate for ramp)")
+    parser.add_argument("--end-rate", type=float, default=50.0, help="final rate for ramp")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    parser.add_argument("--burst-size", type=int, default=20)
+    parser.add_argument("--burst-every", type=float, default=10.0)
+    parser.add_argument("--backend", choices=("async", "celery", "events"), default="async")
+    parser.add_argument("--robot-count", type=int, default=2)
+    parser.add_argument("--area", default="ZoneA")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-mission reply timeout")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    offsets = build_schedule(args)
+    if len(offsets) == 0:
+        parser.error("schedule is empty")
+    report = asyncio.run(
+        run_load(
+            offsets,
+            backend=args.backend,
+            robot_count=args.robot_count,
+            area=args.area,
+            timeout=args.timeout,
+        )
+    )
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
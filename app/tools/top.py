@@ -0,0 +1,198 @@
+"""
+Live top-style console for command streams and their consumer groups.
+
+Every refresh shows, per command stream, its length and entries added per second,
+and per consumer group the lag (entries not yet delivered), pending count, age of
+the oldest pending entry and each consumer's pending count and idle time. Stream
+and group info is fetched with two pipelined round trips per refresh; active sagas
+and reply streams are counted with SCAN every --scan-every refreshes.
+
+Usage:
+    python -m app.tools.top
+    python -m app.tools.top --streams mission:commands resources:commands --interval 2
+    python -m app.tools.top --once
+"""
+
+import argparse
+import asyncio
+import time
+
+from redis.exceptions import ResponseError
+
+from app.fleet.registry import FLEET_PREFIX
+from app.redis_utils.client import get_redis_client
+from app.tools.traffic import RECORD_STREAMS
+
+COMMAND_STREAMS = RECORD_STREAMS
+ALLOCATION_PATTERN = f"{FLEET_PREFIX}:allocation:*"
+SAGA_STATUS_PATTERN = "saga:status:*"
+REPLY_STREAM_PATTERN = "*:replies:*"
+SCAN_COUNT = 1000
+CLEAR_SCREEN = "\x1b[H\x1b[2J"
+
+
+def _entry_ms(entry_id):
+    return int(str(entry_id).partition("-")[0])
+
+
+async def _count_keys(redis_client, pattern):
+    count = 0
+    async for _ in redis_client.scan_iter(match=pattern, count=SCAN_COUNT):
+        count += 1
+    return count
+
+
+async def collect(redis_client, streams):
+    """
+    Snapshot of streams: {stream: {"length", "added", "groups": [...]}} with, per group,
+    name, lag, pending, oldest_pending_age (seconds) and consumers [(name, pending,
+    idle seconds)]. Missing streams are reported as None.
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    for stream in streams:
+        pipe.xinfo_stream(stream)
+        pipe.xinfo_groups(stream)
+    results = await pipe.execute(raise_on_error=False)
+
+    snapshot = {}
+    groups = []
+    for n, stream in enumerate(streams):
+        info, stream_groups = results[2 * n], results[2 * n + 1]
+        if isinstance(info, ResponseError):
+            snapshot[stream] = None
+            continue
+        snapshot[stream] = {
+            "length": info["length"],
+            "added": info.get("entries-added"),
+            "groups": [],
+        }
+        for group in stream_groups if isinstance(stream_groups, list) else []:
+            groups.append((stream, group))
+
+    pipe = redis_client.pipeline(transaction=False)
+    for stream, group in groups:
+        pipe.xinfo_consumers(stream, group["name"])
+        pipe.xpending(stream, group["name"])
+    results = await pipe.execute(raise_on_error=False)
+
+    now_ms = time.time() * 1000
+    for n, (stream, group) in enumerate(groups):
+        consumers, pending = results[2 * n], results[2 * n + 1]
+        if isinstance(consumers, ResponseError):
+            consumers = []
+        if isinstance(pending, ResponseError) or not pending.get("pending"):
+            oldest = None
+        else:
+            oldest = max(now_ms - _entry_ms(pending["min"]), 0) / 1000
+        snapshot[stream]["groups"].append(
+            {
+                "name": group["name"],
+                "lag": group.get("lag"),
+                "pending": group["pending"],
+                "oldest_pending_age": oldest,
+                "consumers": [
+                    (consumer["name"], consumer["pending"], consumer["idle"] / 1000)
+                    for consumer in consumers
+                ],
+            }
+        )
+    return snapshot
+
+
+async def count_sagas(redis_client):
+    """
+    SCAN counts of sagas holding fleet robots, saga status hashes and reply streams.
+    """
+    return {
+        "allocations": await _count_keys(redis_client, ALLOCATION_PATTERN),
+        "statuses": await _count_keys(redis_client, SAGA_STATUS_PATTERN),
+        "reply_streams": await _count_keys(redis_client, REPLY_STREAM_PATTERN),
+    }
+
+
+def rates(previous, current, elapsed):
+    """
+    Entries added per second per stream between two snapshots (None until known).
+    """
+    result = {}
+    for stream, info in current.items():
+        before = (previous or {}).get(stream)
+        if info is None or before is None or info["added"] is None or before["added"] is None or elapsed <= 0:
+            result[stream] = None
+        else:
+            result[stream] = (info["added"] - before["added"]) / elapsed
+    return result
+
+
+def _fmt(value, spec=""):
+    return "-" if value is None else format(value, spec)
+
+
+def render(snapshot, stream_rates, sagas=None):
+    """
+    Text table of a snapshot.
+    """
+    lines = [time.strftime("%H:%M:%S")]
+    if sagas is not None:
+        lines.append(
+            f"sagas holding robots: {sagas['allocations']}  saga statuses: {sagas['statuses']}  "
+            f"reply streams: {sagas['reply_streams']}"
+        )
+    lines.append("")
+    lines.append(f"{'STREAM':<24}{'LEN':>8}{'IN/s':>9}  {'GROUP':<22}{'LAG':>7}{'PEND':>7}{'OLDEST':>9}")
+    for stream, info in snapshot.items():
+        if info is None:
+            lines.append(f"{stream:<24}{'(missing)':>8}")
+            continue
+        head = f"{stream:<24}{info['length']:>8}{_fmt(stream_rates.get(stream), '.1f'):>9}  "
+        if not info["groups"]:
+            lines.append(head + "(no groups)")
+        for n, group in enumerate(info["groups"]):
+            prefix = head if n == 0 else " " * len(head)
+            lines.append(
+                f"{prefix}{group['name']:<22}{_fmt(group['lag']):>7}{group['pending']:>7}"
+                f"{_fmt(group['oldest_pending_age'], '.1f'):>8}s"
+            )
+            for consumer, pending, idle in group["consumers"]:
+                lines.append(f"{'':<{len(head) + 2}}{consumer:<20}pending={pending:<6}idle={idle:.1f}s")
+    return "\n".join(lines)
+
+
+async def run(args):
+    r = get_redis_client()
+    previous, previous_at, sagas = None, None, None
+    refresh = 0
+    while True:
+        snapshot = await collect(r, args.streams)
+        now = time.monotonic()
+        stream_rates = rates(previous, snapshot, now - previous_at if previous_at else 0)
+        if refresh % args.scan_every == 0:
+            sagas = await count_sagas(r)
+        output = render(snapshot, stream_rates, sagas)
+        if args.once:
+            print(output)
+            return
+        print(CLEAR_SCREEN + output, flush=True)
+        previous, previous_at = snapshot, now
+        refresh += 1
+        await asyncio.sleep(args.interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--streams", nargs="+", default=list(COMMAND_STREAMS))
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between refreshes")
+    parser.add_argument(
+        "--scan-every", type=int, default=5, help="refreshes between saga/reply stream SCANs"
+    )
+    parser.add_argument("--once", action="store_true", help="print one snapshot and exit")
+    try:
+        asyncio.run(run(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
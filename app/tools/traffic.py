@@ -0,0 +1,257 @@
+"""
+Record and replay stream traffic for performance regression testing.
+
+record: follows command streams (and the reply streams their commands name) and
+writes every entry with its arrival time to a gzip JSON-lines file.
+replay: re-sends the recorded commands of the entry streams with their original
+inter-arrival gaps (optionally accelerated), tracks their replies like the load
+generator does and compares latency and throughput with the recording itself or
+with a previous replay report.
+
+Usage:
+    python -m app.tools.traffic record traffic.jsonl.gz --duration 300
+    python -m app.tools.traffic replay traffic.jsonl.gz --speed 4 --report run.json
+    python -m app.tools.traffic replay traffic.jsonl.gz --baseline run.json
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import time
+import uuid
+
+from app.redis_utils.client import get_redis_client
+from app.redis_utils.timings import timestamp
+from app.tools.loadgen import TERMINAL_STATUSES, format_report, run_schedule, summarize
+
+logger = logging.getLogger(__name__)
+
+RECORDING_VERSION = 1
+RECORD_STREAMS = (
+    "mission:commands",
+    "resources:commands",
+    "routing:commands",
+    "exploration:commands",
+    "map:commands",
+)
+# Only entry-point commands are replayed; downstream commands are re-created by the
+# orchestrator under test.
+REPLAY_STREAMS = ("mission:commands",)
+RECORD_BLOCK_MS = 200
+# Fields holding ids that must be fresh on every replay.
+ID_FIELDS = ("correlation_id", "saga_id", "request_id")
+COMPARED_METRICS = ("throughput", "p50", "p90", "p99", "errors", "timeouts")
+
+
+def entry_time_ms(entry_id):
+    return int(entry_id.split("-", 1)[0])
+
+
+async def _last_entry_id(r, stream):
+    last = await r.xrevrange(stream, count=1)
+    return last[0][0] if last else "0-0"
+
+
+async def record(path, streams=RECORD_STREAMS, duration=60.0, follow_replies=True, redis_client=None):
+    """
+    Record new entries of streams for duration seconds to path.
+
+    Each line after the header is [offset_ms, stream, fields], offset_ms being the
+    entry's Redis arrival time relative to the start of the recording. Reply streams
+    named by recorded commands are followed until their terminal reply.
+    Returns the number of recorded entries.
+    """
+    r = redis_client or get_redis_client()
+    positions = {stream: await _last_entry_id(r, stream) for stream in streams}
+    started_ms = int(time.time() * 1000)
+    deadline = time.monotonic() + duration
+    count = 0
+    with gzip.open(path, "wt", encoding="utf-8") as out:
+        header = {"version": RECORDING_VERSION, "started_ms": started_ms, "streams": list(streams)}
+        out.write(json.dumps(header) + "\n")
+        while time.monotonic() < deadline:
+            block = int(min(RECORD_BLOCK_MS, max(1, (deadline - time.monotonic()) * 1000)))
+            entries = await r.xread(positions, block=block)
+            for stream, messages in entries or []:
+                for entry_id, fields in messages:
+                    positions[stream] = entry_id
+                    record_line = [entry_time_ms(entry_id) - started_ms, stream, fields]
+                    out.write(json.dumps(record_line, separators=(",", ":")) + "\n")
+                    count += 1
+                    reply_stream = fields.get("reply_stream")
+                    if follow_replies and reply_stream and reply_stream not in positions:
+                        positions[reply_stream] = "0-0"
+                    if stream not in streams and fields.get("status") in TERMINAL_STATUSES:
+                        del positions[stream]
+                        break
+    logger.info(f"Recorded {count} entries from {len(streams)} streams to {path}")
+    return count
+
+
+def load_recording(path):
+    """
+    Return (header, records) of a recording; records are (offset_ms, stream, fields).
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as source:
+        header = json.loads(source.readline())
+        if header.get("version") != RECORDING_VERSION:
+            raise ValueError(f"Unsupported recording version {header.get('version')}")
+        records = [tuple(json.loads(line)) for line in source if line.strip()]
+    return header, records
+
+
+def recorded_report(records, streams=REPLAY_STREAMS):
+    """
+    Run report of the recorded traffic itself: latency from each command on streams
+    to the first terminal reply on its reply stream.
+    """
+    replies = {}
+    for offset, stream, fields in records:
+        if fields.get("status") in TERMINAL_STATUSES and stream not in replies:
+            replies[stream] = (offset, fields["status"])
+    commands = [(offset, fields) for offset, stream, fields in records if stream in streams]
+    latencies, statuses = [], []
+    for offset, fields in commands:
+        reply_stream = fields.get("reply_stream")
+        if not reply_stream:
+            statuses.append("sent")
+            continue
+        finished, status = replies.get(reply_stream, (None, "timeout"))
+        statuses.append(status)
+        if status == "completed":
+            latencies.append((finished - offset) / 1000)
+    elapsed = (records[-1][0] - commands[0][0]) / 1000 if commands else 0.0
+    return summarize(latencies, statuses, elapsed, len(commands))
+
+
+def rewrite_fields(fields, ids, recorded_epoch):
+    """
+    Copy recorded command fields with fresh ids (consistently mapped through ids),
+    a reply_stream renamed accordingly, and deadline/timestamp shifted to now.
+    """
+    fields = dict(fields)
+    reply_stream = fields.get("reply_stream")
+    for name in ID_FIELDS:
+        old = fields.get(name)
+        if not old:
+            continue
+        new = ids.setdefault(old, str(uuid.uuid4()))
+        fields[name] = new
+        if reply_stream:
+            reply_stream = reply_stream.replace(old, new)
+    if reply_stream:
+        if reply_stream == fields["reply_stream"]:
+            reply_stream = f"{reply_stream}:replay-{uuid.uuid4().hex[:8]}"
+        fields["reply_stream"] = reply_stream
+    now = time.time()
+    if fields.get("deadline"):
+        fields["deadline"] = f"{float(fields['deadline']) + now - recorded_epoch:.3f}"
+    if "timestamp" in fields:
+        fields["timestamp"] = timestamp(now)
+    return fields
+
+
+async def replay(records, header, streams=REPLAY_STREAMS, speed=1.0, timeout=60.0, redis_client=None):
+    """
+    Re-send the recorded commands of streams open-loop with their recorded gaps
+    divided by speed, and return the run report.
+    """
+    commands = [(offset, stream, fields) for offset, stream, fields in records if stream in streams]
+    if not commands:
+        raise ValueError(f"Recording has no entries on {list(streams)}")
+    first = commands[0][0]
+    offsets = [(offset - first) / 1000 / speed for offset, _, _ in commands]
+    ids = {}
+
+    def make_command(index):
+        offset, stream, fields = commands[index]
+        recorded_epoch = (header["started_ms"] + offset) / 1000
+        return stream, rewrite_fields(fields, ids, recorded_epoch)
+
+    report = await run_schedule(offsets, make_command, timeout=timeout, redis_client=redis_client)
+    report["speed"] = speed
+    return report
+
+
+def _metric(report, name):
+    if name in ("p50", "p90", "p99"):
+        return report.get("latency", {}).get(name)
+    return report.get(name)
+
+
+def compare_reports(baseline, current):
+    """
+    Return {metric: (baseline, current, relative change or None)} for the
+    throughput, latency percentile and error metrics of two run reports.
+    """
+    comparison = {}
+    for name in COMPARED_METRICS:
+        before, after = _metric(baseline, name), _metric(current, name)
+        change = None
+        if before and after is not None:
+            change = (after - before) / before
+        comparison[name] = (before, after, change)
+    return comparison
+
+
+def format_comparison(comparison):
+    def value(v):
+        return "-" if v is None else f"{v:.4g}"
+
+    lines = []
+    for name, (before, after, change) in comparison.items():
+        delta = f"{change:+.1%}" if change is not None else "n/a"
+        lines.append(f"{name:>10}: {value(before)} -> {value(after)} ({delta})")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="record stream traffic")
+    record_parser.add_argument("path")
+    record_parser.add_argument("--duration", type=float, default=60.0)
+    record_parser.add_argument("--streams", nargs="+", default=list(RECORD_STREAMS))
+    record_parser.add_argument("--no-replies", action="store_true", help="do not follow reply streams")
+
+    replay_parser = commands.add_parser("replay", help="replay a recording")
+    replay_parser.add_argument("path")
+    replay_parser.add_argument("--speed", type=float, default=1.0, help="time acceleration factor")
+    replay_parser.add_argument("--streams", nargs="+", default=list(REPLAY_STREAMS))
+    replay_parser.add_argument("--timeout", type=float, default=60.0)
+    replay_parser.add_argument("--report", help="write the replay report as JSON")
+    replay_parser.add_argument("--baseline", help="previous replay report to compare with")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        count = asyncio.run(
+            record(args.path, streams=args.streams, duration=args.duration, follow_replies=not args.no_replies)
+        )
+        print(f"recorded {count} entries to {args.path}")
+        return
+
+    header, records = load_recording(args.path)
+    report = asyncio.run(
+        replay(records, header, streams=args.streams, speed=args.speed, timeout=args.timeout)
+    )
+    print(format_report(report))
+    if args.report:
+        with open(args.report, "w") as out:
+            json.dump(report, out, indent=2)
+    if args.baseline:
+        with open(args.baseline) as source:
+            baseline = json.load(source)
+        print(f"compared with {args.baseline}:")
+    else:
+        baseline = recorded_report(records, streams=args.streams)
+        print("compared with the recorded run:")
+    print(format_comparison(compare_reports(baseline, report)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Package for standalone performance benchmarks
@@ -0,0 +1,66 @@
+"""
+Benchmark for app.slam.map_fusion.fuse_maps.
+
+Usage:
+    python -m benchmarks.map_fusion --size 4096 --robots 4 --repeat 3
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from app.slam.map_fusion import fuse_maps
+
+
+def make_robot_maps(size, robots, seed=0):
+    rng = np.random.default_rng(seed)
+    grids = rng.normal(0.0, 2.0, size=(robots, size, size)).astype(np.float32)
+    # Robots observe overlapping, slightly rotated patches of the same area.
+    poses = np.column_stack(
+        [
+            rng.uniform(-0.05, 0.05, robots) * size,
+            rng.uniform(-0.05, 0.05, robots) * size,
+            rng.uniform(-0.2, 0.2, robots),
+        ]
+    )
+    return grids, poses
+
+
+def run(size, robots, repeat):
+    grids, poses = make_robot_maps(size, robots)
+    out = np.empty((size, size), dtype=np.float32)
+    out_bytes = out.nbytes
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fuse_maps(grids, poses, 1.0, out_shape=(size, size), out=out)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fuse_maps(grids, poses, 1.0, out_shape=(size, size))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(timings)
+    print(f"grid: {size}x{size}, robots: {robots}")
+    print(f"best: {best:.3f}s, mean: {sum(timings) / len(timings):.3f}s")
+    print(f"throughput: {robots * size * size / best / 1e6:.1f} Mcells/s")
+    print(
+        f"peak memory: {peak / 2**20:.1f} MiB "
+        f"({peak / out_bytes:.2f}x output, inputs excluded)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=4096)
+    parser.add_argument("--robots", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.size, args.robots, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
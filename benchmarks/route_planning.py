@@ -0,0 +1,69 @@
+"""
+Benchmark for app.slam.planning.
+
+Usage:
+    python -m benchmarks.route_planning --size 2048 --goals 8 --repeat 3
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.slam.planning import astar, cost_map, plan_routes
+
+
+def make_map(size, seed=0):
+    rng = np.random.default_rng(seed)
+    log_odds = np.full((size, size), -2.0, dtype=np.float32)
+    # Scattered rectangular obstacles with open corridors between them.
+    for _ in range(size // 8):
+        row, col = rng.integers(0, size - 32, size=2)
+        height, width = rng.integers(4, 32, size=2)
+        log_odds[row:row + height, col:col + width] = 4.0
+    return log_odds
+
+
+def free_cells(costs, count, rng):
+    rows, cols = np.nonzero(np.isfinite(costs))
+    picks = rng.choice(rows.size, size=count, replace=False)
+    return [(int(rows[i]), int(cols[i])) for i in picks]
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def run(size, goals, repeat):
+    rng = np.random.default_rng(1)
+    log_odds = make_map(size)
+    build_time, costs = timed(lambda: cost_map(log_odds, 2.0, 6.0), repeat)
+    cells = free_cells(costs, goals + 1, rng)
+    start, targets = cells[0], cells[1:]
+
+    single_time, _ = timed(lambda: [astar(costs, start, goal) for goal in targets], repeat)
+    multi_time, paths = timed(lambda: plan_routes(costs, start, targets), repeat)
+    reached = sum(path is not None for path in paths)
+
+    print(f"grid: {size}x{size}, goals: {goals} ({reached} reachable)")
+    print(f"cost map build: {build_time:.3f}s")
+    print(f"A* per goal: {single_time:.3f}s total, {goals / single_time:.1f} plans/s")
+    print(f"shared-tree multi-goal: {multi_time:.3f}s total, {goals / multi_time:.1f} plans/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=2048)
+    parser.add_argument("--goals", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.size, args.goals, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Redis memory per Celery saga under the previous and the current result policy.
+
+Replays what a worker writes to the result backend for one successful saga
+(five steps) and reports the keys and MEMORY USAGE bytes left behind per saga.
+Needs a reachable Redis (the result backend); the keys it creates are deleted.
+
+Usage:
+    python -m benchmarks.saga_results --sagas 200 --redis-url redis://redis:6379/0
+"""
+
+import argparse
+import json
+import os
+import uuid
+
+import redis
+from celery import Celery, states
+from celery.app.task import Context
+
+from app.flows.mission_start_celery.status import record_saga_step, saga_status_key
+
+STEPS = (
+    ("allocate_resources", "resources:allocate"),
+    ("plan_route", "routing:plan"),
+    ("perform_exploration", "exploration:perform"),
+    ("integrate_maps", "map:integrate"),
+    ("release_resources", None),
+)
+
+# app.celery_app settings before and after the lean result policy.
+BEFORE = {"task_track_started": True, "result_extended": True}
+AFTER = {
+    "task_track_started": False,
+    "result_extended": False,
+    "result_expires": 600,
+    "result_serializer": "json",
+}
+
+
+def make_backend(url, config):
+    app = Celery("saga_results_benchmark", broker="memory://", backend=url)
+    app.conf.update(config)
+    return app.backend
+
+
+def step_result(step, event_type, correlation_id, saga_id):
+    # Saga steps return the 'completed' reply fields of request_and_reply.
+    if event_type is None:
+        return {"released": True, "correlation_id": correlation_id}
+    return {
+        "correlation_id": correlation_id,
+        "saga_id": saga_id,
+        "event_type": event_type,
+        "status": "completed",
+        "request_id": str(uuid.uuid4()),
+        "payload": json.dumps({"step": step, "result": "ok", "robots": ["r1", "r2", "r3"]}),
+    }
+
+
+def request_for(step, task_id, args):
+    return Context(
+        id=task_id,
+        task=f"app.flows.mission_start_celery.tasks.{step}",
+        args=args,
+        kwargs={},
+        hostname="celery@worker",
+        retries=0,
+        delivery_info={"routing_key": "celery"},
+        ignore_result=False,
+    )
+
+
+def run_saga_before(backend, client):
+    correlation_id, saga_id = str(uuid.uuid4()), str(uuid.uuid4())[:8]
+    keys = []
+    for step, event_type in STEPS:
+        task_id = str(uuid.uuid4())
+        request = request_for(step, task_id, [correlation_id, saga_id])
+        backend.store_result(task_id, {"pid": 1, "hostname": "celery@worker"}, states.STARTED, request=request)
+        result = step_result(step, event_type, correlation_id, saga_id)
+        backend.store_result(task_id, result, states.SUCCESS, request=request)
+        keys.append(backend.get_key_for_task(task_id).decode())
+    return keys
+
+
+def run_saga_after(backend, client):
+    correlation_id, saga_id = str(uuid.uuid4()), str(uuid.uuid4())[:8]
+    keys = [saga_status_key(saga_id)]
+    for index, (step, event_type) in enumerate(STEPS):
+        record_saga_step(saga_id, correlation_id, step, "started", redis_client=client)
+        result = step_result(step, event_type, correlation_id, saga_id)
+        if index == len(STEPS) - 1:
+            # Only the step completing the chain stores a result.
+            task_id = str(uuid.uuid4())
+            request = request_for(step, task_id, [correlation_id, saga_id])
+            backend.store_result(task_id, result, states.SUCCESS, request=request)
+            keys.append(backend.get_key_for_task(task_id).decode())
+        record_saga_step(saga_id, correlation_id, step, "succeeded", redis_client=client)
+    return keys
+
+
+def measure(client, keys):
+    return sum(client.memory_usage(key) or 0 for key in keys)
+
+
+def run(url, sagas):
+    client = redis.Redis.from_url(url, decode_responses=True)
+    for name, config, run_saga in (
+        ("before", BEFORE, run_saga_before),
+        ("after", AFTER, run_saga_after),
+    ):
+        backend = make_backend(url, config)
+        keys = []
+        for _ in range(sagas):
+            keys.extend(run_saga(backend, client))
+        used = measure(client, keys)
+        ttl = client.ttl(keys[-1])
+        print(
+            f"{name:>6}: {len(keys) / sagas:.1f} keys/saga, {used / sagas:,.0f} bytes/saga, "
+            f"ttl {ttl}s"
+        )
+        client.delete(*keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sagas", type=int, default=200)
+    parser.add_argument(
+        "--redis-url",
+        default=os.environ.get("CELERY_RESULT_BACKEND", "redis://redis:6379/0"),
+    )
+    args = parser.parse_args()
+    run(args.redis_url, args.sagas)
+
+
+if __name__ == "__main__":
+    main()
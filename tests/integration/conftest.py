@@ -1,8 +1,11 @@
+import asyncio
 import os
 import pytest
 import redis
 import uuid
 
+from app.fleet import registry
+
 REDIS_HOST = os.environ.get("REDIS_HOST", "redis")
 REDIS_PORT = int(os.environ.get("REDIS_PORT", 6379))
 REDIS_DB = int(os.environ.get("REDIS_DB", 0))
@@ -28,3 +31,25 @@ def ids_mock():
     Fixture to generate a unique correlation ID for each test.
     """
     return generate_ids()
+
+
+@pytest.fixture(scope="function")
+def fleet():
+    """
+    Register a few robots for tests whose sagas allocate them (allocation fails on an
+    empty fleet) and unregister them afterwards.
+    """
+    prefix = uuid.uuid4().hex[:8]
+    robots = [f"{prefix}-robot-{i}" for i in range(4)]
+
+    async def register():
+        for robot_id in robots:
+            await registry.register_robot(robot_id, 100)
+
+    async def unregister():
+        for robot_id in robots:
+            await registry.unregister_robot(robot_id)
+
+    asyncio.run(register())
+    yield robots
+    asyncio.run(unregister())
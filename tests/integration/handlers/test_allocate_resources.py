@@ -51,7 +51,7 @@ def test_allocate_resources_reply_sequence(redis_client, replay_stream_mock, ids
 
 
 @pytest.mark.asyncio
-async def test_allocate_resources_request_and_reply_pattern(ids_mock):
+async def test_allocate_resources_request_and_reply_pattern(ids_mock, fleet):
     """
     Integration test: verify request_and_reply + multi_stage_reply pattern.
     """
@@ -35,4 +35,4 @@ def test_release_resources_reply_sequence(redis_client, replay_stream_mock, ids_
     assert not events, f"Expected no events before sending command, but got: {events}"
     send_command(redis_client, STREAM, command_data)
     events = collect_events(redis_client, replay_stream_mock, GROUP, CONSUMER, correlation_id, timeout=10.0)
-    assert events == ["start", "progress", "completed"]
+    assert events == ["start", "completed"]
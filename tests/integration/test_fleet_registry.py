@@ -0,0 +1,46 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.fleet import registry
+
+
+@pytest.mark.asyncio
+async def test_concurrent_allocations_never_share_robots():
+    prefix = uuid.uuid4().hex[:8]
+    robots = [f"{prefix}-robot-{i}" for i in range(6)]
+    for i, robot_id in enumerate(robots):
+        await registry.register_robot(robot_id, 50 + i, capabilities=[f"{prefix}-lidar"])
+
+    sagas = [f"{prefix}-saga-{i}" for i in range(3)]
+    try:
+        await _allocate_and_release(prefix, robots, sagas)
+    finally:
+        # Leave the shared fleet as found; other tests register their own robots.
+        for robot_id in robots:
+            await registry.unregister_robot(robot_id)
+
+
+async def _allocate_and_release(prefix, robots, sagas):
+    allocations = await asyncio.gather(
+        *(
+            registry.allocate_robots(saga_id, 2, capabilities=[f"{prefix}-lidar"])
+            for saga_id in sagas
+        )
+    )
+    allocated = [robot_id for allocation in allocations for robot_id in allocation]
+    assert sorted(allocated) == sorted(robots)
+
+    with pytest.raises(registry.InsufficientRobotsError):
+        await registry.allocate_robots(f"{prefix}-saga-x", 1, capabilities=[f"{prefix}-lidar"])
+    with pytest.raises(registry.InsufficientRobotsError):
+        await registry.allocate_robots(f"{prefix}-saga-z", 1, capabilities=[f"{prefix}-none"])
+
+    # Allocation and release are idempotent per saga_id.
+    assert sorted(await registry.allocate_robots(sagas[0], 2)) == sorted(allocations[0])
+    assert sorted(await registry.release_robots(sagas[0])) == sorted(allocations[0])
+    assert await registry.release_robots(sagas[0]) == []
+    assert sorted(
+        await registry.allocate_robots(f"{prefix}-saga-y", 2, capabilities=[f"{prefix}-lidar"])
+    ) == sorted(allocations[0])
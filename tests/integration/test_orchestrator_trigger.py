@@ -11,7 +11,7 @@ GROUP_NAME = "orchestrator_group_integration_test"
 
 
 @pytest.mark.parametrize("backend", ["celery", "async"])
-def test_orchestrator_trigger(redis_client, backend):
+def test_orchestrator_trigger(redis_client, fleet, backend):
     # Ensure group exists for mission:commands
     try:
         redis_client.xgroup_create(REDIS_STREAM, GROUP_NAME, id="$", mkstream=True)
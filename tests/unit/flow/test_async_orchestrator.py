@@ -1,6 +1,13 @@
+import asyncio
+import time
+
 import pytest
 import uuid
 import app.flows.mission_start_async.orchestrator as async_orch
+from app.commands.handlers import allocate_resources
+from app.commands.listener import handler_spec, run_command_listeners
+from app.redis_utils import client, transport
+from app.redis_utils.replies import ReplyFailedError
 
 
 @pytest.mark.asyncio
@@ -24,13 +31,20 @@ async def test_run_saga_exists(monkeypatch):
         "routing:plan",
         "exploration:perform",
         "map:integrate",
-        "release_resources",
+        "resources:release",
     ]
 
 
 @pytest.mark.asyncio
-async def test_compensation_functions_exist():
+async def test_compensation_functions_exist(monkeypatch):
     """Compensation functions should be defined and awaitable."""
+    released = []
+
+    async def fake_release_robots(saga_id):
+        released.append(saga_id)
+        return ["r1"]
+
+    monkeypatch.setattr(async_orch, "release_robots", fake_release_robots)
     saga_id = "testid"
     correlation_id = "cid"
     for fn in [
@@ -43,3 +57,54 @@ async def test_compensation_functions_exist():
         result = await fn(saga_id, correlation_id)
         assert isinstance(result, dict)
         assert "correlation_id" in result
+    # Both resource compensations return the saga's robots to the fleet.
+    assert released == [saga_id, saga_id]
+
+
+@pytest.mark.asyncio
+async def test_failed_saga_releases_allocated_robots(monkeypatch):
+    commands = []
+    released = []
+
+    async def fake_request_and_reply(**kw):
+        commands.append((kw["command_stream"], kw["event_type"]))
+        if kw["event_type"] == "routing:plan":
+            raise RuntimeError("no route")
+        return {}
+
+    async def fake_release_robots(saga_id):
+        released.append(saga_id)
+        return ["r1"]
+
+    async def fake_cancel_saga(saga_id, reason=None):
+        pass
+
+    monkeypatch.setattr(async_orch, "request_and_reply", fake_request_and_reply)
+    monkeypatch.setattr(async_orch, "release_robots", fake_release_robots)
+    monkeypatch.setattr(async_orch, "cancel_saga", fake_cancel_saga)
+    with pytest.raises(RuntimeError):
+        await async_orch.run_saga(2, "ZoneA", "cid")
+    assert commands == [("resources:commands", "resources:allocate"), ("routing:commands", "routing:plan")]
+    assert len(released) == 1
+
+
+@pytest.mark.asyncio
+async def test_failing_allocation_fails_the_saga(monkeypatch):
+    monkeypatch.setattr(client, "MESSAGE_TRANSPORT", "memory")
+    monkeypatch.setattr(transport, "_memory_transport", None)
+    monkeypatch.setattr(
+        "app.commands.listener.discovery_handler_modules",
+        lambda: [handler_spec("allocate_resources", allocate_resources)],
+    )
+    shutdown = asyncio.Event()
+    listener = asyncio.create_task(run_command_listeners(shutdown_event=shutdown))
+    await asyncio.sleep(0.05)
+    started = time.monotonic()
+    try:
+        # No robot is registered: the allocation fails and will not be retried in time.
+        with pytest.raises(ReplyFailedError, match="Handler failed"):
+            await async_orch.run_saga(1, "ZoneA", "cid")
+    finally:
+        shutdown.set()
+        await asyncio.wait_for(listener, 3)
+    assert time.monotonic() - started < 1
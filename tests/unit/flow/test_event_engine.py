@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.commands.handlers import plan_route, saga_engine
+from app.commands.listener import handler_spec, run_command_listeners
+from app.flows.mission_start_events import engine
+from app.redis_utils import client, transport
+from app.redis_utils.cancellation import cancel_saga, is_cancelled
+
+
+@pytest.fixture
+def r(monkeypatch):
+    monkeypatch.setattr(client, "MESSAGE_TRANSPORT", "memory")
+    monkeypatch.setattr(transport, "_memory_transport", None)
+    return transport.get_memory_transport()
+
+
+async def last_command(r, step):
+    spec = engine.STEPS[step]
+    entries = await r.xrange(spec.command_stream)
+    fields = [fields for _, fields in entries if fields["event_type"] == spec.event_type]
+    return fields[-1] if fields else None
+
+
+def reply(command, status, payload='{}'):
+    return {
+        "saga_id": command["saga_id"],
+        "correlation_id": command["correlation_id"],
+        "event_type": command["event_type"],
+        "status": status,
+        "payload": payload,
+    }
+
+
+@pytest.mark.asyncio
+async def test_saga_advances_through_every_step_on_replies(r):
+    saga_id = await engine.start_saga(2, "ZoneA", "cid", redis_client=r)
+
+    for step in range(len(engine.STEPS)):
+        command = await last_command(r, step)
+        assert command["reply_stream"] == engine.REPLY_STREAM
+        assert (await engine.get_saga_state(saga_id, redis_client=r))["step"] == str(step)
+        assert await engine.on_replies([reply(command, "start")], redis_client=r) == 0
+        assert await engine.on_replies([reply(command, "completed")] * 2, redis_client=r) == 1
+
+    state = await engine.get_saga_state(saga_id, redis_client=r)
+    assert state["status"] == engine.COMPLETED
+    assert await r.zrangebyscore(engine.TIMEOUTS_KEY, "-inf", "+inf") == []
+    assert await r.ttl(engine.state_key(saga_id)) > 0
+    first = await last_command(r, 0)
+    assert first["payload"] == '{"robots_allocated": 2}'
+
+
+@pytest.mark.asyncio
+async def test_failed_reply_fails_saga_and_compensates_completed_steps(r, monkeypatch):
+    compensated = []
+
+    async def compensate(saga_id, correlation_id):
+        compensated.append(saga_id)
+
+    monkeypatch.setattr(engine, "COMPENSATIONS", {spec.name: compensate for spec in engine.STEPS})
+    saga_id = await engine.start_saga(1, "ZoneA", "cid", redis_client=r)
+    await engine.on_replies([reply(await last_command(r, 0), "completed")], redis_client=r)
+    await engine.on_replies(
+        [reply(await last_command(r, 1), "failed", '{"error": "no route"}')], redis_client=r
+    )
+
+    state = await engine.get_saga_state(saga_id, redis_client=r)
+    assert state["status"] == engine.FAILED
+    assert state["failed_step"] == "plan_route"
+    assert state["error"] == "no route"
+    assert compensated == [saga_id]
+    assert await is_cancelled(saga_id, redis_client=r)
+    assert await last_command(r, 2) is None
+
+
+@pytest.mark.asyncio
+async def test_timed_out_step_fails_saga_and_late_reply_is_ignored(r):
+    saga_id = await engine.start_saga(1, "ZoneA", "cid", redis_client=r)
+    command = await last_command(r, 0)
+
+    assert await engine.sweep_timeouts(redis_client=r, now=float(command["deadline"]) - 1) == 0
+    assert await engine.sweep_timeouts(redis_client=r, now=float(command["deadline"]) + 1) == 1
+
+    state = await engine.get_saga_state(saga_id, redis_client=r)
+    assert state["status"] == engine.FAILED
+    assert "timed out" in state["error"]
+    assert await engine.on_replies([reply(command, "completed")], redis_client=r) == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_saga_ends_on_the_cancelled_reply_of_its_step(r, monkeypatch):
+    compensated = []
+
+    async def compensate(saga_id, correlation_id):
+        compensated.append(saga_id)
+
+    monkeypatch.setattr(engine, "COMPENSATIONS", {spec.name: compensate for spec in engine.STEPS})
+    monkeypatch.setattr(
+        "app.commands.listener.discovery_handler_modules",
+        lambda: [
+            handler_spec("plan_route", plan_route),
+            handler_spec("saga_engine", saga_engine),
+        ],
+    )
+    # The plan_route command is already queued when the saga is cancelled.
+    await r.xgroup_create(plan_route.STREAM_NAME, plan_route.GROUP_NAME, id="0", mkstream=True)
+    saga_id = await engine.start_saga(1, "ZoneA", "cid", redis_client=r)
+    await engine.on_replies([reply(await last_command(r, 0), "completed")], redis_client=r)
+    await cancel_saga(saga_id, reason="operator abort", redis_client=r)
+
+    shutdown = asyncio.Event()
+    listener = asyncio.create_task(run_command_listeners(shutdown_event=shutdown))
+    try:
+        for _ in range(100):
+            if (await engine.get_saga_state(saga_id, redis_client=r))["status"] != engine.RUNNING:
+                break
+            await asyncio.sleep(0.02)
+    finally:
+        shutdown.set()
+        await asyncio.wait_for(listener, 3)
+
+    state = await engine.get_saga_state(saga_id, redis_client=r)
+    assert state["status"] == engine.CANCELLED
+    assert state["cancelled_step"] == "plan_route"
+    assert compensated == [saga_id]
+    assert await r.zrangebyscore(engine.TIMEOUTS_KEY, "-inf", "+inf") == []
+
+
+@pytest.mark.asyncio
+async def test_transitions_run_the_module_level_script_by_sha():
+    redis_client = MagicMock()
+    redis_client.evalsha = AsyncMock(return_value=1)
+    for _ in range(2):
+        await engine.start_saga(1, "ZoneA", "cid", redis_client=redis_client)
+
+    assert redis_client.evalsha.await_count == 2
+    sha, numkeys, *keys_and_args = redis_client.evalsha.await_args.args
+    assert sha == hashlib.sha1(engine.ADVANCE_SAGA_LUA.encode()).hexdigest()
+    assert keys_and_args[1:numkeys] == [engine.TIMEOUTS_KEY, engine.STEPS[0].command_stream]
+    redis_client.register_script.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_wait_saga_returns_on_completion_and_raises_on_failure(r):
+    saga_id = await engine.start_saga(1, "ZoneA", "cid", redis_client=r)
+    with pytest.raises(asyncio.TimeoutError):
+        await engine.wait_saga(saga_id, timeout=0.05, redis_client=r, interval=0.01)
+
+    waiter = asyncio.create_task(engine.wait_saga(saga_id, redis_client=r, interval=0.01))
+    for step in range(len(engine.STEPS)):
+        await engine.on_replies([reply(await last_command(r, step), "completed")], redis_client=r)
+    assert (await waiter)["status"] == engine.COMPLETED
+
+    failing = await engine.start_saga(1, "ZoneA", "cid", redis_client=r)
+    await engine.on_replies(
+        [reply(await last_command(r, 0), "failed", '{"error": "no robots"}')], redis_client=r
+    )
+    with pytest.raises(engine.SagaFailedError, match="no robots") as exc_info:
+        await engine.wait_saga(failing, redis_client=r, interval=0.01)
+    assert exc_info.value.state["failed_step"] == "allocate_resources"
@@ -0,0 +1,11 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+
+
+@pytest.fixture(autouse=True)
+def no_cancellation():
+    """
+    Handlers check for saga cancellation on every progress() call; no saga is cancelled here.
+    """
+    with patch("app.redis_utils.decorators.check_cancelled", new=AsyncMock()) as mock_check:
+        yield mock_check
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 import app.commands.handlers.allocate_resources as handler
 
 
@@ -13,11 +13,17 @@ async def test_handler_emits_multi_stage_events():
         "event_type": "resources:allocate"
     }
     with patch("app.redis_utils.decorators.emit_event") as mock_emit:
-        with patch("app.redis_utils.commands.get_redis_client"):
+        fleet = AsyncMock(return_value=["r1"])
+        with patch("app.redis_utils.commands.get_redis_client"), patch(
+            "app.commands.handlers.allocate_resources.allocate_robots", new=fleet
+        ) as mock_fleet:
             await handler.handle(fields)
+        mock_fleet.assert_awaited_once()
+        assert mock_fleet.await_args.args[0] == "sid"
         statuses = [call.kwargs.get("status") for call in mock_emit.call_args_list]
         streams = [call.kwargs.get("stream") for call in mock_emit.call_args_list]
         assert streams[0] == "resources:replies:cid"
         assert statuses[0] == "start"
         assert "progress" in statuses
         assert statuses[-1] == "completed"
+        assert mock_emit.call_args_list[-1].kwargs["payload"] == {"robots": ["r1"]}
@@ -1,6 +1,12 @@
+import json
+
+import numpy as np
 import pytest
 from unittest.mock import patch
 import app.commands.handlers.integrate_maps as handler
+from app.redis_utils import client, transport
+from app.redis_utils.blobs import load_array
+from app.slam.map_fusion import fuse_maps
 
 
 @pytest.mark.asyncio
@@ -21,3 +27,22 @@ async def test_handler_emits_multi_stage_events():
         assert statuses[0] == "start"
         assert "progress" in statuses
         assert statuses[-1] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_fused_grid_is_returned_as_a_blob_descriptor(monkeypatch):
+    monkeypatch.setattr(client, "MESSAGE_TRANSPORT", "memory")
+    monkeypatch.setattr(transport, "_memory_transport", None)
+    grids = [np.full((4, 4), 1.5), np.full((4, 4), -0.5)]
+    maps = [{"grid": grid.tolist(), "pose": [0.0, 0.0, 0.0], "resolution": 1.0} for grid in grids]
+
+    result = await handler.handle({
+        "correlation_id": "cid",
+        "event_type": "map:integrate",
+        "reply_stream": "map:replies:cid",
+        "payload": json.dumps({"maps": maps}),
+    })
+
+    expected = fuse_maps(grids, [(0.0, 0.0, 0.0)] * 2, 1.0, resolutions=[1.0, 1.0], out_origin=(0.0, 0.0))
+    assert np.array_equal(await load_array(result["final_map"]), expected)
+    assert result["height"] == expected.shape[0]
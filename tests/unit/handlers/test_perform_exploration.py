@@ -1,5 +1,8 @@
 import pytest
+from collections import OrderedDict
 from unittest.mock import patch
+
+import numpy as np
 import app.commands.handlers.perform_exploration as handler
 
 
@@ -21,3 +24,33 @@ async def test_handler_emits_multi_stage_events():
         assert statuses[0] == "start"
         assert "progress" in statuses
         assert statuses[-1] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_cached_base_map_only_applies_new_updates(monkeypatch):
+    grids = {"blob:base": np.full((20, 20), -2.0, dtype=np.float32)}
+    grids["blob:base"][:, 10:] = 0.0
+
+    async def load_array(descriptor):
+        return grids[descriptor["ref"]]
+
+    monkeypatch.setattr(handler, "load_array", load_array)
+    monkeypatch.setattr(handler, "_frontier_maps", OrderedDict())
+    built = []
+    real_frontier_map = handler.FrontierMap
+    monkeypatch.setattr(handler, "FrontierMap", lambda grid: built.append(grid) or real_frontier_map(grid))
+    base = {"ref": "blob:base", "shape": [20, 20], "dtype": "<f4"}
+    updates = [{"row": 0, "col": 10, "patch": [[-2.0] * 10] * 5}]
+
+    first = await handler.frontier_map(base, updates)
+    updates.append({"row": 5, "col": 10, "patch": [[-2.0] * 10] * 5})
+    applied = []
+    real_update = first.update
+    monkeypatch.setattr(first, "update", lambda *args: applied.append(args[:2]) or real_update(*args))
+    second = await handler.frontier_map(base, updates)
+
+    assert second is first
+    assert len(built) == 1
+    assert applied == [(5, 10)]
+    expected = real_frontier_map(second.grid)
+    assert np.array_equal(second.cells, expected.cells)
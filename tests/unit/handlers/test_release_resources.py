@@ -1,23 +1,31 @@
 import pytest
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 import app.commands.handlers.release_resources as handler
 
 
 @pytest.mark.asyncio
-async def test_handler_emits_multi_stage_events():
-    fields = {
-        "stream": "resources:commands",
-        "reply_stream": "resources:replies:cid",
-        "correlation_id": "cid",
-        "saga_id": "sid",
-        "event_type": "resources:release"
-    }
-    with patch("app.redis_utils.decorators.emit_event") as mock_emit:
-        with patch("app.redis_utils.commands.get_redis_client"):
-            await handler.handle(fields)
-        statuses = [call.kwargs.get("status") for call in mock_emit.call_args_list]
-        streams = [call.kwargs.get("stream") for call in mock_emit.call_args_list]
-        assert streams[0] == "resources:replies:cid"
-        assert statuses[0] == "start"
-        assert "progress" in statuses
-        assert statuses[-1] == "completed"
+async def test_handler_releases_batch_and_replies_per_command():
+    batch = [
+        {
+            "stream": "resources:commands",
+            "reply_stream": f"resources:replies:{saga_id}",
+            "correlation_id": "cid",
+            "saga_id": saga_id,
+            "event_type": "resources:release",
+        }
+        for saga_id in ("sid1", "sid2")
+    ]
+    with patch("app.redis_utils.decorators.emit_events", new=AsyncMock()) as mock_emit:
+        fleet = AsyncMock(return_value=[["r1"], []])
+        with patch(
+            "app.commands.handlers.release_resources.release_robots_batch", new=fleet
+        ) as mock_fleet:
+            outcomes = await handler.handle(batch)
+        mock_fleet.assert_awaited_once_with(["sid1", "sid2"])
+        assert outcomes == [{"released": ["r1"]}, {"released": []}]
+        assert mock_emit.await_count == 2
+        starts, replies = (call.args[0] for call in mock_emit.await_args_list)
+        assert [r["status"] for r in starts] == ["start", "start"]
+        assert [r["stream"] for r in replies] == ["resources:replies:sid1", "resources:replies:sid2"]
+        assert [r["status"] for r in replies] == ["completed", "completed"]
+        assert replies[0]["payload"] == {"released": ["r1"]}
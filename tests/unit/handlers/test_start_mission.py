@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+import app.commands.handlers.start_mission as handler
+from app.flows.mission_start_events import engine
+from app.redis_utils import client, transport
+
+
+@pytest.fixture
+def r(monkeypatch):
+    monkeypatch.setattr(client, "MESSAGE_TRANSPORT", "memory")
+    monkeypatch.setattr(transport, "_memory_transport", None)
+    return transport.get_memory_transport()
+
+
+def mission(correlation_id):
+    return {
+        "correlation_id": correlation_id,
+        "event_type": "mission:start",
+        "reply_stream": f"mission:replies:{correlation_id}",
+        "robot_count": "1",
+        "area": "ZoneA",
+        "backend": "events",
+    }
+
+
+async def step_replies(r, status, count=len(engine.STEPS)):
+    for spec in engine.STEPS[:count]:
+        for _ in range(100):
+            commands = [f for _, f in await r.xrange(spec.command_stream) if f["event_type"] == spec.event_type]
+            if commands:
+                break
+            await asyncio.sleep(0.01)
+        command = commands[-1]
+        await engine.on_replies(
+            [{**{key: command[key] for key in ("saga_id", "correlation_id", "event_type")}, "status": status}],
+            redis_client=r,
+        )
+
+
+async def statuses(r, correlation_id):
+    return [fields["status"] for _, fields in await r.xrange(f"mission:replies:{correlation_id}")]
+
+
+@pytest.mark.asyncio
+async def test_events_backend_replies_completed_once_the_saga_completed(r):
+    run = asyncio.create_task(handler.handle(mission("c1")))
+    await asyncio.sleep(0.05)
+    assert await statuses(r, "c1") == ["start"]
+
+    await step_replies(r, "completed")
+    saga_id = await asyncio.wait_for(run, 1)
+
+    assert (await engine.get_saga_state(saga_id, redis_client=r))["status"] == engine.COMPLETED
+    assert await statuses(r, "c1") == ["start", "completed"]
+
+
+@pytest.mark.asyncio
+async def test_events_backend_replies_failed_when_the_saga_failed(r):
+    run = asyncio.create_task(handler.handle(mission("c2")))
+    await step_replies(r, "failed", count=1)
+
+    with pytest.raises(engine.SagaFailedError):
+        await asyncio.wait_for(run, 1)
+    assert await statuses(r, "c2") == ["start", "failed"]
@@ -0,0 +1,69 @@
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import pytest
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from app.redis_utils import binary, client, transport
+from app.redis_utils.binary import BinaryFieldsRedis, array_fields, decode_response, field_array
+from app.redis_utils.commands import emit_command
+from app.redis_utils.envelope import Envelope, reply_event
+
+RAW = b"\x00\xff\xfe"
+
+
+def test_stream_entries_keep_binary_fields_and_decode_the_rest():
+    reply = [[b"scans", [(b"1-0", {b"event_type": b"scan", b"grid": RAW, b"grid_dtype": b"|u1"})]]]
+    assert decode_response(reply, "XREADGROUP", {"grid"}) == [
+        ["scans", [("1-0", {"event_type": "scan", "grid": RAW, "grid_dtype": "|u1"})]]
+    ]
+    assert decode_response([{b"name": b"g", b"pending": 1}], "XINFO GROUPS", {"grid"}) == [
+        {"name": "g", "pending": 1}
+    ]
+    error = ResponseError("NOGROUP")
+    assert decode_response(error, "XREADGROUP") is error
+
+
+@pytest.mark.asyncio
+async def test_binary_fields_client_decodes_replies_of_every_command():
+    r = BinaryFieldsRedis(binary_fields={"grid"})
+    raw = [(b"1-0", {b"saga_id": b"s1", b"grid": RAW})]
+    with patch.object(Redis, "execute_command", new=AsyncMock(return_value=raw)):
+        assert await r.xrange("scans") == [("1-0", {"saga_id": "s1", "grid": RAW})]
+    with patch.object(Redis, "execute_command", new=AsyncMock(return_value=b"OK")):
+        assert await r.get("key") == "OK"
+    assert r.get_encoder().decode_responses is False
+
+
+def test_undesignated_binary_fields_are_rejected(monkeypatch):
+    monkeypatch.setattr(binary, "BINARY_FIELDS", frozenset({"grid"}))
+    assert binary.binary_fields({"grid": bytearray(RAW)})["grid"].tobytes() == RAW
+    with pytest.raises(ValueError):
+        binary.binary_fields({"scan": RAW})
+
+
+def test_reply_event_moves_bytes_and_array_metadata_out_of_the_json_payload():
+    grid = np.arange(6, dtype=np.int16).reshape(2, 3)
+    event = reply_event({"reply_stream": "r"}, "completed", {"cells": 6, **array_fields("grid", grid)})
+    assert event["payload"] == {"cells": 6}
+    assert set(event["binary"]) == {"grid", "grid_dtype", "grid_shape"}
+
+
+@pytest.mark.asyncio
+async def test_arrays_travel_as_raw_bytes_and_are_wrapped_without_copy(monkeypatch):
+    monkeypatch.setattr(client, "MESSAGE_TRANSPORT", "memory")
+    monkeypatch.setattr(transport, "_memory_transport", None)
+    monkeypatch.setattr(binary, "BINARY_FIELDS", frozenset({"grid"}))
+    r = transport.get_memory_transport()
+    await r.xgroup_create("scans", "g", id="0", mkstream=True)
+    grid = np.arange(12, dtype=np.float32).reshape(3, 4)
+
+    await emit_command("scans", "cid", "s1", "scan", {"robot": 1}, binary=array_fields("grid", grid))
+
+    [(_, [(entry_id, fields)])] = await r.xreadgroup("g", "c", {"scans": ">"})
+    message = Envelope.from_entry(entry_id, fields)
+    received = field_array(message, "grid")
+    assert message.payload == {"robot": 1}
+    assert np.array_equal(received, grid)
+    assert np.shares_memory(received, grid)
@@ -0,0 +1,112 @@
+import json
+import pytest
+import numpy as np
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from app import redis_utils
+from app.redis_utils import blobs
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.store = redis.store
+        self.ops = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def set(self, key, value, ex=None, nx=False):
+        self.ops.append(lambda: self.redis.set_now(key, value, nx))
+
+    def expire(self, key, ttl):
+        self.ops.append(lambda: key in self.store)
+
+    async def execute(self):
+        return [op() for op in self.ops]
+
+
+class FakeBlobRedis:
+    def __init__(self):
+        self.store = {}
+        self.writes = 0
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        self.round_trips += 1
+        return FakePipeline(self)
+
+    def set_now(self, key, value, nx=False):
+        if nx and key in self.store:
+            return None
+        self.writes += 1
+        self.store[key] = bytes(value)
+        return True
+
+    async def get(self, key):
+        return self.store.get(key)
+
+
+@pytest.fixture
+def fake_redis():
+    fake = FakeBlobRedis()
+    with patch("app.redis_utils.blobs.get_redis_client", return_value=fake):
+        yield fake
+
+
+@pytest.mark.asyncio
+async def test_store_blob_deduplicates_and_compresses(fake_redis):
+    data = b"0" * 10000
+    key1 = await redis_utils.store_blob(data)
+    key2 = await redis_utils.store_blob(data)
+    assert key1 == key2
+    assert key1.startswith("blob:")
+    assert fake_redis.writes == 1
+    assert fake_redis.round_trips == 2
+    assert len(fake_redis.store[key1]) < len(data)
+    assert bytes(await redis_utils.load_blob(key1)) == data
+
+
+@pytest.mark.asyncio
+async def test_load_blob_missing_raises(fake_redis):
+    with pytest.raises(KeyError):
+        await redis_utils.load_blob("blob:missing")
+
+
+@pytest.mark.asyncio
+async def test_array_roundtrip(fake_redis):
+    array = np.random.default_rng(0).normal(size=(64, 32)).astype(np.float32)
+    descriptor = await redis_utils.store_array(array)
+    json.dumps(descriptor)
+    loaded = await redis_utils.load_array(descriptor)
+    assert loaded.dtype == np.float32
+    assert np.array_equal(loaded, array)
+
+
+@pytest.mark.asyncio
+async def test_payload_fields_inline_and_reference(fake_redis):
+    small = await blobs.payload_fields({"route": "r"}, threshold=100)
+    assert small == {"payload": json.dumps({"route": "r"})}
+    assert await redis_utils.load_payload(small) == {"route": "r"}
+
+    big_payload = {"grid": list(range(1000))}
+    big = await blobs.payload_fields(big_payload, threshold=100)
+    assert set(big) == {"payload_ref"}
+    assert await redis_utils.load_payload(big) == big_payload
+
+
+@pytest.mark.asyncio
+async def test_emit_command_stores_large_payload_out_of_stream(fake_redis):
+    mock = MagicMock()
+    mock.xadd = AsyncMock(return_value="entry_id")
+    with patch("app.redis_utils.commands.get_redis_client", return_value=mock):
+        await redis_utils.emit_command(
+            "stream", "corr", "saga", "evt", {"grid": list(range(1000))}, blob_threshold=100
+        )
+    args, kwargs = mock.xadd.call_args
+    fields = args[1]
+    assert "payload" not in fields
+    assert fields["payload_ref"] in fake_redis.store
@@ -0,0 +1,168 @@
+import random
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app import redis_utils
+from app.redis_utils import breaker
+from app.redis_utils.breaker import CircuitBreaker, CircuitOpenError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_jittered_retry_spreads_delays_within_bounds_and_budget():
+    def delays(seed):
+        strategy = redis_utils.jittered_retry(base=0.1, max_delay=1.0, rng=random.Random(seed))
+        result, last = [], 0
+        for attempt in range(1, 6):
+            last = strategy(attempt, 0, last)
+            result.append(last)
+        return result
+
+    assert all(0.1 <= d <= 1.0 for d in delays(1) + delays(2))
+    assert 0.1 <= delays(1)[0] <= 0.3
+    assert delays(1) != delays(2)
+
+    budgeted = redis_utils.jittered_retry(base=0.5, max_delay=0.5, budget=2.0)
+    assert budgeted(1, 1.0, 0) == 0.5
+    assert budgeted(2, 1.8, 0.5) is None
+    assert redis_utils.jittered_retry(max_attempts=2)(3, 0, 0.1) is None
+
+
+def test_breaker_opens_after_failures_and_recovers_through_probe():
+    clock = Clock()
+    cb = CircuitBreaker("cmds", failure_threshold=3, window=10, reset_timeout=5, clock=clock)
+    for _ in range(2):
+        cb.before_request()
+        cb.record_failure()
+    assert cb.state == "closed"
+    clock.now = 20  # earlier failures left the window
+    cb.record_failure()
+    assert cb.state == "closed"
+    cb.record_failure()
+    cb.record_failure()
+    assert cb.state == "open"
+    with pytest.raises(CircuitOpenError):
+        cb.before_request()
+
+    clock.now = 26
+    cb.before_request()  # the probe
+    assert cb.state == "half_open"
+    assert not cb.allow()  # one probe at a time
+    cb.record_failure()
+    assert cb.state == "open"
+
+    clock.now = 32
+    with cb.guard():
+        pass
+    assert cb.state == "closed"
+    assert cb.allow()
+
+
+def test_guard_classifies_outcomes():
+    cb = CircuitBreaker("cmds", failure_threshold=1, reset_timeout=0, clock=Clock())
+    with pytest.raises(redis_utils.ReplyFailedError):
+        with cb.guard(answered=(redis_utils.ReplyFailedError,)):
+            raise redis_utils.ReplyFailedError("failed", {})
+    assert cb.state == "closed"
+    with pytest.raises(TimeoutError):
+        with cb.guard():
+            raise TimeoutError()
+    assert cb.state == "open"
+    with pytest.raises(KeyboardInterrupt):
+        with cb.guard():  # the probe, released without a verdict
+            raise KeyboardInterrupt()
+    assert cb.state == "half_open"
+    assert cb.allow()
+
+
+@pytest.mark.asyncio
+async def test_request_and_reply_fails_fast_while_circuit_open(monkeypatch):
+    monkeypatch.setattr(breaker, "_breakers", {})
+    emit = AsyncMock(return_value="1-0")
+    read = AsyncMock(side_effect=TimeoutError("no reply"))
+    with patch("app.redis_utils.replies.emit_request", emit), patch(
+        "app.redis_utils.replies.read_replies", read
+    ):
+        for _ in range(breaker.BREAKER_FAILURE_THRESHOLD):
+            result = await redis_utils.request_and_reply(
+                "cmds", "replies", "corr", "saga", "evt", {}, timeout=1
+            )
+            assert result == {}
+        for _ in range(2):
+            with pytest.raises(CircuitOpenError):
+                await redis_utils.request_and_reply(
+                    "cmds", "replies", "corr", "saga", "evt", {}, timeout=1
+                )
+    assert read.await_count == breaker.BREAKER_FAILURE_THRESHOLD
+    assert emit.await_count == breaker.BREAKER_FAILURE_THRESHOLD
+    assert breaker.get_breaker("cmds", "evt").state == "open"
+    assert breaker.get_breaker("other:commands", "evt").state == "closed"
+
+
+def half_open(stream, event_type="evt"):
+    cb = breaker.get_breaker(stream, event_type)
+    cb.state = breaker.OPEN
+    cb._opened_at = -breaker.BREAKER_RESET_TIMEOUT
+    return cb
+
+
+@pytest.mark.asyncio
+async def test_request_replies_records_verdict_while_replies_are_consumed(monkeypatch):
+    monkeypatch.setattr(breaker, "_breakers", {})
+    replies = [{"status": "start"}, {"status": "completed"}]
+
+    async def stream_replies(*args, **kwargs):
+        for fields in replies:
+            yield fields
+
+    async def timed_out_replies(*args, **kwargs):
+        yield {"status": "start"}
+        raise TimeoutError("no reply")
+
+    monkeypatch.setattr("app.redis_utils.replies.emit_request", AsyncMock())
+    monkeypatch.setattr("app.redis_utils.replies.stream_replies", stream_replies)
+    answered = half_open("cmds:answered")
+    async for fields in redis_utils.request_replies("cmds:answered", "replies", "corr", "saga", "evt", {}):
+        if fields["status"] == "completed":
+            break
+    assert answered.state == "closed"
+
+    monkeypatch.setattr("app.redis_utils.replies.stream_replies", timed_out_replies)
+    silent = half_open("cmds:silent")
+    with pytest.raises(TimeoutError):
+        async for fields in redis_utils.request_replies("cmds:silent", "replies", "corr", "saga", "evt", {}):
+            assert silent.state == "half_open"
+    assert silent.state == "open"
+
+
+@pytest.mark.asyncio
+async def test_breaker_is_per_event_type_on_a_shared_stream(monkeypatch):
+    monkeypatch.setattr(breaker, "_breakers", {})
+    emit = AsyncMock(return_value="1-0")
+    read = AsyncMock(side_effect=TimeoutError("no reply"))
+    with patch("app.redis_utils.replies.emit_request", emit), patch(
+        "app.redis_utils.replies.read_replies", read
+    ):
+        for _ in range(breaker.BREAKER_FAILURE_THRESHOLD):
+            await redis_utils.request_and_reply(
+                "resources:commands", "replies", "corr", "saga", "allocate_resources", {}, timeout=1
+            )
+        with pytest.raises(CircuitOpenError):
+            await redis_utils.request_and_reply(
+                "resources:commands", "replies", "corr", "saga", "allocate_resources", {}, timeout=1
+            )
+        read.side_effect = None
+        read.return_value = {"status": "completed"}
+        result = await redis_utils.request_and_reply(
+            "resources:commands", "replies", "corr", "saga", "release_resources", {}, timeout=1
+        )
+    assert result == {"status": "completed"}
+    assert breaker.get_breaker("resources:commands", "allocate_resources").state == "open"
+    assert breaker.get_breaker("resources:commands", "release_resources").state == "closed"
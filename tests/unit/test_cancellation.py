@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import app.flows.mission_start_async.orchestrator as async_orch
+from app.commands.listener import run_command_listeners
+from app.redis_utils.cancellation import CANCEL_STREAM, CommandCancelled
+from app.redis_utils.decorators import multi_stage_reply
+
+
+@pytest.mark.asyncio
+async def test_progress_stops_cancelled_handler_with_cancelled_reply():
+    @multi_stage_reply
+    async def handle(fields, progress):
+        await progress(0.5)
+        handle.finished = True
+
+    handle.finished = False
+    fields = {
+        "reply_stream": "replies:req",
+        "correlation_id": "cid",
+        "saga_id": "sid",
+        "event_type": "evt",
+    }
+    client = MagicMock()
+    client.exists = AsyncMock(return_value=1)
+    with patch("app.redis_utils.cancellation.get_redis_client", return_value=client):
+        with patch("app.redis_utils.decorators.emit_event") as mock_emit:
+            with pytest.raises(CommandCancelled):
+                await handle(fields)
+    statuses = [call.kwargs.get("status") for call in mock_emit.call_args_list]
+    assert statuses == ["start", "cancelled"]
+    assert not handle.finished
+    client.exists.assert_awaited_with("saga:cancelled:sid")
+
+
+@pytest.mark.asyncio
+async def test_listener_cancels_inflight_handler_of_cancelled_saga(monkeypatch):
+    started = asyncio.Event()
+
+    async def slow_handle(fields):
+        started.set()
+        await asyncio.sleep(10)
+        slow_handle.finished = True
+
+    slow_handle.finished = False
+    monkeypatch.setattr(
+        "app.commands.listener.discovery_handler_modules",
+        lambda: [
+            {
+                "name": "slow",
+                "stream": "stream1",
+                "group": "group1",
+                "event_type": "foo",
+                "handle": slow_handle,
+            }
+        ],
+    )
+
+    async def xread(streams, block, count):
+        await started.wait()
+        xread.calls += 1
+        if xread.calls == 1:
+            return [(CANCEL_STREAM, [("1-0", {"saga_id": "s1", "reason": "test"})])]
+        await asyncio.sleep(block / 1000)
+        return []
+
+    xread.calls = 0
+    redis_client = MagicMock()
+    redis_client.xgroup_create = AsyncMock()
+    redis_client.xreadgroup = AsyncMock(
+        side_effect=[[("stream1", [("msgid1", {"saga_id": "s1", "event_type": "foo"})])], []]
+    )
+    redis_client.exists = AsyncMock(return_value=0)
+    redis_client.xread = xread
+    redis_client.xack = AsyncMock()
+
+    task = asyncio.create_task(run_command_listeners(redis_client))
+    await asyncio.sleep(0.2)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert started.is_set()
+    assert not slow_handle.finished
+    redis_client.xack.assert_awaited_with("stream1", "group1", "msgid1")
+
+
+@pytest.mark.asyncio
+async def test_failed_saga_is_cancelled_before_compensation(monkeypatch):
+    calls = []
+
+    async def fake_request_and_reply(*a, **kw):
+        if kw.get("event_type") == "exploration:perform":
+            raise RuntimeError("boom")
+        return {"status": "ok"}
+
+    async def fake_cancel_saga(saga_id, reason=None):
+        calls.append(("cancel", reason))
+
+    async def fake_compensate(saga_id, correlation_id, **ctx):
+        calls.append(("compensate", None))
+
+    monkeypatch.setattr(async_orch, "request_and_reply", fake_request_and_reply)
+    monkeypatch.setattr(async_orch, "cancel_saga", fake_cancel_saga)
+    monkeypatch.setattr(async_orch, "compensate_plan_route", fake_compensate)
+    monkeypatch.setattr(async_orch, "compensate_allocate_resources", fake_compensate)
+    with pytest.raises(RuntimeError):
+        await async_orch.run_saga(1, "area", "cid")
+    assert calls == [
+        ("cancel", "RuntimeError: boom"),
+        ("compensate", None),
+        ("compensate", None),
+    ]
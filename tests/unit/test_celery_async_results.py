@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+from celery import Celery
+
+from app.flows.mission_start_celery.async_results import ResultListener
+
+
+class FakePubSub:
+    def __init__(self, server):
+        self.server = server
+        self.channels = set()
+        self.messages = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.channels.add(channel)
+
+    async def unsubscribe(self, channel):
+        self.channels.discard(channel)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def reset(self):
+        self.channels.clear()
+
+
+class FakeRedis:
+    """Just enough of redis.asyncio for the result backend's SET + PUBLISH."""
+
+    def __init__(self):
+        self.values = {}
+        self.pubsubs = []
+
+    def pubsub(self):
+        pubsub = FakePubSub(self)
+        self.pubsubs.append(pubsub)
+        return pubsub
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    def store(self, key, value):
+        self.values[key] = value
+        for pubsub in self.pubsubs:
+            if key in pubsub.channels:
+                pubsub.messages.put_nowait({"type": "message", "channel": key, "data": value})
+
+
+@pytest.fixture
+def backend():
+    # The Redis backend only connects on first use; encoding and key names are local.
+    return Celery("test", broker="memory://", backend="redis://localhost:6379/0").backend
+
+
+def store_later(client, backend, task_id, meta, delay=0.01):
+    async def store():
+        await asyncio.sleep(delay)
+        client.store(backend.get_key_for_task(task_id), backend.encode(meta))
+
+    return asyncio.create_task(store())
+
+
+@pytest.mark.asyncio
+async def test_many_waiters_share_one_subscription_connection(backend):
+    client = FakeRedis()
+    listener = ResultListener(backend, redis_client=client)
+    task_ids = [f"task-{i}" for i in range(200)]
+    for i, task_id in enumerate(task_ids):
+        store_later(client, backend, task_id, {"status": "SUCCESS", "result": i})
+
+    results = await asyncio.gather(*(listener.wait(t, timeout=2) for t in task_ids))
+
+    assert results == list(range(200))
+    assert len(client.pubsubs) == 1
+    assert client.pubsubs[0].channels == set()
+    await listener.close()
+
+
+@pytest.mark.asyncio
+async def test_result_stored_before_subscribing_is_returned(backend):
+    client = FakeRedis()
+    client.store(backend.get_key_for_task("done"), backend.encode({"status": "SUCCESS", "result": "ok"}))
+    listener = ResultListener(backend, redis_client=client)
+    assert await listener.wait("done", timeout=1) == "ok"
+    await listener.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_task_raises_and_pending_task_times_out(backend):
+    client = FakeRedis()
+    listener = ResultListener(backend, redis_client=client)
+    store_later(client, backend, "started", {"status": "STARTED", "result": None})
+    store_later(
+        client,
+        backend,
+        "failed",
+        {"status": "FAILURE", "result": backend.prepare_exception(ValueError("boom"))},
+    )
+    with pytest.raises(ValueError, match="boom"):
+        await listener.wait("failed", timeout=1)
+    with pytest.raises(asyncio.TimeoutError):
+        await listener.wait("started", timeout=0.1)
+    await listener.close()
@@ -1,7 +1,7 @@
 import sys
 import types
 import pytest
-from app.commands.listener import discovery_handler_modules
+from app.commands.listener import discovery_handler_modules, handler_spec
 
 
 @pytest.fixture(autouse=True)
@@ -40,3 +40,35 @@ def test_discovery_handler_modules_returns_metadata():
     assert handler["group"] == "dummy_group"
     assert handler["event_type"] == "dummy:event"
     assert callable(handler["handle"])
+
+
+def test_discovery_reads_runtime_options_with_defaults():
+    handler = discovery_handler_modules()[0]
+    assert handler["execution_mode"] == "async"
+    assert handler["concurrency"] == 1
+    assert handler["batch_size"] == 10
+    assert handler["block_ms"] == 1000
+    assert handler["max_runtime"] is None
+    assert handler["priority"] == 0
+
+    dummy = sys.modules["app.commands.handlers.dummy_handler"]
+    dummy.CONCURRENCY, dummy.EXECUTION_MODE, dummy.MAX_RUNTIME = 4, "thread", 2.5
+    spec = handler_spec("dummy_handler", dummy)
+    assert (spec["concurrency"], spec["execution_mode"], spec["max_runtime"]) == (4, "thread", 2.5)
+    dummy.EXECUTION_MODE = "fiber"
+    with pytest.raises(ValueError):
+        handler_spec("dummy_handler", dummy)
+
+
+def test_discovery_registry_is_cached(monkeypatch):
+    first = discovery_handler_modules()
+    import pkgutil
+
+    def fail(path):
+        raise AssertionError("discovery scanned the package again")
+
+    monkeypatch.setattr(pkgutil, "iter_modules", fail)
+    second = discovery_handler_modules()
+    assert second == first
+    second[0]["stream"] = "changed"
+    assert discovery_handler_modules()[0]["stream"] == "dummy:commands"
@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import pytest
+
+from app.commands import listener
+from app.commands.listener import run_command_listeners
+from app.redis_utils import client, dead_letters, transport
+from app.redis_utils.decorators import multi_stage_reply
+from app.redis_utils.envelope import Envelope
+from app.redis_utils.transport import InMemoryTransport
+
+
+@pytest.fixture
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(dead_letters, "REDELIVERY_BACKOFF", 0.01)
+    monkeypatch.setattr(listener, "REDELIVERY_BACKOFF", 0.01)
+    monkeypatch.setattr(dead_letters, "MAX_DELIVERIES", 2)
+
+
+@pytest.mark.asyncio
+async def test_failed_message_is_redelivered_then_dead_lettered_and_requeued(fast_backoff):
+    r = InMemoryTransport()
+    await r.xgroup_create("cmds", "g", id="0", mkstream=True)
+    msg_id = await r.xadd("cmds", {"event_type": "evt", "deadline": f"{time.time() + 60:.3f}"})
+    [(_, [(_, fields)])] = await r.xreadgroup("g", "listener", {"cmds": ">"})
+
+    assert not await dead_letters.handle_failure(r, "cmds", "g", msg_id, fields, ValueError("bad"))
+    assert await dead_letters.reclaim_failed(r, "cmds", "g", "listener") == []
+    await asyncio.sleep(0.02)
+    retry = await dead_letters.reclaim_failed(r, "cmds", "g", "listener")
+    assert retry == [(msg_id, fields)]
+    assert retry[0][1].delivery == 2
+
+    assert await dead_letters.handle_failure(r, "cmds", "g", msg_id, fields, ValueError("bad"))
+    assert await r.xpending_range("cmds", "g", "-", "+", 10) == []
+    [(dead_id, dead)] = await dead_letters.list_dead_letters("cmds", redis_client=r)
+    assert dead["dead_error"] == "bad"
+    assert dead["dead_id"] == msg_id
+    assert dead["dead_deliveries"] == "2"
+
+    [requeued] = await dead_letters.requeue_dead_letters("cmds", redis_client=r)
+    assert await r.xlen("cmds:dead") == 0
+    [(_, fields)] = await r.xrange("cmds", min=requeued, max=requeued)
+    assert fields == {"event_type": "evt"}
+
+
+@pytest.mark.asyncio
+async def test_failure_is_final_when_the_deadline_passes_before_redelivery(fast_backoff):
+    r = InMemoryTransport()
+    await r.xgroup_create("cmds", "g", id="0", mkstream=True)
+    deadline = f"{time.time() + 0.005:.3f}"
+    msg_id = await r.xadd("cmds", {"event_type": "evt", "deadline": deadline})
+    [(_, [(_, fields)])] = await r.xreadgroup("g", "listener", {"cmds": ">"})
+
+    assert dead_letters.failure_status(Envelope(fields, msg_id, delivery=1)) == "failed"
+    assert await dead_letters.handle_failure(r, "cmds", "g", msg_id, fields, ValueError("bad"))
+    assert await r.xpending_range("cmds", "g", "-", "+", 10) == []
+    later = {"event_type": "evt", "deadline": f"{time.time() + 60:.3f}"}
+    assert dead_letters.failure_status(Envelope(later, delivery=1)) == dead_letters.RETRYING_STATUS
+
+
+@pytest.mark.asyncio
+async def test_reclaim_dead_letters_messages_that_were_never_acked(fast_backoff):
+    r = InMemoryTransport()
+    await r.xgroup_create("cmds", "g", id="0", mkstream=True)
+    msg_id = await r.xadd("cmds", {"event_type": "evt"})
+    await r.xreadgroup("g", "listener", {"cmds": ">"})
+    await asyncio.sleep(0.02)
+    assert len(await dead_letters.reclaim_failed(r, "cmds", "g", "listener")) == 1
+    await asyncio.sleep(0.03)
+    assert await dead_letters.reclaim_failed(r, "cmds", "g", "listener") == []
+    [(_, dead)] = await r.xrange("cmds:dead")
+    assert dead["dead_id"] == msg_id
+    assert "deliveries" in dead["dead_error"]
+
+
+@pytest.mark.asyncio
+async def test_listener_retries_failing_handler_and_dead_letters_it(fast_backoff, monkeypatch):
+    monkeypatch.setattr(client, "MESSAGE_TRANSPORT", "memory")
+    monkeypatch.setattr(transport, "_memory_transport", None)
+    calls = []
+
+    async def handle(fields):
+        calls.append(fields["n"])
+        raise RuntimeError(f"cannot handle {fields['n']}")
+
+    monkeypatch.setattr(
+        "app.commands.listener.discovery_handler_modules",
+        lambda: [
+            {"name": "poison", "stream": "p:commands", "group": "p_group", "event_type": None, "handle": handle}
+        ],
+    )
+    r = transport.get_memory_transport()
+    shutdown = asyncio.Event()
+    task = asyncio.create_task(run_command_listeners(shutdown_event=shutdown))
+    await asyncio.sleep(0.05)
+    await r.xadd("p:commands", {"n": "1"})
+    for _ in range(100):
+        if await r.xlen("p:commands:dead"):
+            break
+        await asyncio.sleep(0.02)
+    shutdown.set()
+    await asyncio.wait_for(task, 3)
+
+    assert calls == ["1", "1"]
+    [(_, dead)] = await r.xrange("p:commands:dead")
+    assert dead["dead_error"] == "cannot handle 1"
+    assert await r.xpending_range("p:commands", "p_group", "-", "+", 10) == []
+
+
+@pytest.mark.asyncio
+async def test_failed_reply_is_sent_only_on_the_last_delivery(fast_backoff, monkeypatch):
+    monkeypatch.setattr(client, "MESSAGE_TRANSPORT", "memory")
+    monkeypatch.setattr(transport, "_memory_transport", None)
+
+    @multi_stage_reply
+    async def handle(fields):
+        raise RuntimeError("still broken")
+
+    monkeypatch.setattr(
+        "app.commands.listener.discovery_handler_modules",
+        lambda: [
+            {"name": "poison", "stream": "p:commands", "group": "p_group", "event_type": None, "handle": handle}
+        ],
+    )
+    r = transport.get_memory_transport()
+    shutdown = asyncio.Event()
+    task = asyncio.create_task(run_command_listeners(shutdown_event=shutdown))
+    await asyncio.sleep(0.05)
+    await r.xadd("p:commands", {"correlation_id": "cid", "reply_stream": "p:replies"})
+    for _ in range(100):
+        if await r.xlen("p:commands:dead"):
+            break
+        await asyncio.sleep(0.02)
+    shutdown.set()
+    await asyncio.wait_for(task, 3)
+
+    statuses = [fields["status"] for _, fields in await r.xrange("p:replies")]
+    assert statuses == ["start", dead_letters.RETRYING_STATUS, "start", "failed"]
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app import redis_utils
+from app.redis_utils import deadlines
+from app.redis_utils.decorators import multi_stage_reply
+
+
+def test_deadline_after_is_capped_by_enclosing_deadline():
+    now = time.time()
+    assert deadlines.deadline_after(10) == pytest.approx(now + 10, abs=1)
+    assert deadlines.deadline_after(10, deadline=now + 2) == pytest.approx(now + 2)
+
+
+def test_remaining_time_and_expiry():
+    assert deadlines.remaining_time({}) is None
+    assert not deadlines.is_expired({})
+    assert deadlines.is_expired({"deadline": "1.000"})
+    future = {"deadline": f"{time.time() + 60:.3f}"}
+    assert 0 < deadlines.remaining_time(future) <= 61
+    deadlines.check_deadline(future)
+    with pytest.raises(deadlines.DeadlineExceeded):
+        deadlines.check_deadline({"deadline": "1.000"})
+
+
+@pytest.mark.asyncio
+async def test_progress_stops_expired_handler_with_expired_reply():
+    @multi_stage_reply
+    async def handle(fields, progress, deadline):
+        handle.deadline = deadline
+        await progress(0.5)
+        handle.finished = True
+
+    handle.finished = False
+    fields = {
+        "reply_stream": "replies:req",
+        "correlation_id": "cid",
+        "event_type": "evt",
+        "deadline": "1.000",
+    }
+    with patch("app.redis_utils.decorators.emit_event") as mock_emit:
+        with pytest.raises(deadlines.DeadlineExceeded):
+            await handle(fields)
+    statuses = [call.kwargs.get("status") for call in mock_emit.call_args_list]
+    assert statuses == ["start", "expired"]
+    assert handle.deadline == 1.0
+    assert not handle.finished
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "read_error, deadline",
+    [
+        (deadlines.DeadlineExceeded("expired reply"), None),
+        (TimeoutError("no reply"), time.time() - 1),
+    ],
+)
+async def test_request_and_reply_raises_and_cancels_saga_on_deadline_expiry(read_error, deadline):
+    emit = AsyncMock(return_value="1-0")
+    read = AsyncMock(side_effect=read_error)
+    cancel = AsyncMock()
+    with patch("app.redis_utils.replies.emit_request", emit), patch(
+        "app.redis_utils.replies.read_replies", read
+    ), patch("app.redis_utils.replies.cancel_saga", cancel):
+        with pytest.raises(deadlines.DeadlineExceeded):
+            await redis_utils.request_and_reply(
+                "cmds:expiry", "replies", "corr", "saga", "evt", {}, timeout=1, deadline=deadline
+            )
+    cancel.assert_awaited_once()
+    assert cancel.await_args.args == ("saga",)
+
+
+@pytest.mark.asyncio
+async def test_request_and_reply_step_timeout_still_returns_empty_result():
+    cancel = AsyncMock()
+    with patch("app.redis_utils.replies.emit_request", AsyncMock()), patch(
+        "app.redis_utils.replies.read_replies", AsyncMock(side_effect=TimeoutError("no reply"))
+    ), patch("app.redis_utils.replies.cancel_saga", cancel):
+        result = await redis_utils.request_and_reply(
+            "cmds:timeout", "replies", "corr", "saga", "evt", {}, timeout=1, deadline=time.time() + 60
+        )
+    assert result == {}
+    cancel.assert_not_awaited()
@@ -0,0 +1,80 @@
+import pickle
+
+import pytest
+
+from app.redis_utils import blobs, client, envelope, transport
+from app.redis_utils.blobs import load_payload, payload_fields
+from app.redis_utils.envelope import Envelope
+
+
+def command_fields(**extra):
+    return {
+        "correlation_id": "cid",
+        "saga_id": "s1",
+        "event_type": "routing:plan",
+        "reply_stream": "routing:replies:r1",
+        "deadline": "1000.500",
+        "timestamp": "999.250000",
+        "payload": '{"route": "A"}',
+        **extra,
+    }
+
+
+def test_metadata_is_parsed_up_front_and_payload_on_first_access(monkeypatch):
+    decoded = []
+    real_loads = envelope.json.loads
+    monkeypatch.setattr(envelope.json, "loads", lambda s: decoded.append(s) or real_loads(s))
+
+    message = Envelope.from_entry("1-0", command_fields())
+    assert (message.saga_id, message.event_type, message.deadline, message.timestamp) == (
+        "s1", "routing:plan", 1000.5, 999.25
+    )
+    assert message.get("reply_stream") == "routing:replies:r1"
+    assert dict(message) == command_fields()
+    assert decoded == []
+
+    assert message.payload == {"route": "A"}
+    assert message.payload is message.payload
+    assert len(decoded) == 1
+    assert Envelope.from_entry("1-0", message) is message
+    assert not hasattr(message, "__dict__")
+
+
+def test_reply_event_addresses_the_command_reply_stream():
+    event = Envelope(command_fields()).reply_event("completed", {"ok": True})
+    assert event == {
+        "stream": "routing:replies:r1",
+        "correlation_id": "cid",
+        "event_type": "routing:plan",
+        "saga_id": "s1",
+        "status": "completed",
+        "payload": {"ok": True},
+    }
+
+
+def test_envelope_pickles_with_or_without_decoded_payload():
+    message = Envelope(command_fields(), "1-0")
+    copy = pickle.loads(pickle.dumps(message))
+    assert copy.payload == {"route": "A"}
+    assert pickle.loads(pickle.dumps(message)).entry_id == "1-0"
+    message.payload
+    assert pickle.loads(pickle.dumps(message)).payload == {"route": "A"}
+
+
+@pytest.mark.asyncio
+async def test_blob_payload_is_loaded_once(monkeypatch):
+    monkeypatch.setattr(client, "MESSAGE_TRANSPORT", "memory")
+    monkeypatch.setattr(transport, "_memory_transport", None)
+    fields = command_fields(**await payload_fields({"map": [[0] * 50] * 50}, threshold=10))
+    del fields["payload"]
+    message = Envelope(fields)
+
+    with pytest.raises(LookupError):
+        message.payload
+    loads = []
+    real_load_blob = envelope.load_blob
+    monkeypatch.setattr(envelope, "load_blob", lambda key: loads.append(key) or real_load_blob(key))
+    assert len((await load_payload(message))["map"]) == 50
+    assert (await message.load_payload()) is message.payload
+    assert len(loads) == 1
+    assert await blobs.load_payload(fields) == message.payload
@@ -0,0 +1,80 @@
+import hashlib
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.commands.handlers import allocate_resources
+from app.fleet import registry
+from app.redis_utils.transport import InMemoryTransport
+
+
+def mock_client(result):
+    client = MagicMock()
+    client.evalsha = AsyncMock(return_value=result)
+    return client, client.evalsha
+
+
+def script_call(evalsha):
+    sha, numkeys, *args = evalsha.await_args.args
+    return sha, args[:numkeys], args[numkeys:]
+
+
+@pytest.mark.asyncio
+async def test_allocate_intersects_capability_indexes_in_single_script_call():
+    client, script = mock_client(["r1", "r2"])
+    robots = await registry.allocate_robots(
+        "saga1", 2, min_battery=30, capabilities=["lidar", "camera"], redis_client=client
+    )
+    assert robots == ["r1", "r2"]
+    script.assert_awaited_once()
+    sha, keys, args = script_call(script)
+    assert sha == hashlib.sha1(registry.ALLOCATE_LUA.encode()).hexdigest()
+    assert keys == [
+        registry.allocation_key("saga1"),
+        registry.candidates_key("saga1"),
+        registry.capability_key("lidar"),
+        registry.capability_key("camera"),
+    ]
+    assert args == [registry.FLEET_PREFIX, "saga1", 2, 30]
+    client.register_script.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_allocate_raises_when_not_enough_robots():
+    client, _ = mock_client(None)
+    with pytest.raises(registry.InsufficientRobotsError):
+        await registry.allocate_robots("saga1", 5, redis_client=client)
+
+
+@pytest.mark.asyncio
+async def test_release_targets_saga_allocation():
+    client, script = mock_client(["r1"])
+    assert await registry.release_robots("saga1", redis_client=client) == ["r1"]
+    assert script_call(script)[1] == [registry.allocation_key("saga1")]
+
+
+def test_parse_fleet_accepts_a_count_or_robot_entries():
+    assert registry.parse_fleet("") == []
+    assert registry.parse_fleet("2") == [("robot-1", 100, ()), ("robot-2", 100, ())]
+    assert registry.parse_fleet("r1:90:lidar+camera, r2") == [
+        ("r1", 90.0, ("lidar", "camera")),
+        ("r2", 100, ()),
+    ]
+    with pytest.raises(ValueError):
+        registry.parse_fleet("r1:full")
+
+
+@pytest.mark.asyncio
+async def test_listener_startup_seeds_the_fleet_for_allocations(monkeypatch):
+    r = InMemoryTransport()
+    monkeypatch.setattr(registry, "FLEET_ROBOTS", "r1:90:lidar,r2:40")
+    assert allocate_resources.BACKGROUND is registry.seed_fleet_on_startup
+
+    await allocate_resources.BACKGROUND(r, None)
+
+    robots = await registry.list_robots(redis_client=r)
+    assert {robot_id: fields["status"] for robot_id, fields in robots.items()} == {
+        "r1": "available",
+        "r2": "available",
+    }
+    assert await registry.allocate_robots("s1", 1, capabilities=["lidar"], redis_client=r) == ["r1"]
@@ -0,0 +1,77 @@
+import numpy as np
+
+from app.slam.frontiers import FrontierMap, frontier_mask, label_cells
+
+
+def partition(frontiers):
+    groups = {}
+    for cell, label in zip(frontiers.cells.tolist(), frontiers.labels.tolist()):
+        groups.setdefault(label, set()).add(cell)
+    return sorted(sorted(group) for group in groups.values())
+
+
+def random_grid(rng, shape):
+    return rng.choice([-2.0, 0.0, 3.0], size=shape, p=[0.5, 0.4, 0.1]).astype(np.float32)
+
+
+def test_frontier_mask_marks_free_cells_next_to_unknown():
+    grid = np.full((5, 5), -2.0, dtype=np.float32)
+    grid[2, 2] = 0.0
+    mask = frontier_mask(grid)
+    expected = np.zeros((5, 5), dtype=bool)
+    expected[1:4, 1:4] = True
+    expected[2, 2] = False
+    assert np.array_equal(mask, expected)
+
+
+def test_frontier_mask_window_matches_full_evaluation():
+    grid = random_grid(np.random.default_rng(0), (20, 30))
+    full = frontier_mask(grid)
+    assert np.array_equal(frontier_mask(grid, window=(3, 11, 0, 17)), full[3:11, 0:17])
+
+
+def test_label_cells_uses_8_connectivity_without_wrapping():
+    width = 5
+    cells = np.array([0, 6, 12, 4, 5], dtype=np.int64)
+    cells.sort()
+    labels = label_cells(cells, width)
+    by_cell = dict(zip(cells.tolist(), labels.tolist()))
+    assert by_cell[0] == by_cell[6] == by_cell[12]
+    # Cell 4 (row 0, last column) and cell 5 (row 1, first column) are not adjacent.
+    assert by_cell[4] != by_cell[5]
+
+
+def test_incremental_updates_match_full_recompute():
+    rng = np.random.default_rng(1)
+    frontiers = FrontierMap(random_grid(rng, (40, 50)))
+    for _ in range(25):
+        height, width = rng.integers(1, 8, size=2)
+        row = rng.integers(0, 40 - height + 1)
+        col = rng.integers(0, 50 - width + 1)
+        frontiers.update(row, col, random_grid(rng, (height, width)))
+        expected = FrontierMap(frontiers.grid)
+        assert np.array_equal(frontiers.cells, expected.cells)
+        assert partition(frontiers) == partition(expected)
+
+
+def test_update_leaves_clusters_away_from_the_patch_untouched():
+    grid = np.full((50, 50), -2.0, dtype=np.float32)
+    grid[:, :2] = 0.0
+    grid[40:, 45:] = 0.0
+    frontiers = FrontierMap(grid)
+    far = {label: members for label, members in frontiers._components.items() if members[0] % 50 < 5}
+
+    relabeled = frontiers.update(45, 40, np.full((2, 2), 0.0, dtype=np.float32))
+
+    assert relabeled < 30
+    for label, members in far.items():
+        assert frontiers._components[label] is members
+
+
+def test_clusters_report_size_and_centroid():
+    grid = np.full((6, 10), -2.0, dtype=np.float32)
+    grid[:, 5:] = 0.0
+    clusters = FrontierMap(grid).clusters()
+    assert len(clusters) == 1
+    assert clusters[0]["size"] == 6
+    assert clusters[0]["centroid"] == [2.5, 4.0]
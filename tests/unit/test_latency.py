@@ -0,0 +1,61 @@
+import pytest
+
+from app.redis_utils.timings import pickup_key, timestamp
+from app.redis_utils.transport import InMemoryTransport
+from app.tools.latency import critical_path, fetch_steps, format_saga, phase_summary
+
+
+async def add_step(r, stream, event_type, saga_id, emitted, started, finished, picked_up):
+    reply_stream = f"{stream}:replies:{event_type}"
+    await r.xadd(
+        stream,
+        {
+            "event_type": event_type,
+            "saga_id": saga_id,
+            "reply_stream": reply_stream,
+            "timestamp": timestamp(emitted),
+        },
+    )
+    await r.xadd(reply_stream, {"status": "start", "timestamp": timestamp(started)})
+    await r.xadd(reply_stream, {"status": "completed", "timestamp": timestamp(finished)})
+    await r.set(pickup_key(reply_stream), timestamp(picked_up))
+
+
+@pytest.mark.asyncio
+async def test_steps_are_broken_down_and_critical_path_found():
+    r = InMemoryTransport()
+    await add_step(r, "a:commands", "a", "s1", 100.0, 100.010, 100.500, 100.502)
+    # b and c run in parallel after a; c finishes last, so the path goes a -> c -> d
+    await add_step(r, "b:commands", "b", "s1", 100.505, 100.506, 100.600, 100.601)
+    await add_step(r, "c:commands", "c", "s1", 100.505, 100.520, 101.000, 101.004)
+    await add_step(r, "d:commands", "d", "s1", 101.010, 101.011, 101.100, 101.101)
+    await r.xadd("a:commands", {"event_type": "a", "saga_id": "other", "timestamp": timestamp(100.0)})
+
+    steps = await fetch_steps(r, ["a:commands", "b:commands", "c:commands", "d:commands"], saga_id="s1")
+
+    [a] = [step for step in steps if step["event_type"] == "a"]
+    assert a["status"] == "completed"
+    assert a["queue_wait"] == pytest.approx(0.010)
+    assert a["execution"] == pytest.approx(0.490)
+    assert a["pickup_delay"] == pytest.approx(0.002)
+
+    path = critical_path(steps)
+    assert [step["event_type"] for step, _ in path] == ["a", "c", "d"]
+    assert path[0][1] is None
+    assert path[1][1] == pytest.approx(0.003)
+    assert path[2][1] == pytest.approx(0.006)
+    assert "critical path (1101.0 ms" in format_saga("s1", steps)
+
+    summary = phase_summary(steps)
+    assert summary["c"]["count"] == 1
+    assert summary["c"]["execution"]["p50"] == pytest.approx(0.480)
+
+
+@pytest.mark.asyncio
+async def test_steps_without_replies_fall_back_to_entry_time():
+    r = InMemoryTransport()
+    entry_id = await r.xadd("a:commands", {"event_type": "a", "saga_id": "s1", "reply_stream": "a:replies:1"})
+    [step] = await fetch_steps(r, ["a:commands", "missing:commands"])
+    assert step["emitted"] == int(entry_id.split("-")[0]) / 1000
+    assert step["queue_wait"] is None
+    assert critical_path([step]) == []
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from app.tools import loadgen
+
+
+def test_constant_schedule_is_evenly_spaced():
+    offsets = loadgen.constant_schedule(4, 2)
+    assert offsets.tolist() == [0.0, 0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 1.75]
+
+
+def test_ramp_schedule_matches_linear_rate():
+    offsets = loadgen.ramp_schedule(10, 30, 10)
+    # Integral of the rate: 10 * 10 + (30 - 10) * 10 / 2 = 200 sends.
+    assert offsets.size == 200
+    assert offsets[0] == 0.0 and offsets[-1] < 10
+    assert np.all(np.diff(offsets) > 0)
+    gaps = np.diff(offsets)
+    assert gaps[0] == pytest.approx(0.1, rel=0.05)
+    assert gaps[-1] == pytest.approx(1 / 30, rel=0.05)
+    assert loadgen.ramp_schedule(5, 5, 2).tolist() == loadgen.constant_schedule(5, 2).tolist()
+
+
+def test_burst_schedule_adds_simultaneous_sends():
+    offsets = loadgen.burst_schedule(1, 4, burst_size=3, burst_every=2)
+    assert offsets.size == 4 + 2 * 3
+    assert np.count_nonzero(offsets == 2.0) == 4
+    assert np.all(np.diff(offsets) >= 0)
+
+
+def test_summarize_counts_outcomes_and_percentiles():
+    report = loadgen.summarize(
+        [0.1, 0.2, 0.3, 0.4],
+        ["completed"] * 4 + ["failed", "timeout", "timeout"],
+        elapsed=2.0,
+        sent=7,
+    )
+    assert report["completed"] == 4
+    assert report["errors"] == 1
+    assert report["timeouts"] == 2
+    assert report["throughput"] == 2.0
+    assert report["latency"]["p50"] == pytest.approx(0.25)
+    assert report["latency"]["max"] == pytest.approx(0.4)
+    assert "latency" in loadgen.format_report(report)
+
+
+def test_event_driven_backend_can_be_load_tested(monkeypatch, capsys):
+    runs = []
+
+    async def run_load(offsets, **kwargs):
+        runs.append(kwargs)
+        return loadgen.summarize([0.5], ["completed"], 1.0, len(offsets))
+
+    monkeypatch.setattr(loadgen, "run_load", run_load)
+    monkeypatch.setattr("sys.argv", ["loadgen", "--backend", "events", "--rate", "2", "--duration", "1"])
+    loadgen.main()
+    assert runs[0]["backend"] == "events"
+    assert "completed: 1" in capsys.readouterr().out
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from app.slam.map_fusion import (
+    LOG_ODDS_MAX,
+    fuse_maps,
+    global_bounds,
+    log_odds_to_probability,
+    map_summary,
+    probability_to_log_odds,
+)
+
+
+def test_log_odds_roundtrip():
+    probs = np.array([0.1, 0.5, 0.9], dtype=np.float32)
+    log_odds = probability_to_log_odds(probs)
+    assert log_odds[1] == pytest.approx(0.0)
+    assert np.allclose(log_odds_to_probability(log_odds), probs, atol=1e-6)
+
+
+def test_identity_fusion_preserves_grid():
+    grid = np.random.default_rng(0).normal(size=(30, 40)).astype(np.float32)
+    fused = fuse_maps([grid], [(0.0, 0.0, 0.0)], 1.0, out_shape=(30, 40))
+    assert np.allclose(fused, grid)
+
+
+def test_fusion_sums_overlapping_evidence_and_clamps():
+    grid = np.full((10, 10), 6.0, dtype=np.float32)
+    stacked = np.stack([grid, grid])
+    fused = fuse_maps(stacked, [(0, 0, 0), (5, 0, 0)], 1.0, out_shape=(10, 20))
+    assert fused[0, 2] == pytest.approx(6.0)
+    assert fused[0, 7] == pytest.approx(LOG_ODDS_MAX)
+    assert fused[0, 17] == pytest.approx(0.0)
+
+
+def test_rotated_map_resampling():
+    grid = np.arange(20 * 30, dtype=np.float32).reshape(20, 30) / 100
+    pose = (20.0, 0.0, np.pi / 2)
+    origin, shape = global_bounds([grid.shape], [pose], [1.0], 1.0)
+    assert origin == (0.0, 0.0)
+    assert shape == (30, 20)
+    fused = fuse_maps([grid], [pose], 1.0, max_batch_cells=64)
+    # Global (x, y) maps to local (y, 20 - x) under a +90 degree rotation.
+    assert fused[5, 3] == pytest.approx(grid[16, 5])
+
+
+def test_map_summary():
+    fused = np.array([[0.0, 1.0], [-1.0, 2.0]], dtype=np.float32)
+    assert map_summary(fused) == {
+        "height": 2,
+        "width": 2,
+        "known_cells": 3,
+        "occupied_cells": 2,
+    }
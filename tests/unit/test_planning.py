@@ -0,0 +1,68 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.slam.planning import astar, cost_map, dijkstra, distance_transform, plan_routes
+
+
+def path_cost(costs, path):
+    return sum(
+        (costs[a] + costs[b]) * 0.5 * math.hypot(a[0] - b[0], a[1] - b[1])
+        for a, b in zip(path, path[1:])
+    )
+
+
+def test_distance_transform_matches_brute_force():
+    obstacles = np.random.default_rng(0).random((40, 40)) < 0.02
+    result = distance_transform(obstacles, max_distance=8)
+    points = np.argwhere(obstacles)
+    rows, cols = np.mgrid[:40, :40]
+    exact = np.sqrt(
+        ((rows[..., None] - points[:, 0]) ** 2 + (cols[..., None] - points[:, 1]) ** 2).min(-1)
+    )
+    assert np.allclose(result, np.minimum(exact, 8), atol=1e-5)
+
+
+def test_cost_map_blocks_inflated_obstacles():
+    log_odds = np.full((20, 20), -1.0, dtype=np.float32)
+    log_odds[10, 10] = 5.0
+    costs = cost_map(log_odds, robot_radius=1.5, safety_radius=4.0)
+    assert np.isinf(costs[10, 11])
+    assert np.isinf(costs[11, 11])
+    assert 1.0 < costs[10, 13] < 11.0
+    assert costs[0, 0] == pytest.approx(1.0)
+
+
+def test_astar_routes_around_wall():
+    costs = np.ones((10, 10), dtype=np.float32)
+    costs[1:, 5] = np.inf
+    path = astar(costs, (9, 0), (9, 9))
+    assert path[0] == (9, 0)
+    assert path[-1] == (9, 9)
+    assert all(cell[1] != 5 or cell[0] == 0 for cell in path)
+    assert path_cost(costs, path) == pytest.approx(dijkstra(costs, (9, 0)).cost_to((9, 9)))
+
+
+def test_astar_unreachable_goal_returns_none():
+    costs = np.ones((5, 5), dtype=np.float32)
+    costs[:, 2] = np.inf
+    assert astar(costs, (0, 0), (0, 4)) is None
+
+
+def test_plan_routes_share_one_tree_and_are_optimal():
+    rng = np.random.default_rng(3)
+    costs = rng.uniform(1.0, 3.0, size=(30, 30)).astype(np.float32)
+    costs[rng.random((30, 30)) < 0.1] = np.inf
+    costs[0, 0] = 1.0
+    goals = [(29, 29), (0, 29), (15, 3)]
+    for goal in goals:
+        costs[goal] = 1.0
+    paths = plan_routes(costs, (0, 0), goals)
+    for goal, path in zip(goals, paths):
+        single = astar(costs, (0, 0), goal)
+        if path is None:
+            assert single is None
+            continue
+        assert path[-1] == goal
+        assert path_cost(costs, path) == pytest.approx(path_cost(costs, single), rel=1e-5)
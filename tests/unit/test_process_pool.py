@@ -0,0 +1,140 @@
+import pytest
+import numpy as np
+from unittest.mock import AsyncMock, MagicMock
+import asyncio
+
+from app.commands import process_pool
+from app.commands.listener import run_command_listeners
+from app.redis_utils.decorators import multi_stage_reply
+
+
+def double_grid(fields, arrays, progress):
+    progress(0.5, {"stage": "doubling"})
+    return {"grid": arrays["grid"] * 2, "label": fields["label"]}
+
+
+async def async_echo(fields):
+    return {"echo": fields["value"]}
+
+
+async def write_when_done(path):
+    try:
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+        outcome = "completed"
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        with open(path, "w") as f:
+            f.write(outcome)
+
+
+@multi_stage_reply
+async def staged(fields, progress):
+    return {}
+
+
+@pytest.fixture(autouse=True)
+def shutdown_pool():
+    yield
+    process_pool.shutdown_process_pool()
+
+
+def test_share_and_attach_array_roundtrip():
+    source = np.arange(12, dtype=np.float32).reshape(3, 4)
+    shm, ref = process_pool.share_array(source)
+    try:
+        attached, view = process_pool.attach_array(ref)
+        assert view.shape == (3, 4)
+        assert np.array_equal(view, source)
+        del view
+        process_pool.release_array(attached)
+    finally:
+        process_pool.release_array(shm, unlink=True)
+
+
+@pytest.mark.asyncio
+async def test_run_in_process_shares_arrays_and_relays_progress():
+    events = []
+
+    async def progress(fraction, payload=None):
+        events.append((fraction, payload))
+
+    grid = np.ones((64, 64), dtype=np.float32)
+    result = await process_pool.run_in_process(
+        double_grid, {"label": "a"}, arrays={"grid": grid}, progress=progress
+    )
+    assert result["label"] == "a"
+    assert result["grid"].dtype == np.float32
+    assert np.all(result["grid"] == 2)
+    assert events == [(0.5, {"stage": "doubling"})]
+
+
+@pytest.mark.asyncio
+async def test_run_in_process_runs_async_functions():
+    result = await process_pool.run_in_process(async_echo, {"value": "x"})
+    assert result == {"echo": "x"}
+    assert process_pool._manager is None
+
+
+@pytest.mark.asyncio
+async def test_progress_is_only_relayed_to_functions_declaring_it():
+    async def progress(fraction, payload=None):
+        pass
+
+    with pytest.raises(TypeError):
+        await process_pool.run_in_process(staged, {}, progress=progress)
+
+
+@pytest.mark.asyncio
+async def test_cancelling_run_in_process_cancels_the_worker_run(tmp_path):
+    marker = tmp_path / "outcome"
+    call = asyncio.ensure_future(process_pool.run_in_process(write_when_done, str(marker)))
+    await asyncio.sleep(0.5)
+    call.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await call
+    for _ in range(100):
+        if marker.exists() and marker.read_text():
+            break
+        await asyncio.sleep(0.05)
+    assert marker.read_text() == "cancelled"
+
+
+@pytest.mark.asyncio
+async def test_listener_dispatches_process_handlers(monkeypatch):
+    async def mock_handle(fields):
+        pass
+
+    monkeypatch.setattr(
+        "app.commands.listener.discovery_handler_modules",
+        lambda: [
+            {
+                "name": "integrate_maps",
+                "stream": "stream7",
+                "group": "group7",
+                "event_type": None,
+                "handle": mock_handle,
+                "execution_mode": "process",
+            }
+        ],
+    )
+    run_mock = AsyncMock()
+    monkeypatch.setattr("app.commands.listener.run_in_process", run_mock)
+
+    redis_client = MagicMock()
+    redis_client.xgroup_create = AsyncMock()
+    redis_client.xreadgroup = AsyncMock(
+        side_effect=[[("stream7", [("msgid7", {"foo": "bar"})])], []]
+    )
+    redis_client.xack = AsyncMock()
+
+    task = asyncio.create_task(run_command_listeners(redis_client))
+    await asyncio.sleep(0.2)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    run_mock.assert_awaited_once_with(mock_handle, {"foo": "bar"})
+    redis_client.xack.assert_awaited_with("stream7", "group7", "msgid7")
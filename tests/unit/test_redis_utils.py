@@ -1,6 +1,8 @@
+import hashlib
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 from app import redis_utils
+from app.redis_utils.commands import EMIT_REQUEST_LUA
 from app.logging_config import setup_logging
 
 setup_logging("DEBUG")
@@ -46,6 +48,18 @@ async def test_read_replies_immediate_fail(mock_get_client, mock_redis):
             retry_strategy=redis_utils.immediate_fail_retry,
         )
 
+@patch("app.redis_utils.replies.get_redis_client")
+@pytest.mark.asyncio
+async def test_read_replies_fails_on_timeout_after_a_retrying_reply(mock_get_client, mock_redis):
+    mock_get_client.return_value = mock_redis
+    responses = [[("stream", [("id1", {"status": "retrying", "payload": '{"error": "boom"}'})])]]
+    mock_redis.xreadgroup.side_effect = lambda *a, **kw: responses.pop(0) if responses else []
+    with pytest.raises(redis_utils.ReplyFailedError) as exc_info:
+        await redis_utils.read_replies(
+            "stream", "corr", "req", timeout=1, retry_strategy=redis_utils.immediate_fail_retry
+        )
+    assert exc_info.value.fields["payload"] == '{"error": "boom"}'
+
 @patch("app.redis_utils.replies.get_redis_client")
 @patch("time.sleep", return_value=None)
 @pytest.mark.asyncio
@@ -131,3 +145,109 @@ async def test_emit_event_with_maxlen_ttl(mock_redis):
     assert kwargs.get("maxlen") == 50
     assert kwargs.get("approximate") is True
     mock_redis.expire.assert_called_once_with("stream", 30)
+
+@pytest.mark.asyncio
+async def test_emit_request_runs_single_script(mock_redis):
+    mock_redis.evalsha = AsyncMock(return_value="1-0")
+    with patch("app.redis_utils.commands.get_redis_client", return_value=mock_redis):
+        for _ in range(2):
+            entry_id = await redis_utils.emit_request(
+                "cmds", "replies:req", "replies:req.req.group", "corr", "saga", "evt", {"a": 1},
+                request_id="req", reply_ttl=60,
+            )
+    assert entry_id == "1-0"
+    # EVALSHA of the module-level script every time, never re-registered or reloaded.
+    assert mock_redis.evalsha.await_count == 2
+    sha, numkeys, *args = mock_redis.evalsha.await_args.args
+    assert sha == hashlib.sha1(EMIT_REQUEST_LUA.encode()).hexdigest()
+    assert numkeys == 2
+    assert args[:2] == ["cmds", "replies:req"]
+    assert args[2:6] == ["replies:req.req.group", 60, "", ""]
+    fields = dict(zip(args[6::2], args[7::2]))
+    assert fields["reply_stream"] == "replies:req"
+    assert fields["request_id"] == "req"
+    mock_redis.register_script.assert_not_called()
+    mock_redis.script_load.assert_not_called()
+    mock_redis.xadd.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_request_and_reply_skips_group_creation(mock_redis):
+    emit = AsyncMock(return_value="1-0")
+    read = AsyncMock(return_value={"status": "completed"})
+    with patch("app.redis_utils.replies.emit_request", emit), patch(
+        "app.redis_utils.replies.read_replies", read
+    ):
+        result = await redis_utils.request_and_reply(
+            "cmds", "replies", "corr", "saga", "evt", {}, timeout=1
+        )
+    assert result == {"status": "completed"}
+    reply_stream, group = emit.await_args.args[1:3]
+    assert group == f"{reply_stream}.{read.await_args.args[2]}.group"
+    assert read.await_args.kwargs["create_group"] is False
+
+@patch("app.redis_utils.replies.get_redis_client")
+@pytest.mark.asyncio
+async def test_stream_replies_yields_every_stage(mock_get_client, mock_redis):
+    mock_get_client.return_value = mock_redis
+    mock_redis.xack = AsyncMock()
+    responses = [
+        [("stream", [("id1", {"status": "start"})])],
+        [("stream", [("id2", {"status": "progress", "payload": '{"fraction": 0.5}'})])],
+        [("stream", [("id3", {"status": "completed"})])],
+        [("stream", [("id4", {"status": "progress"})])],
+    ]
+    mock_redis.xreadgroup.side_effect = lambda *a, **kw: responses.pop(0)
+    statuses = [
+        fields["status"]
+        async for fields in redis_utils.stream_replies("stream", "corr", "req", timeout=2)
+    ]
+    assert statuses == ["start", "progress", "completed"]
+
+@patch("app.redis_utils.replies.get_redis_client")
+@pytest.mark.asyncio
+async def test_read_replies_raises_on_failed_reply(mock_get_client, mock_redis):
+    mock_get_client.return_value = mock_redis
+    mock_redis.xack = AsyncMock()
+    responses = [
+        [("stream", [("id1", {"status": "start"})])],
+        [("stream", [("id2", {"status": "failed", "payload": '{"error": "boom"}'})])],
+    ]
+    mock_redis.xreadgroup.side_effect = lambda *a, **kw: responses.pop(0) if responses else []
+    with pytest.raises(redis_utils.ReplyFailedError) as exc_info:
+        await redis_utils.read_replies(
+            "stream", "corr", "req", timeout=30, retry_strategy=redis_utils.linear_retry()
+        )
+    assert exc_info.value.fields["payload"] == '{"error": "boom"}'
+
+
+@pytest.mark.asyncio
+async def test_batch_reply_emits_pipelined_replies_per_command():
+    from app.redis_utils.decorators import batch_reply
+
+    @batch_reply
+    async def handle(batch):
+        return [{"n": f["n"]} if f["n"] != "1" else redis_utils.DeadlineExceeded("late") for f in batch]
+
+    batch = [{"reply_stream": f"replies:{n}", "correlation_id": "cid", "n": str(n)} for n in range(3)]
+    batch.append({"n": "3"})
+    with patch("app.redis_utils.decorators.emit_events", new=AsyncMock()) as emit:
+        outcomes = await handle(batch)
+    assert isinstance(outcomes[1], redis_utils.DeadlineExceeded)
+    starts, replies = (call.args[0] for call in emit.await_args_list)
+    assert len(starts) == 3
+    assert [r["status"] for r in replies] == ["completed", "expired", "completed"]
+    assert replies[2]["payload"] == {"n": "2"}
+
+    @batch_reply
+    async def broken(batch):
+        raise RuntimeError("boom")
+
+    with patch("app.redis_utils.decorators.emit_events", new=AsyncMock()) as emit:
+        outcomes = await broken(batch[:2])
+    assert all(isinstance(o, RuntimeError) for o in outcomes)
+    assert [r["status"] for r in emit.await_args.args[0]] == ["failed", "failed"]
+
+    redelivered = [redis_utils.Envelope(fields, delivery=delivery) for fields, delivery in zip(batch, (1, 5))]
+    with patch("app.redis_utils.decorators.emit_events", new=AsyncMock()) as emit:
+        await broken(redelivered)
+    assert [r["status"] for r in emit.await_args.args[0]] == ["retrying", "failed"]
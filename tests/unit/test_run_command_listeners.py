@@ -2,7 +2,7 @@ import pytest
 import asyncio
 from unittest.mock import AsyncMock, MagicMock
 
-from app.commands.listener import run_command_listeners
+from app.commands.listener import PriorityLimiter, run_command_listeners
 
 
 @pytest.mark.asyncio
@@ -120,9 +120,9 @@ async def test_run_command_listeners_event_type_filter(monkeypatch):
     with pytest.raises(asyncio.CancelledError):
         await task
 
-    # Handler should not be called, xack should not be called
+    # Handler should not be called; the foreign message is acked right away
     assert not mock_handle.called
-    redis_client.xack.assert_not_awaited()
+    redis_client.xack.assert_awaited_once_with("stream3", "group3", "msgid3")
 
 @pytest.mark.asyncio
 async def test_run_command_listeners_no_event_type(monkeypatch):
@@ -223,3 +223,190 @@ async def test_run_command_listeners_missing_metadata(monkeypatch):
     await task
 
     redis_client.xreadgroup.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_run_command_listeners_skips_expired_commands(monkeypatch):
+    # Expired commands are acked and answered with 'expired' without running the handler
+    async def mock_handle(fields):
+        mock_handle.called = True
+
+    mock_handle.called = False
+
+    monkeypatch.setattr(
+        "app.commands.listener.discovery_handler_modules",
+        lambda: [
+            {
+                "name": "plan_route",
+                "stream": "stream8",
+                "group": "group8",
+                "event_type": None,
+                "handle": mock_handle,
+            }
+        ],
+    )
+    emit_mock = AsyncMock()
+    monkeypatch.setattr("app.commands.listener.emit_event", emit_mock)
+
+    fields = {
+        "correlation_id": "cid",
+        "saga_id": "sid",
+        "event_type": "routing:plan",
+        "reply_stream": "routing:replies:req",
+        "deadline": "1.000",
+    }
+    redis_client = MagicMock()
+    redis_client.xgroup_create = AsyncMock()
+    redis_client.xreadgroup = AsyncMock(side_effect=[[("stream8", [("msgid8", fields)])], []])
+    redis_client.xack = AsyncMock()
+
+    task = asyncio.create_task(run_command_listeners(redis_client))
+    await asyncio.sleep(0.2)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert not mock_handle.called
+    redis_client.xack.assert_awaited_with("stream8", "group8", "msgid8")
+    args = emit_mock.await_args.args
+    assert args[0] == "routing:replies:req"
+    assert args[3] == "expired"
+
+
+@pytest.mark.asyncio
+async def test_run_command_listeners_runs_declared_concurrency(monkeypatch):
+    running, peak = 0, 0
+
+    async def slow_handle(fields):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+
+    monkeypatch.setattr(
+        "app.commands.listener.discovery_handler_modules",
+        lambda: [
+            {
+                "name": "start_mission",
+                "stream": "stream9",
+                "group": "group9",
+                "event_type": None,
+                "handle": slow_handle,
+                "concurrency": 3,
+                "batch_size": 5,
+            }
+        ],
+    )
+    messages = [(f"msgid9-{i}", {"event_type": "mission:start"}) for i in range(5)]
+    redis_client = MagicMock()
+    redis_client.xgroup_create = AsyncMock()
+    redis_client.xreadgroup = AsyncMock(side_effect=[[("stream9", messages)], []])
+    redis_client.xack = AsyncMock()
+
+    task = asyncio.create_task(run_command_listeners(redis_client))
+    await asyncio.sleep(0.3)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert peak == 3
+    assert redis_client.xack.await_count == 5
+    assert redis_client.xreadgroup.await_args_list[0].kwargs["count"] == 5
+
+
+@pytest.mark.asyncio
+async def test_run_command_listeners_abandons_handler_over_max_runtime(monkeypatch):
+    async def stuck_handle(fields):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(
+        "app.commands.listener.discovery_handler_modules",
+        lambda: [
+            {
+                "name": "integrate_maps",
+                "stream": "stream10",
+                "group": "group10",
+                "event_type": None,
+                "handle": stuck_handle,
+                "max_runtime": 0.05,
+            }
+        ],
+    )
+    redis_client = MagicMock()
+    redis_client.xgroup_create = AsyncMock()
+    redis_client.xreadgroup = AsyncMock(
+        side_effect=[[("stream10", [("msgid10", {"event_type": "map:integrate"})])], []]
+    )
+    redis_client.xack = AsyncMock()
+
+    task = asyncio.create_task(run_command_listeners(redis_client))
+    await asyncio.sleep(0.3)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    redis_client.xack.assert_awaited_with("stream10", "group10", "msgid10")
+
+
+@pytest.mark.asyncio
+async def test_priority_limiter_hands_slots_to_highest_priority():
+    limiter = PriorityLimiter(1)
+    await limiter.acquire()
+    order = []
+
+    async def wait(priority):
+        await limiter.acquire(priority)
+        order.append(priority)
+        limiter.release()
+
+    waiters = [asyncio.create_task(wait(p)) for p in (0, 5, 1)]
+    await asyncio.sleep(0)
+    limiter.release()
+    await asyncio.gather(*waiters)
+    assert order == [5, 1, 0]
+    assert limiter._active == 0
+
+
+@pytest.mark.asyncio
+async def test_run_command_listeners_batch_handler_acks_successes_in_one_call(monkeypatch):
+    async def batch_handle(batch):
+        batch_handle.sizes.append(len(batch))
+        return [ValueError("bad") if f["n"] == "2" else {"ok": f["n"]} for f in batch]
+
+    batch_handle.sizes = []
+    monkeypatch.setattr(
+        "app.commands.listener.discovery_handler_modules",
+        lambda: [
+            {
+                "name": "release_resources",
+                "stream": "stream11",
+                "group": "group11",
+                "event_type": "resources:release",
+                "handle": batch_handle,
+                "batch": True,
+            }
+        ],
+    )
+    emit_mock = AsyncMock()
+    monkeypatch.setattr("app.commands.listener.emit_events", emit_mock)
+    messages = [(f"msgid11-{n}", {"event_type": "resources:release", "n": str(n)}) for n in range(4)]
+    messages.append(
+        ("msgid11-expired", {"event_type": "resources:release", "deadline": "1.000", "reply_stream": "r:1"})
+    )
+    messages.append(("msgid11-other", {"event_type": "resources:allocate"}))
+    redis_client = MagicMock()
+    redis_client.xgroup_create = AsyncMock()
+    redis_client.xreadgroup = AsyncMock(side_effect=[[("stream11", messages)], []])
+    redis_client.xack = AsyncMock()
+
+    task = asyncio.create_task(run_command_listeners(redis_client))
+    await asyncio.sleep(0.2)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert batch_handle.sizes == [4]
+    redis_client.xack.assert_awaited_once_with(
+        "stream11", "group11", "msgid11-other", "msgid11-expired", "msgid11-0", "msgid11-1", "msgid11-3"
+    )
+    assert [r["status"] for r in emit_mock.await_args.args[0]] == ["expired"]
@@ -0,0 +1,27 @@
+from unittest.mock import MagicMock
+
+from app.flows.mission_start_celery import status
+
+
+def test_record_saga_step_writes_summary_hash_with_ttl():
+    client = MagicMock()
+    pipe = client.pipeline.return_value
+    status.record_saga_step("sid", "cid", "plan_route", "failed", error=ValueError("boom"), redis_client=client)
+
+    key, = pipe.hset.call_args.args
+    mapping = pipe.hset.call_args.kwargs["mapping"]
+    assert key == "saga:status:sid"
+    assert mapping["plan_route"] == "failed"
+    assert mapping["last_step"] == "plan_route"
+    assert mapping["failed_step"] == "plan_route"
+    assert mapping["error"] == "boom"
+    assert mapping["correlation_id"] == "cid"
+    pipe.expire.assert_called_once_with("saga:status:sid", status.SAGA_STATUS_TTL)
+    pipe.execute.assert_called_once()
+
+
+def test_get_saga_status_reads_summary_hash():
+    client = MagicMock()
+    client.hgetall.return_value = {"last_step": "integrate_maps"}
+    assert status.get_saga_status("sid", redis_client=client) == {"last_step": "integrate_maps"}
+    client.hgetall.assert_called_once_with("saga:status:sid")
@@ -42,3 +42,13 @@ def test_request_reply_tasks(monkeypatch, task_name, args, fake_response):
     result = fn(*args)
 
     assert result == fake_response
+
+
+def test_release_resources_task_releases_the_saga_robots(monkeypatch):
+    tasks = importlib.import_module("app.flows.mission_start_celery.tasks")
+
+    async def fake_release_robots(saga_id):
+        return [f"{saga_id}-robot"]
+
+    monkeypatch.setattr(tasks, "release_robots", fake_release_robots)
+    assert tasks.release_resources("cid", "sid") == {"released": ["sid-robot"], "correlation_id": "cid"}
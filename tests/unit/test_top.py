@@ -0,0 +1,46 @@
+import pytest
+
+from app.redis_utils.transport import InMemoryTransport
+from app.tools.top import collect, count_sagas, rates, render
+
+
+@pytest.mark.asyncio
+async def test_collect_reports_lag_pending_and_consumers():
+    r = InMemoryTransport()
+    await r.xgroup_create("cmds", "g", id="0", mkstream=True)
+    ids = [await r.xadd("cmds", {"n": str(n)}) for n in range(5)]
+    await r.xreadgroup("g", "worker", {"cmds": ">"}, count=3)
+    await r.xack("cmds", "g", ids[0])
+
+    snapshot = await collect(r, ["cmds", "missing"])
+
+    assert snapshot["missing"] is None
+    info = snapshot["cmds"]
+    assert info["length"] == 5
+    assert info["added"] == 5
+    [group] = info["groups"]
+    assert group["name"] == "g"
+    assert group["lag"] == 2
+    assert group["pending"] == 2
+    assert group["oldest_pending_age"] >= 0
+    [(consumer, pending, idle)] = group["consumers"]
+    assert (consumer, pending) == ("worker", 2)
+    assert idle >= 0
+
+    await r.xadd("cmds", {"n": "5"})
+    later = await collect(r, ["cmds", "missing"])
+    assert rates(snapshot, later, 0.5) == {"cmds": 2.0, "missing": None}
+    assert "worker" in render(later, rates(snapshot, later, 0.5))
+
+
+@pytest.mark.asyncio
+async def test_count_sagas_scans_allocations_statuses_and_reply_streams():
+    r = InMemoryTransport()
+    await r.xadd("mission:replies:1", {"status": "start"})
+    await r.xadd("resources:replies:2", {"status": "start"})
+    await r.xadd("mission:commands", {"event_type": "mission:start"})
+
+    sagas = await count_sagas(r)
+
+    assert sagas == {"allocations": 0, "statuses": 0, "reply_streams": 2}
+    assert "reply streams: 2" in render({}, {}, sagas)
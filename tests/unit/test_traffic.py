@@ -0,0 +1,62 @@
+import gzip
+import json
+
+import pytest
+
+from app.tools import traffic
+
+
+def test_recording_round_trip(tmp_path):
+    path = tmp_path / "traffic.jsonl.gz"
+    with gzip.open(path, "wt") as out:
+        out.write(json.dumps({"version": traffic.RECORDING_VERSION, "started_ms": 1000, "streams": []}) + "\n")
+        out.write(json.dumps([5, "mission:commands", {"correlation_id": "c1"}]) + "\n")
+    header, records = traffic.load_recording(path)
+    assert header["started_ms"] == 1000
+    assert records == [(5, "mission:commands", {"correlation_id": "c1"})]
+
+
+def test_recorded_report_measures_command_to_terminal_reply():
+    records = [
+        (0, "mission:commands", {"correlation_id": "c1", "reply_stream": "mission:replies:c1"}),
+        (100, "mission:commands", {"correlation_id": "c2", "reply_stream": "mission:replies:c2"}),
+        (150, "mission:replies:c1", {"status": "start"}),
+        (250, "mission:replies:c1", {"status": "completed"}),
+        (300, "mission:replies:c2", {"status": "failed"}),
+        (400, "routing:commands", {"correlation_id": "c1"}),
+    ]
+    report = traffic.recorded_report(records)
+    assert report["sent"] == 2
+    assert report["completed"] == 1
+    assert report["errors"] == 1
+    assert report["latency"]["max"] == pytest.approx(0.25)
+
+
+def test_rewrite_fields_uses_fresh_consistent_ids_and_shifts_deadline():
+    ids = {}
+    fields = {
+        "correlation_id": "c1",
+        "saga_id": "s1",
+        "request_id": "r1",
+        "reply_stream": "routing:replies:r1",
+        "deadline": "1010.000",
+        "timestamp": "1000",
+    }
+    first = traffic.rewrite_fields(fields, ids, recorded_epoch=1000.0)
+    second = traffic.rewrite_fields({"correlation_id": "c1"}, ids, recorded_epoch=1000.0)
+    assert first["correlation_id"] != "c1"
+    assert first["correlation_id"] == second["correlation_id"]
+    assert first["reply_stream"] == f"routing:replies:{first['request_id']}"
+    remaining = float(first["deadline"]) - float(first["timestamp"])
+    assert 9 <= remaining <= 11
+    assert fields["correlation_id"] == "c1"
+
+
+def test_compare_reports():
+    baseline = {"throughput": 10.0, "errors": 0, "timeouts": 1, "latency": {"p50": 0.1, "p90": 0.2, "p99": 0.4}}
+    current = {"throughput": 12.0, "errors": 2, "timeouts": 1, "latency": {"p50": 0.15, "p90": 0.2, "p99": 0.3}}
+    comparison = traffic.compare_reports(baseline, current)
+    assert comparison["throughput"][2] == pytest.approx(0.2)
+    assert comparison["p50"][2] == pytest.approx(0.5)
+    assert comparison["errors"] == (0, 2, None)
+    assert "p99" in traffic.format_comparison(comparison)
@@ -0,0 +1,161 @@
+import asyncio
+import json
+
+import pytest
+from redis.exceptions import ResponseError
+
+from app.commands.handlers import allocate_resources, plan_route, release_resources
+from app.commands.listener import handler_spec, run_command_listeners
+from app.fleet.registry import allocate_robots, register_robot, robot_key
+from app.redis_utils import client, transport
+from app.redis_utils.decorators import multi_stage_reply
+from app.redis_utils.replies import request_and_reply
+
+
+@pytest.mark.asyncio
+async def test_consumer_groups_deliver_once_and_track_pending():
+    t = transport.InMemoryTransport()
+    await t.xgroup_create("cmds", "workers", id="0", mkstream=True)
+    with pytest.raises(ResponseError, match="BUSYGROUP"):
+        await t.xgroup_create("cmds", "workers", id="0", mkstream=True)
+    first = await t.xadd("cmds", {"n": 1})
+    await t.xadd("cmds", {"n": 2})
+
+    delivered = await t.xreadgroup("workers", "a", {"cmds": ">"}, count=1)
+    assert delivered == [["cmds", [(first, {"n": 1})]]]
+    delivered = await t.xreadgroup("workers", "b", {"cmds": ">"})
+    assert [fields for _, fields in delivered[0][1]] == [{"n": 2}]
+    assert await t.xreadgroup("workers", "a", {"cmds": ">"}) == []
+
+    # Unacked entries are re-delivered to their consumer from history.
+    assert await t.xreadgroup("workers", "a", {"cmds": "0"}) == [["cmds", [(first, {"n": 1})]]]
+    assert await t.xack("cmds", "workers", first) == 1
+    assert await t.xreadgroup("workers", "a", {"cmds": "0"}) == [["cmds", []]]
+
+
+@pytest.mark.asyncio
+async def test_blocking_read_wakes_on_add_and_maxlen_trims():
+    t = transport.InMemoryTransport()
+    await t.xgroup_create("cmds", "workers", id="$", mkstream=True)
+    reader = asyncio.create_task(t.xreadgroup("workers", "a", {"cmds": ">"}, block=1000))
+    await asyncio.sleep(0.01)
+    await t.xadd("cmds", {"n": 1})
+    delivered = await asyncio.wait_for(reader, 0.5)
+    assert delivered[0][1][0][1] == {"n": 1}
+    assert await t.xreadgroup("workers", "a", {"cmds": ">"}, block=10) == []
+
+    for n in range(5):
+        await t.xadd("log", {"n": n}, maxlen=3)
+    assert [fields["n"] for _, fields in await t.xrange("log")] == [2, 3, 4]
+    assert await t.expire("log", 0)
+    assert await t.xlen("log") == 0
+
+
+@pytest.mark.asyncio
+async def test_request_and_reply_over_memory_transport(monkeypatch):
+    monkeypatch.setattr(client, "MESSAGE_TRANSPORT", "memory")
+    monkeypatch.setattr(transport, "_memory_transport", None)
+
+    @multi_stage_reply
+    async def handle(fields, progress):
+        await progress(0.5)
+        return {"echo": fields["event_type"]}
+
+    monkeypatch.setattr(
+        "app.commands.listener.discovery_handler_modules",
+        lambda: [
+            {
+                "name": "echo",
+                "stream": "echo:commands",
+                "group": "echo_group",
+                "event_type": "echo:run",
+                "handle": handle,
+            }
+        ],
+    )
+    shutdown = asyncio.Event()
+    listener = asyncio.create_task(run_command_listeners(shutdown_event=shutdown))
+    await asyncio.sleep(0.05)
+    try:
+        reply = await request_and_reply(
+            "echo:commands", "echo:replies", "cid", "sid", "echo:run", {}, timeout=2
+        )
+    finally:
+        shutdown.set()
+        await asyncio.wait_for(listener, 3)
+    assert reply["status"] == "completed"
+    assert '"echo": "echo:run"' in reply["payload"]
+
+
+@pytest.mark.asyncio
+async def test_process_mode_and_fleet_handlers_over_memory_transport(monkeypatch):
+    monkeypatch.setattr(client, "MESSAGE_TRANSPORT", "memory")
+    monkeypatch.setattr(transport, "_memory_transport", None)
+    monkeypatch.setattr(
+        "app.commands.listener.discovery_handler_modules",
+        lambda: [
+            handler_spec("plan_route", plan_route),
+            handler_spec("allocate_resources", allocate_resources),
+        ],
+    )
+    assert plan_route.EXECUTION_MODE == "process"
+    for robot_id, battery in (("r1", 90), ("r2", 40), ("r3", 70)):
+        await register_robot(robot_id, battery)
+    shutdown = asyncio.Event()
+    listener = asyncio.create_task(run_command_listeners(shutdown_event=shutdown))
+    await asyncio.sleep(0.05)
+    try:
+        route = await request_and_reply(
+            "routing:commands", "routing:replies", "cid", "sid", "routing:plan",
+            {"route": "A", "map": [[0.0] * 4] * 4, "start": [0, 0], "goals": [[3, 3]]}, timeout=5,
+        )
+        allocation = await request_and_reply(
+            "resources:commands", "resources:replies", "cid", "sid", "resources:allocate",
+            {"robots_allocated": 2}, timeout=2,
+        )
+    finally:
+        shutdown.set()
+        await asyncio.wait_for(listener, 3)
+    assert route["status"] == "completed"
+    assert json.loads(route["payload"])["paths"][0][-1] == [3, 3]
+    assert allocation["status"] == "completed"
+    assert json.loads(allocation["payload"]) == {"robots": ["r1", "r3"]}
+    assert await transport.get_memory_transport().hget(robot_key("r1"), "status") == "allocated"
+
+
+@pytest.mark.asyncio
+async def test_batched_releases_are_acked_in_bulk_with_one_reply_each(monkeypatch):
+    monkeypatch.setattr(client, "MESSAGE_TRANSPORT", "memory")
+    monkeypatch.setattr(transport, "_memory_transport", None)
+    monkeypatch.setattr(
+        "app.commands.listener.discovery_handler_modules",
+        lambda: [handler_spec("release_resources", release_resources)],
+    )
+    r = transport.get_memory_transport()
+    for n in range(3):
+        await register_robot(f"r{n}", 50)
+        await allocate_robots(f"s{n}", 1)
+    await r.xgroup_create(release_resources.STREAM_NAME, release_resources.GROUP_NAME, id="0", mkstream=True)
+    for n in range(3):
+        await r.xadd(release_resources.STREAM_NAME, {
+            "correlation_id": f"c{n}",
+            "saga_id": f"s{n}",
+            "event_type": release_resources.EVENT_TYPE,
+            "reply_stream": "resources:replies:batch",
+            "payload": "{}",
+        })
+    xack = r.xack
+    acks = []
+    monkeypatch.setattr(r, "xack", lambda stream, group, *ids: acks.append(ids) or xack(stream, group, *ids))
+
+    shutdown = asyncio.Event()
+    listener = asyncio.create_task(run_command_listeners(shutdown_event=shutdown))
+    await asyncio.sleep(0.1)
+    shutdown.set()
+    await asyncio.wait_for(listener, 3)
+
+    assert [len(ids) for ids in acks] == [3]
+    replies = [fields for _, fields in await r.xrange("resources:replies:batch")]
+    for n in range(3):
+        statuses = [(f["status"], f["payload"]) for f in replies if f["correlation_id"] == f"c{n}"]
+        assert statuses == [("start", "{}"), ("completed", json.dumps({"released": [f"r{n}"]}))]
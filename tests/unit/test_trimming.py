@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+import pytest
+
+from app.redis_utils.transport import InMemoryTransport
+from app.redis_utils.trimming import trim_stream
+
+
+async def fill(r, count):
+    ids = [await r.xadd("cmds", {"n": str(n)}) for n in range(count)]
+    # Let the entries fall behind a zero-second retention floor.
+    await asyncio.sleep(0.01)
+    return ids
+
+
+@pytest.mark.asyncio
+async def test_trim_stops_at_oldest_entry_a_group_still_needs():
+    r = InMemoryTransport()
+    await r.xgroup_create("cmds", "fast", id="0", mkstream=True)
+    await r.xgroup_create("cmds", "slow", id="0")
+    ids = await fill(r, 6)
+    fast = await r.xreadgroup("fast", "c", {"cmds": ">"}, count=6)
+    await r.xack("cmds", "fast", *(entry_id for entry_id, _ in fast[0][1]))
+    slow = await r.xreadgroup("slow", "c", {"cmds": ">"}, count=4)
+    await r.xack("cmds", "slow", ids[0], ids[1], ids[3])
+
+    # ids[2] is still pending for 'slow'
+    assert await trim_stream(r, "cmds", retention=0) == 2
+    assert [entry_id for entry_id, _ in await r.xrange("cmds")] == ids[2:]
+
+    await r.xack("cmds", "slow", ids[2])
+    # ids[4:] were never delivered to 'slow'
+    assert await trim_stream(r, "cmds", retention=0) == 2
+    assert [entry_id for entry_id, _ in await r.xrange("cmds")] == ids[4:]
+    assert len(slow[0][1]) == 4
+
+
+@pytest.mark.asyncio
+async def test_trim_keeps_retention_window_and_ignores_streams_without_groups():
+    r = InMemoryTransport()
+    await r.xgroup_create("cmds", "g", id="0", mkstream=True)
+    await fill(r, 3)
+    read = await r.xreadgroup("g", "c", {"cmds": ">"})
+    await r.xack("cmds", "g", *(entry_id for entry_id, _ in read[0][1]))
+    assert await trim_stream(r, "cmds", retention=60) == 0
+    assert await r.xlen("cmds") == 3
+
+    await r.xadd("plain", {"n": "1"})
+    assert await trim_stream(r, "plain", retention=0) == 0
+    assert await trim_stream(r, "missing", retention=0) == 0
+
+
+@pytest.mark.asyncio
+async def test_abandoned_pending_entries_do_not_block_trimming():
+    r = InMemoryTransport()
+    await r.xgroup_create("cmds", "g", id="0", mkstream=True)
+    old = int(time.time() * 1000) - 10_000
+    stale = await r.xadd("cmds", {"n": "0"}, id=f"{old}-0")
+    await fill(r, 2)
+    await r.xreadgroup("g", "c", {"cmds": ">"})
+    await r.xack("cmds", "g", *[entry_id for entry_id, _ in await r.xrange("cmds")][1:])
+    assert await trim_stream(r, "cmds", retention=0) == 0
+    assert await trim_stream(r, "cmds", retention=0, pending_timeout=5) == 3
+    assert stale not in [entry_id for entry_id, _ in await r.xrange("cmds")]